@@ -0,0 +1,92 @@
+"""
+GreenScale API Load Generator - Measure submission throughput of src/api.py
+
+Submits prompts from a JSONL workload (same format as loadgen.py) to the
+submission API from many concurrent connections, as single POST /jobs calls
+or in POST /jobs/bulk batches, and reports submissions per second and
+request latency. It only times the front door: whether the workers keep up
+is what loadgen.py measures.
+
+Usage:
+    python src/api.py &
+    python bench/apiload.py --count 20000 --concurrency 64 --bulk 100
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+import uuid
+
+from aiohttp import ClientSession, TCPConnector
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadgen import read_prompts  # noqa: E402
+from report import summarize  # noqa: E402
+
+
+async def submit_all(args, batches):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    latencies, errors = [], 0
+    lock = asyncio.Lock()
+    batch_iter = iter(batches)
+
+    async def client_loop(session):
+        nonlocal errors
+        while True:
+            async with lock:
+                batch = next(batch_iter, None)
+            if batch is None:
+                return
+            if args.bulk:
+                url, body = f"{args.url}/jobs/bulk", {"jobs": batch}
+            else:
+                url, body = f"{args.url}/jobs", batch[0]
+            started = time.perf_counter()
+            async with session.post(url, json=body, headers=headers) as response:
+                await response.read()
+                if response.status != 202:
+                    errors += len(batch)
+            latencies.append(time.perf_counter() - started)
+
+    connector = TCPConnector(limit=args.concurrency)
+    async with ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client_loop(session) for _ in range(args.concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GreenScale API submission throughput")
+    parser.add_argument("--url", default="http://localhost:8081", help="Base URL of the API")
+    parser.add_argument("--workload", default="bench/workload.jsonl", help="JSONL file of prompts")
+    parser.add_argument("--count", type=int, default=10000, help="Number of jobs to submit")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent connections")
+    parser.add_argument("--bulk", type=int, default=0, help="Jobs per POST /jobs/bulk (0 = one POST /jobs each)")
+    parser.add_argument("--priority", default="batch", help="Lane for the jobs (QUEUE_BACKEND=fair)")
+    parser.add_argument("--token", default=os.getenv("API_TOKEN", ""), help="Bearer token (API_TOKEN)")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:6]
+    # The API namespaces these ids as api-{tenant}-{job_id}
+    jobs = [{"job_id": f"{run_id}-{i}", "prompt": f"{prompt}\n[api-{run_id}-{i}]", "priority": args.priority}
+            for i, prompt in enumerate(itertools.islice(read_prompts(args.workload), args.count))]
+    size = max(1, args.bulk)
+    batches = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+    mode = f"bulk x{args.bulk}" if args.bulk else "single"
+    print(f"[APILoad] Submitting {len(jobs)} jobs ({mode}, {args.concurrency} connections) to {args.url}")
+    started = time.perf_counter()
+    latencies, errors = asyncio.run(submit_all(args, batches))
+    elapsed = time.perf_counter() - started
+
+    request_latency = summarize(latencies)
+    print(f"[APILoad] {len(jobs) - errors} accepted, {errors} rejected in {elapsed:.2f}s "
+          f"-> {(len(jobs) - errors) / elapsed:.0f} jobs/s, {len(batches) / elapsed:.0f} requests/s")
+    print("[APILoad] Request latency: " + ", ".join(f"{k} {v}" for k, v in request_latency.items()))
+
+
+if __name__ == "__main__":
+    main()
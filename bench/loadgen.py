@@ -0,0 +1,163 @@
+"""
+GreenScale Load Generator - Replay a JSONL workload into the job queue
+
+Reads prompts from a JSONL file (one object per line with a 'prompt' field,
+or 'body'/'title' as in requests.jsonl), enqueues them at a target arrival
+rate through the same queue backend the dashboard uses, and follows the
+workers' job ledger to time every job. Prints a summary of throughput,
+queue wait, service time and end-to-end latency (p50/p95/p99) and appends
+it to a results file for bench/report.py.
+
+Usage:
+    python bench/loadgen.py --workload bench/workload.jsonl --rate 20 --count 500 --label conc8
+
+Runs fully offline against a local Redis, local workers and bench/mock_llm.py
+(see scripts/bench.sh).
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_queue import queue_from_env  # noqa: E402
+from report import print_runs, summarize  # noqa: E402
+from stats import LEDGER_KEY  # noqa: E402
+
+
+def read_prompts(path: str):
+    """Stream prompts from a JSONL file, cycling over it forever."""
+    while True:
+        found = False
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                prompt = row.get("prompt") or row.get("body") or row.get("title")
+                if prompt:
+                    found = True
+                    yield prompt
+        if not found:
+            raise ValueError(f"No prompts found in {path}")
+
+
+def follow_ledger(client, start_id: str, submitted: dict, finished: dict, done: threading.Event):
+    """Collect ledger entries for our jobs until every submitted job is seen or `done` is set."""
+    last_id = start_id
+    while not done.is_set():
+        response = client.xread({LEDGER_KEY: last_id}, block=1000, count=500)
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                if fields.get("job_id") in submitted:
+                    finished[fields["job_id"]] = fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL workload into GreenScale")
+    parser.add_argument("--workload", default="bench/workload.jsonl", help="JSONL file of prompts")
+    parser.add_argument("--rate", type=float, default=10, help="Target arrivals per second")
+    parser.add_argument("--count", type=int, default=200, help="Number of jobs to submit")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--unique", action="store_true",
+                        help="Make every prompt unique so the cache and coalescing never hit")
+    parser.add_argument("--priority", default="batch", help="Lane for the jobs (QUEUE_BACKEND=fair)")
+    parser.add_argument("--tenants", type=int, default=1,
+                        help="Spread jobs round-robin over this many tenants (QUEUE_BACKEND=fair)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for stragglers")
+    parser.add_argument("--label", default="run", help="Name of this configuration in the report")
+    parser.add_argument("--out", default="bench/results.jsonl", help="File the summary is appended to")
+    args = parser.parse_args()
+
+    client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+    )
+    queue = queue_from_env(client)
+    run_id = uuid.uuid4().hex[:6]
+
+    # Only ledger entries written after this point can belong to this run
+    latest = client.xrevrange(LEDGER_KEY, count=1)
+    start_id = latest[0][0] if latest else "0"
+
+    submitted, finished = {}, {}
+    done = threading.Event()
+    follower = threading.Thread(target=follow_ledger, args=(client, start_id, submitted, finished, done), daemon=True)
+    follower.start()
+
+    print(f"[Loadgen] Submitting {args.count} jobs at {args.rate}/s ({args.arrival}) as '{args.label}'")
+    prompts = read_prompts(args.workload)
+    next_arrival = time.time()
+    for i, prompt in enumerate(itertools.islice(prompts, args.count)):
+        gap = random.expovariate(args.rate) if args.arrival == "poisson" else 1 / args.rate
+        next_arrival += gap
+        delay = next_arrival - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+        job_id = f"bench-{run_id}-{i}"
+        if args.unique:
+            prompt = f"{prompt}\n[{job_id}]"
+        submitted[job_id] = time.time()
+        queue.enqueue({
+            "job_id": job_id,
+            "prompt": prompt,
+            "priority": args.priority,
+            "tenant": f"bench-{i % args.tenants}",
+        })
+
+    deadline = time.time() + args.timeout
+    while len(finished) < len(submitted) and time.time() < deadline:
+        time.sleep(0.2)
+    done.set()
+    follower.join()
+
+    latency, queue_wait, service_time = [], [], []
+    failed = 0
+    for job_id, fields in finished.items():
+        enqueued_at = float(fields.get("enqueued_at", submitted[job_id]))
+        dequeued_at = float(fields.get("dequeued_at", fields["finished_at"]))
+        stored_at = float(fields.get("result_stored", fields["finished_at"]))
+        latency.append(stored_at - enqueued_at)
+        queue_wait.append(max(0.0, dequeued_at - enqueued_at))
+        service_time.append(stored_at - dequeued_at)
+        if fields["status"] == "failed":
+            failed += 1
+
+    first_submit = min(submitted.values())
+    last_finish = max((float(f["finished_at"]) for f in finished.values()), default=first_submit)
+    summary = {
+        "label": args.label,
+        "run_id": run_id,
+        "jobs": len(submitted),
+        "completed": len(finished),
+        "failed": failed,
+        "rate": args.rate,
+        "throughput": round(len(finished) / max(last_finish - first_submit, 1e-9), 3),
+        "latency": summarize(latency),
+        "queue_wait": summarize(queue_wait),
+        "service_time": summarize(service_time),
+    }
+
+    print_runs([summary])
+    if len(finished) < len(submitted):
+        print(f"[Loadgen] {len(submitted) - len(finished)} job(s) did not finish within {args.timeout}s")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "a") as f:
+        f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+GreenScale Mock LLM - Local OpenAI-compatible stub server for benchmarks
+
+Serves /v1/chat/completions (plain and streaming) and /v1/embeddings with
+configurable latency distributions and error rates, so worker throughput can
+be measured offline without spending real inference.
+
+Usage:
+    python bench/mock_llm.py --port 8000 --latency lognormal:0.0:0.5 --error-rate 0.02
+
+Latency specs (seconds):
+    fixed:S             always S
+    uniform:A:B         uniform between A and B
+    exp:MEAN            exponential with the given mean
+    lognormal:MU:SIGMA  lognormal (median e^MU)
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_RESPONSE = (
+    "GreenScale scales AI workers from zero when jobs arrive and back to zero "
+    "when the queue is empty, so idle GPUs cost nothing."
+)
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler returning seconds."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set by main()
+    sample_latency = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    error_status = 503
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            self._embeddings(body)
+            return
+
+        time.sleep(self.sample_latency())
+        if random.random() < self.error_rate:
+            self._send_json(self.error_status, {"error": {"message": "mock upstream error"}})
+            return
+
+        prompt = body["messages"][-1]["content"]
+        tokens = CANNED_RESPONSE.split(" ")[: body.get("max_tokens", 200)]
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt.split()) + len(tokens),
+        }
+        if body.get("stream"):
+            self._stream(tokens, usage)
+        else:
+            self._send_json(200, {
+                "choices": [{"message": {"role": "assistant", "content": " ".join(tokens)}}],
+                "usage": usage,
+            })
+
+    def _stream(self, tokens, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        try:
+            for i, token in enumerate(tokens):
+                delta = token if i == 0 else " " + token
+                send_event(json.dumps({"choices": [{"delta": {"content": delta}}]}))
+                time.sleep(self.token_delay)
+            send_event(json.dumps({"choices": [], "usage": usage}))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+
+    def _embeddings(self, body):
+        # Deterministic pseudo-embedding from the text's hash
+        digest = hashlib.sha256(body.get("input", "").encode("utf-8")).digest()
+        vector = [(b - 128) / 128 for b in digest]
+        self._send_json(200, {"data": [{"embedding": vector}]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="lognormal:0.0:0.5", help="Latency spec (see module docstring)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status for failed requests")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed tokens")
+    args = parser.parse_args()
+
+    MockHandler.sample_latency = staticmethod(parse_latency(args.latency))
+    MockHandler.error_rate = args.error_rate
+    MockHandler.error_status = args.error_status
+    MockHandler.token_delay = args.token_ms / 1000
+
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    print(f"[Mock LLM] Listening on http://{args.host}:{args.port}/v1/chat/completions")
+    print(f"[Mock LLM] Latency: {args.latency}, error rate: {args.error_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+GreenScale Benchmark Report - Summaries and side-by-side comparison of runs
+
+loadgen.py appends one JSON summary per run to a results file. This script
+prints those runs as a table so configurations (concurrency, batching,
+HTTP/2, ...) can be compared.
+
+Usage:
+    python bench/report.py bench/results.jsonl
+"""
+
+import argparse
+import json
+import math
+from typing import Dict, List
+
+METRICS = ("latency", "queue_wait", "service_time")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0-100) of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of a list of seconds, rounded to milliseconds."""
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    return {
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+    }
+
+
+def print_runs(runs: List[dict]):
+    """Print one row per run with throughput and latency percentiles."""
+    header = f"{'label':<20} {'jobs':>6} {'done':>6} {'fail':>5} {'jobs/s':>8}"
+    for metric in METRICS:
+        header += f" {metric + ' p50/p95/p99 (s)':>30}"
+    print(header)
+    print("-" * len(header))
+    for run in runs:
+        row = (
+            f"{run['label']:<20} {run['jobs']:>6} {run['completed']:>6} "
+            f"{run['failed']:>5} {run['throughput']:>8.2f}"
+        )
+        for metric in METRICS:
+            s = run[metric]
+            row += f" {s['p50']:>9.3f} {s['p95']:>9.3f} {s['p99']:>9.3f}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare GreenScale benchmark runs")
+    parser.add_argument("results", nargs="?", default="bench/results.jsonl")
+    args = parser.parse_args()
+
+    with open(args.results) as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    print_runs(runs)
+
+
+if __name__ == "__main__":
+    main()
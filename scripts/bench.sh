@@ -0,0 +1,75 @@
+#!/bin/bash
+
+# ============================================================================
+# 🌱 GreenScale - Offline Throughput Benchmark
+# ============================================================================
+# Runs the worker against the local mock LLM server and replays a workload
+# through Redis, then prints throughput and latency percentiles.
+#
+# Requires a local Redis on localhost:6379 (e.g. `docker compose up -d redis`).
+#
+# Usage:
+#   ./scripts/bench.sh [label]
+#
+# Tunables (environment variables):
+#   WORKERS=1 WORKER_CONCURRENCY=8 RATE=20 COUNT=300
+#   LATENCY=lognormal:0.0:0.5 ERROR_RATE=0 WORKLOAD=bench/workload.jsonl
+# Any other worker setting (QUEUE_BACKEND, INFERENCE_HTTP2, ...) is passed through.
+# ============================================================================
+
+set -e
+
+GREEN='\033[0;32m'
+BLUE='\033[0;34m'
+NC='\033[0m' # No Color
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(dirname "$SCRIPT_DIR")"
+
+LABEL="${1:-workers${WORKERS:-1}-conc${WORKER_CONCURRENCY:-8}}"
+WORKERS="${WORKERS:-1}"
+MOCK_PORT="${MOCK_PORT:-8000}"
+PIDS=()
+
+log_info() {
+    echo -e "${BLUE}[INFO]${NC} $1"
+}
+
+cleanup() {
+    for pid in "${PIDS[@]}"; do
+        kill -TERM "$pid" 2>/dev/null || true
+    done
+    wait 2>/dev/null || true
+}
+trap cleanup EXIT
+
+cd "$PROJECT_ROOT"
+
+log_info "Starting mock LLM on port $MOCK_PORT (latency ${LATENCY:-lognormal:0.0:0.5})..."
+python3 bench/mock_llm.py --port "$MOCK_PORT" \
+    --latency "${LATENCY:-lognormal:0.0:0.5}" \
+    --error-rate "${ERROR_RATE:-0}" &
+PIDS+=($!)
+sleep 1
+
+log_info "Starting $WORKERS worker(s)..."
+for i in $(seq 1 "$WORKERS"); do
+    NEYSA_API_URL="http://127.0.0.1:$MOCK_PORT/v1/chat/completions" \
+    NEYSA_API_KEY="bench" \
+    REDIS_HOST="${REDIS_HOST:-localhost}" \
+    WORKER_CONCURRENCY="${WORKER_CONCURRENCY:-8}" \
+    python3 src/worker.py > "/tmp/greenscale-bench-worker-$i.log" 2>&1 &
+    PIDS+=($!)
+done
+sleep 2
+
+log_info "Replaying workload as '$LABEL'..."
+python3 bench/loadgen.py \
+    --workload "${WORKLOAD:-bench/workload.jsonl}" \
+    --rate "${RATE:-20}" \
+    --count "${COUNT:-300}" \
+    --unique \
+    --label "$LABEL"
+
+echo -e "\n${GREEN}All runs so far:${NC}"
+python3 bench/report.py bench/results.jsonl
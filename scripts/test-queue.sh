@@ -32,10 +32,15 @@ echo "👀 Waiting for worker pod to start and finish..."
 sleep 45
 
 echo "▶️  Checking for result in Redis..."
-RESULT=$(kubectl exec -n $NAMESPACE $REDIS_POD -- redis-cli get "result:$JOB_ID")
+# Results are hashes (see src/results.py); long texts are stored zlib-compressed
+STATUS=$(kubectl exec -n $NAMESPACE $REDIS_POD -- redis-cli hget "result:$JOB_ID" status)
+RESULT=$(kubectl exec -n $NAMESPACE $REDIS_POD -- redis-cli hget "result:$JOB_ID" result)
 
-if [ -z "$RESULT" ]; then
+if [ -z "$STATUS" ]; then
     echo "❌ TEST FAILED: No result found in Redis for Job ID $JOB_ID."
+elif [ "$STATUS" != "processed" ] && [ "$STATUS" != "cached" ]; then
+    echo "❌ TEST FAILED: Job $JOB_ID finished as '$STATUS':"
+    kubectl exec -n $NAMESPACE $REDIS_POD -- redis-cli hget "result:$JOB_ID" error
 else
     echo "✅ TEST PASSED! Worker responded:"
     echo "---------------------------------"
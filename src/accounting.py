@@ -0,0 +1,229 @@
+"""
+GreenScale Accounting - Cost and energy of the worker pool from measured runtime
+
+Every worker meters its own lifetime: seconds alive, seconds with at least
+one job running, slot-seconds busy (out of WORKER_CONCURRENCY slots) and
+upstream tokens. It flushes the deltas every heartbeat into per-minute and
+per-hour buckets in the same pipeline, so reading an hour or a day is a
+fixed number of hash reads however many pods came and went.
+
+The cost model prices pod time at GPU_COST_PER_HOUR and estimates energy
+from busy and idle power draw (GPU_BUSY_WATTS / GPU_IDLE_WATTS) and the grid
+carbon intensity (CARBON_INTENSITY, gCO2e/kWh). Savings are measured
+against an always-on baseline of BASELINE_WORKERS pods over the same window,
+doing the same busy work and idling the rest of the time.
+
+Redis keys:
+- usage:minute:{minute}  hash of pod_seconds, busy_seconds, slot_seconds,
+                         slot_busy_seconds, jobs, tokens per epoch minute
+- usage:hour:{hour}      same per epoch hour
+- usage:pods             hash of worker id -> JSON {started_at, last_seen, ended_at}
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+PODS_KEY = "usage:pods"
+
+# Bucket size in seconds per resolution
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+FIELDS = ("pod_seconds", "busy_seconds", "slot_seconds", "slot_busy_seconds", "jobs", "tokens")
+
+
+class UsageMeter:
+    """
+    Integrates one worker pod's busy time and reports it to Redis.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        worker_id: Name of this pod in usage:pods
+        concurrency: Job slots on this pod
+        started_at: Pod start (epoch seconds); the first flush covers the cold start
+        minute_ttl / hour_ttl: Seconds the buckets are kept
+    """
+
+    def __init__(self, client, worker_id: str, concurrency: int = 1,
+                 started_at: Optional[float] = None, minute_ttl: int = 86400,
+                 hour_ttl: int = 30 * 86400):
+        self.client = client
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.started_at = started_at or time.time()
+        self.minute_ttl = minute_ttl
+        self.hour_ttl = hour_ttl
+        self._lock = threading.Lock()
+        self._last = self.started_at
+        self._active = 0
+        self._pending = dict.fromkeys(FIELDS, 0.0)
+
+    def _advance(self, now: float):
+        elapsed = max(0.0, now - self._last)
+        self._pending["pod_seconds"] += elapsed
+        self._pending["slot_seconds"] += elapsed * self.concurrency
+        if self._active:
+            self._pending["busy_seconds"] += elapsed
+            self._pending["slot_busy_seconds"] += elapsed * self._active
+        self._last = now
+
+    def job_started(self):
+        with self._lock:
+            self._advance(time.time())
+            self._active += 1
+
+    def job_finished(self):
+        with self._lock:
+            self._advance(time.time())
+            self._active = max(0, self._active - 1)
+            self._pending["jobs"] += 1
+
+    def add_tokens(self, tokens: int):
+        with self._lock:
+            self._pending["tokens"] += tokens
+
+    def flush(self, final: bool = False):
+        """
+        Add the usage since the last flush to the current minute and hour
+        buckets. Kept for the next flush if Redis is unreachable.
+        """
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            pending, self._pending = self._pending, dict.fromkeys(FIELDS, 0.0)
+
+        pod = {"started_at": round(self.started_at, 3), "last_seen": round(now, 3)}
+        if final:
+            pod["ended_at"] = round(now, 3)
+        pipe = self.client.pipeline(transaction=False)
+        for resolution, ttl in (("minute", self.minute_ttl), ("hour", self.hour_ttl)):
+            key = f"usage:{resolution}:{int(now // RESOLUTIONS[resolution])}"
+            for field, value in pending.items():
+                if value:
+                    pipe.hincrbyfloat(key, field, round(value, 3))
+            pipe.expire(key, ttl)
+        pipe.hset(PODS_KEY, self.worker_id, json.dumps(pod))
+        try:
+            pipe.execute()
+        except Exception:
+            with self._lock:
+                for field, value in pending.items():
+                    self._pending[field] += value
+            raise
+
+
+def read_usage(client, resolution: str = "minute", count: int = 60) -> List[Dict[str, float]]:
+    """The last `count` usage buckets of a resolution ('minute' or 'hour'), oldest first."""
+    size = RESOLUTIONS[resolution]
+    current = int(time.time() // size)
+    pipe = client.pipeline(transaction=False)
+    for bucket in range(current - count + 1, current + 1):
+        pipe.hgetall(f"usage:{resolution}:{bucket}")
+    return [{k: float(v) for k, v in bucket.items()} for bucket in pipe.execute()]
+
+
+def live_pods(client, max_age: float = 60) -> Dict[str, dict]:
+    """Worker pods that reported within `max_age` seconds and have not shut down."""
+    now = time.time()
+    pods = {}
+    for worker_id, raw in client.hgetall(PODS_KEY).items():
+        pod = json.loads(raw)
+        if "ended_at" not in pod and now - pod["last_seen"] <= max_age:
+            pods[worker_id] = pod
+    return pods
+
+
+def prune_pods(client, max_age: float = 86400) -> int:
+    """Drop pods not seen for `max_age` seconds from usage:pods."""
+    now = time.time()
+    stale = [worker_id for worker_id, raw in client.hgetall(PODS_KEY).items()
+             if now - json.loads(raw)["last_seen"] > max_age]
+    if stale:
+        client.hdel(PODS_KEY, *stale)
+    return len(stale)
+
+
+class CostModel:
+    """
+    Prices metered usage and compares it with an always-on pool.
+
+    Args:
+        cost_per_hour: Price of one worker pod-hour
+        busy_watts: Power draw of a pod while it runs jobs
+        idle_watts: Power draw of a pod that is up but idle
+        carbon_intensity: Grid emissions in gCO2e per kWh
+        baseline_workers: Pods an always-on deployment keeps running
+    """
+
+    def __init__(self, cost_per_hour: float = 3.50, busy_watts: float = 400,
+                 idle_watts: float = 60, carbon_intensity: float = 475,
+                 baseline_workers: int = 1):
+        self.cost_per_hour = cost_per_hour
+        self.busy_watts = busy_watts
+        self.idle_watts = idle_watts
+        self.carbon_intensity = carbon_intensity
+        self.baseline_workers = baseline_workers
+
+    def _kwh(self, busy_seconds: float, idle_seconds: float) -> float:
+        return (busy_seconds * self.busy_watts + idle_seconds * self.idle_watts) / 3.6e6
+
+    def report(self, buckets: List[Dict[str, float]], resolution: str = "minute") -> Dict[str, float]:
+        """
+        Cost, energy and savings over buckets from read_usage(). The window
+        starts at the first bucket with any usage and ends now.
+        """
+        size = RESOLUTIONS[resolution]
+        totals = {field: sum(bucket.get(field, 0.0) for bucket in buckets) for field in FIELDS}
+        first = next((i for i, bucket in enumerate(buckets) if bucket), len(buckets) - 1)
+        window = (len(buckets) - 1 - first) * size + time.time() % size
+
+        pod_seconds, busy_seconds = totals["pod_seconds"], totals["busy_seconds"]
+        baseline_seconds = max(pod_seconds, self.baseline_workers * window)
+        cost = pod_seconds / 3600 * self.cost_per_hour
+        baseline_cost = baseline_seconds / 3600 * self.cost_per_hour
+        energy = self._kwh(busy_seconds, pod_seconds - busy_seconds)
+        baseline_energy = self._kwh(busy_seconds, baseline_seconds - busy_seconds)
+
+        return {
+            "window_seconds": round(window, 1),
+            "pod_hours": round(pod_seconds / 3600, 4),
+            "busy_hours": round(busy_seconds / 3600, 4),
+            "utilization": round(busy_seconds / pod_seconds, 4) if pod_seconds else 0.0,
+            "slot_utilization": round(totals["slot_busy_seconds"] / totals["slot_seconds"], 4)
+            if totals["slot_seconds"] else 0.0,
+            "jobs": int(totals["jobs"]),
+            "tokens": int(totals["tokens"]),
+            "cost": round(cost, 4),
+            "baseline_cost": round(baseline_cost, 4),
+            "cost_saved": round(baseline_cost - cost, 4),
+            "cost_per_1k_tokens": round(cost / totals["tokens"] * 1000, 4) if totals["tokens"] else None,
+            "energy_kwh": round(energy, 4),
+            "baseline_energy_kwh": round(baseline_energy, 4),
+            "energy_saved_kwh": round(baseline_energy - energy, 4),
+            "carbon_saved_kg": round((baseline_energy - energy) * self.carbon_intensity / 1000, 4),
+        }
+
+
+def meter_from_env(client, worker_id: str, concurrency: int, started_at: Optional[float] = None) -> UsageMeter:
+    """Build a pod's meter; minute buckets live as long as the stats buckets (STATS_BUCKET_TTL)."""
+    return UsageMeter(
+        client,
+        worker_id,
+        concurrency=concurrency,
+        started_at=started_at,
+        minute_ttl=int(os.getenv("STATS_BUCKET_TTL", 86400)),
+        hour_ttl=int(os.getenv("USAGE_HOUR_TTL", 30 * 86400)),
+    )
+
+
+def cost_model_from_env() -> CostModel:
+    """Build the cost model from GPU_* / CARBON_INTENSITY / BASELINE_WORKERS settings."""
+    return CostModel(
+        cost_per_hour=float(os.getenv("GPU_COST_PER_HOUR", 3.50)),
+        busy_watts=float(os.getenv("GPU_BUSY_WATTS", 400)),
+        idle_watts=float(os.getenv("GPU_IDLE_WATTS", 60)),
+        carbon_intensity=float(os.getenv("CARBON_INTENSITY", 475)),
+        baseline_workers=int(os.getenv("BASELINE_WORKERS", 1)),
+    )
@@ -0,0 +1,234 @@
+"""
+GreenScale Submission API - Async HTTP front door to the job queue
+
+For services that push work programmatically. Jobs go onto the same queue,
+with the same payload, as dashboard jobs, so the same workers serve both. The
+service is asyncio end to end (aiohttp + redis.asyncio): a pod holds
+thousands of waiting clients on a handful of threads, and a bulk submit is
+one pipelined Redis write however many jobs it carries.
+
+Endpoints:
+    POST /jobs                  submit one job              -> 202 {"job_id": ...}
+    POST /jobs/bulk             submit {"jobs": [...]}      -> 202 {"job_ids": [...]}
+    GET  /jobs/{job_id}         result record if ready      -> 200 {"status": ..., "result": ...} or 202 pending
+    GET  /jobs/{job_id}/wait    long-poll for the result    -> 200, or 202 after ?timeout= seconds
+    GET  /jobs/{job_id}/events  server-sent events: 'token' chunks, then 'done' with the record
+    GET  /healthz
+
+A job is {"prompt": "...", "job_id"?, "priority"?, "tenant"?, "timeout"?}.
+Results are the records described in results.py: status (processed, cached,
+failed, cancelled), result or error text, model, token usage and timings.
+'timeout' (seconds) becomes the job's deadline (see retry.py); priority and
+tenant are used by QUEUE_BACKEND=fair. A caller's own job_id comes back as
+"api-{tenant}-{job_id}", so it can never name (and overwrite the record of)
+a dashboard, batch or other tenant's job. With API_TOKEN set, requests need
+an "Authorization: Bearer <token>" header.
+
+Usage:
+    python api.py          # serves on API_PORT (8081)
+"""
+
+import json
+import os
+import time
+import uuid
+
+import redis.asyncio as aioredis
+from aiohttp import web
+
+from job_queue import StreamQueue, queue_from_env
+from results import get_result_async, read_stream_async, wait_for_result_async
+
+API_PORT = int(os.getenv("API_PORT", 8081))
+API_TOKEN = os.getenv("API_TOKEN", "")
+# Jobs accepted in one bulk request
+API_BULK_MAX = int(os.getenv("API_BULK_MAX", 1000))
+# Longest a client may wait on /wait or /events (seconds)
+API_MAX_WAIT = float(os.getenv("API_MAX_WAIT", 60))
+# Tenant for jobs that don't name one
+API_DEFAULT_TENANT = os.getenv("API_DEFAULT_TENANT", "api")
+
+# Application state set up by make_app()
+REDIS_KEY = web.AppKey("redis", aioredis.Redis)
+QUEUE_KEY = web.AppKey("queue", object)
+
+
+def build_job(body) -> dict:
+    """
+    Validate one submitted job and turn it into the queue payload.
+
+    Raises:
+        ValueError: The job is malformed
+    """
+    if not isinstance(body, dict):
+        raise ValueError("A job must be a JSON object")
+    prompt = body.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("'prompt' must be a non-empty string")
+
+    tenant = str(body.get("tenant") or API_DEFAULT_TENANT)
+    job_id = f"api-{tenant}-{body['job_id']}" if body.get("job_id") else uuid.uuid4().hex
+    job = {"job_id": job_id, "prompt": prompt.strip(), "tenant": tenant}
+    if body.get("priority"):
+        job["priority"] = str(body["priority"])
+    if body.get("timeout") is not None:
+        job["deadline"] = time.time() + float(body["timeout"])
+    elif body.get("deadline") is not None:
+        job["deadline"] = float(body["deadline"])
+    return job
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def _wait_timeout(request: web.Request) -> float:
+    try:
+        timeout = float(request.query.get("timeout", API_MAX_WAIT))
+    except ValueError:
+        timeout = API_MAX_WAIT
+    return max(1.0, min(timeout, API_MAX_WAIT))
+
+
+@web.middleware
+async def auth_middleware(request: web.Request, handler):
+    if API_TOKEN and request.path != "/healthz":
+        if request.headers.get("Authorization") != f"Bearer {API_TOKEN}":
+            return _error(401, "Missing or invalid bearer token")
+    return await handler(request)
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+async def submit(request: web.Request) -> web.Response:
+    try:
+        job = build_job(await request.json())
+        return web.json_response({"job_id": (await enqueue(request.app, [job]))[0]}, status=202)
+    except (ValueError, TypeError) as e:
+        return _error(400, str(e))
+
+
+async def submit_bulk(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+        items = body.get("jobs") if isinstance(body, dict) else body
+        if not isinstance(items, list) or not items:
+            raise ValueError("Expected a non-empty list of jobs (or {\"jobs\": [...]})")
+        if len(items) > API_BULK_MAX:
+            raise ValueError(f"At most {API_BULK_MAX} jobs per request")
+        jobs = [build_job(item) for item in items]
+        return web.json_response({"job_ids": await enqueue(request.app, jobs)}, status=202)
+    except (ValueError, TypeError) as e:
+        return _error(400, str(e))
+
+
+async def enqueue(app: web.Application, jobs: list) -> list:
+    """Enqueue jobs in one pipelined round-trip; all or none are queued."""
+    queue = app[QUEUE_KEY]
+    if isinstance(queue, StreamQueue):
+        # Lets KEDA see the lag of the first submissions while no worker runs
+        await queue.ensure_group_async()
+    pipe = app[REDIS_KEY].pipeline(transaction=queue.ATOMIC_ENQUEUE)
+    for job in jobs:
+        queue.stage_enqueue(pipe, job)
+    await pipe.execute()
+    return [job["job_id"] for job in jobs]
+
+
+def _result_response(job_id: str, record) -> web.Response:
+    if record is None:
+        return web.json_response({"job_id": job_id, "status": "pending"}, status=202)
+    return web.json_response(record)
+
+
+async def fetch_result(request: web.Request) -> web.Response:
+    job_id = request.match_info["job_id"]
+    return _result_response(job_id, await get_result_async(request.app[REDIS_KEY], job_id))
+
+
+async def wait_result(request: web.Request) -> web.Response:
+    job_id = request.match_info["job_id"]
+    result = await wait_for_result_async(request.app[REDIS_KEY], job_id, _wait_timeout(request))
+    return _result_response(job_id, result)
+
+
+async def stream_events(request: web.Request) -> web.StreamResponse:
+    job_id = request.match_info["job_id"]
+    client = request.app[REDIS_KEY]
+    deadline = time.monotonic() + _wait_timeout(request)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    last_id = "0"
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            await response.write(b"event: timeout\ndata: {}\n\n")
+            break
+        text, done, last_id = await read_stream_async(client, job_id, last_id,
+                                                      block_ms=int(min(5, remaining) * 1000))
+        if text:
+            await response.write(f"event: token\ndata: {json.dumps({'text': text})}\n\n".encode())
+        if done:
+            record = await get_result_async(client, job_id)
+            await response.write(f"event: done\ndata: {json.dumps(record)}\n\n".encode())
+            break
+        if not text:
+            # Keeps proxies from closing an idle connection
+            await response.write(b": keep-alive\n\n")
+    await response.write_eof()
+    return response
+
+
+async def healthz(request: web.Request) -> web.Response:
+    try:
+        await request.app[REDIS_KEY].ping()
+    except aioredis.RedisError as e:
+        return _error(503, str(e))
+    return web.json_response({"status": "ok"})
+
+
+# ============================================================================
+# APP
+# ============================================================================
+def make_app(client) -> web.Application:
+    """
+    Build the API around a redis.asyncio client (decode_responses=True).
+    The queue backend is only used to stage its enqueue commands on the
+    client's pipelines, so jobs land exactly where worker.py looks for them.
+    """
+    app = web.Application(middlewares=[auth_middleware], client_max_size=16 * 1024 * 1024)
+    app[REDIS_KEY] = client
+    app[QUEUE_KEY] = queue_from_env(client)
+    app.router.add_post("/jobs", submit)
+    app.router.add_post("/jobs/bulk", submit_bulk)
+    app.router.add_get("/jobs/{job_id}", fetch_result)
+    app.router.add_get("/jobs/{job_id}/wait", wait_result)
+    app.router.add_get("/jobs/{job_id}/events", stream_events)
+    app.router.add_get("/healthz", healthz)
+
+    async def close_redis(app):
+        await app[REDIS_KEY].aclose()
+
+    app.on_cleanup.append(close_redis)
+    return app
+
+
+def main():
+    client = aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "redis-service"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+    )
+    print(f"[API] Serving job submissions on :{API_PORT}")
+    web.run_app(make_app(client), port=API_PORT, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
 import redis
-import json
 from dotenv import load_dotenv
 import streamlit as st
 import uuid
@@ -11,6 +10,16 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
 
+from accounting import cost_model_from_env
+from archive import archive_from_env
+from cache import cache_from_env
+from job_queue import queue_from_env
+from ratelimit import estimated_wait, limiter_from_env
+from results import get_result, read_stream, request_cancel
+from retry import dead_letters
+from snapshot import snapshot_from_env
+from stats import recent_jobs
+
 # Load environment variables
 load_dotenv()
 
@@ -18,19 +27,63 @@ load_dotenv()
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
-# GPU cost per hour (A100 GPU pricing)
-GPU_COST_PER_HOUR = 3.50
+# Tenant the dashboard submits as; its jobs go in the interactive lane
+# (only used by QUEUE_BACKEND=fair)
+DASHBOARD_TENANT = os.getenv("DASHBOARD_TENANT", "dashboard")
+
+# Admission control: when the estimated wait exceeds ADMISSION_MAX_WAIT seconds
+# (0 = off), 'reject' turns the job away and 'defer' submits it to the
+# ADMISSION_DEFER_PRIORITY lane instead
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 0))
+ADMISSION_MODE = os.getenv("ADMISSION_MODE", "reject").lower()
+ADMISSION_DEFER_PRIORITY = os.getenv("ADMISSION_DEFER_PRIORITY", "batch")
+
+# Prices the workers' metered runtime (GPU_COST_PER_HOUR, power draw, carbon
+# intensity) against an always-on baseline
+cost_model = cost_model_from_env()
+
+# Seconds between automatic refreshes of the metrics and system monitor (0 = only on interaction)
+DASHBOARD_REFRESH_SECONDS = float(os.getenv("DASHBOARD_REFRESH_SECONDS", 10))
 
-# Initialize Redis client with error handling
+# One Redis client (and connection pool) per app process, shared by every
+# session and rerun instead of being rebuilt on each click
+@st.cache_resource(show_spinner=False)
 def get_redis_client():
+    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True, health_check_interval=30)
+
+# Queue backend, response cache (exact-match tier only: a hit is answered here
+# without waking a worker) and the shared upstream limiter (only read here, to
+# estimate how fast the queue drains), built once per process
+@st.cache_resource(show_spinner=False)
+def get_services(_client):
+    return queue_from_env(_client), cache_from_env(_client), limiter_from_env(_client)
+
+# Connectivity is re-checked at most every few seconds, not on every rerun
+@st.cache_data(ttl=5, show_spinner=False)
+def redis_available():
     try:
-        client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-        client.ping()
-        return client, True
-    except:
-        return None, False
+        return bool(get_redis_client().ping())
+    except redis.RedisError:
+        return False
+
+# Cluster metrics are read from Redis by one background thread per process
+# and shared by every session, so viewers don't add Redis load
+@st.cache_resource(show_spinner=False)
+def get_metrics_snapshot(_client, _queue, _limiter):
+    return snapshot_from_env(_client, _queue, cost_model, limiter=_limiter)
 
-redis_client, redis_connected = get_redis_client()
+# On-disk archive of results older than RESULT_TTL (None without
+# RESULT_ARCHIVE_PATH); this process also runs the archiver that fills it
+@st.cache_resource(show_spinner=False)
+def get_result_archive(_client):
+    archive = archive_from_env()
+    return archive.start(_client) if archive else None
+
+redis_client = get_redis_client()
+redis_connected = redis_available()
+job_queue, response_cache, rate_limiter = get_services(redis_client) if redis_connected else (None, None, None)
+metrics_snapshot = get_metrics_snapshot(redis_client, job_queue, rate_limiter) if redis_connected else None
+result_archive = get_result_archive(redis_client)
 
 # Page config
 st.set_page_config(
@@ -286,15 +339,12 @@ if 'session_start' not in st.session_state:
 # HELPER FUNCTIONS
 # ============================================================================
 
-def calculate_savings(jobs_processed, idle_hours=0):
-    """Calculate savings based on Scale-to-Zero"""
-    # Each job takes ~5 seconds, so we save money when not processing
-    active_time_hours = (jobs_processed * 5) / 3600  # Convert seconds to hours
-    session_hours = (time.time() - st.session_state.session_start) / 3600
-    idle_hours = max(0, session_hours - active_time_hours)
-    savings = idle_hours * GPU_COST_PER_HOUR
-    return round(savings, 2)
+def current_snapshot():
+    """Latest shared cluster metrics, or None while Redis is unavailable"""
+    return metrics_snapshot.get() if metrics_snapshot else None
 
+# Figures are memoized on their inputs: an unchanged gauge is not rebuilt on rerun
+@st.cache_data(max_entries=256, show_spinner=False)
 def create_modern_gauge(value, max_value, title, color, icon):
     """Create a sleek modern gauge"""
     
@@ -353,6 +403,7 @@ def create_modern_gauge(value, max_value, title, color, icon):
     
     return fig
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def create_mini_chart(values, color):
     """Create a mini sparkline chart"""
     colors = {
@@ -384,25 +435,16 @@ def create_mini_chart(values, color):
     
     return fig
 
-def create_resource_bars(active_workers):
-    """Create resource utilization bars based on actual state"""
+@st.cache_data(max_entries=64, show_spinner=False)
+def create_resource_bars(busy_pct, slots_pct, saved_pct):
+    """Create utilization bars from the workers' metered runtime"""
     fig = go.Figure()
     
-    # Dynamic values based on worker state
-    if active_workers > 0:
-        resources = [
-            ('CPU', 35, '#3b82f6'),
-            ('Memory', 58, '#8b5cf6'),
-            ('GPU', 78, '#10b981'),
-            ('Network', 24, '#06b6d4')
-        ]
-    else:
-        resources = [
-            ('CPU', 12, '#3b82f6'),
-            ('Memory', 28, '#8b5cf6'),
-            ('GPU', 0, '#10b981'),
-            ('Network', 5, '#06b6d4')
-        ]
+    resources = [
+        ('Pods busy', busy_pct, '#3b82f6'),
+        ('Job slots', slots_pct, '#8b5cf6'),
+        ('Cost saved', saved_pct, '#10b981'),
+    ]
     
     for i, (name, value, color) in enumerate(resources):
         # Background bar
@@ -479,77 +521,86 @@ st.markdown("<br>", unsafe_allow_html=True)
 # METRICS SECTION
 # ============================================================================
 
-if redis_connected:
-    queue_length = redis_client.llen("jobs")
-    result_keys = redis_client.keys("result:*")
-    jobs_processed = len(result_keys)
+# Reruns on its own every DASHBOARD_REFRESH_SECONDS, without the rest of the page
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS or None)
+def render_metrics():
+    snapshot = current_snapshot()
+    if snapshot:
+        queue_length = snapshot["queue_depth"]
+        jobs_processed = snapshot["stats"]["completed"]
+        usage_report = snapshot["usage"]
+        recent_usage = snapshot["recent_usage"]
+        
+        # Update session state
+        st.session_state.total_jobs = jobs_processed
+        st.session_state.total_savings = round(usage_report["cost_saved"], 2)
+        
+        # Worker pods that reported usage recently
+        active_workers = snapshot["workers"]
+    else:
+        queue_length = 0
+        jobs_processed = 0
+        active_workers = 0
+        usage_report = {}
+        recent_usage = {}
     
-    # Update session state
-    st.session_state.total_jobs = jobs_processed
-    st.session_state.total_savings = calculate_savings(jobs_processed)
+    # Metric Cards Row
+    col1, col2, col3, col4 = st.columns(4)
     
-    # Calculate active workers based on queue
-    active_workers = 1 if queue_length > 0 else 0
-else:
-    queue_length = 0
-    jobs_processed = 0
-    active_workers = 0
-
-# Metric Cards Row
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    gauge = create_modern_gauge(queue_length, 10, "QUEUE", "blue", "📥")
-    st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
-
-with col2:
-    gauge = create_modern_gauge(active_workers, 5, "WORKERS", "emerald", "⚡")
-    st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
-
-with col3:
-    gauge = create_modern_gauge(jobs_processed, 50, "PROCESSED", "purple", "✅")
-    st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
-
-with col4:
-    savings = st.session_state.total_savings
-    gauge = create_modern_gauge(savings, 20, "SAVINGS", "amber", "💰")
-    st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
-
-# ============================================================================
-# SECONDARY METRICS
-# ============================================================================
-
-st.markdown("<hr>", unsafe_allow_html=True)
-
-col1, col2, col3, col4, col5 = st.columns(5)
-
-# Calculate actual average response time from job history
-if st.session_state.job_history:
-    response_times = [job.get('response_time', 3) for job in st.session_state.job_history if 'response_time' in job]
-    if response_times:
-        avg_response = f"{sum(response_times) / len(response_times):.1f}s"
+    with col1:
+        gauge = create_modern_gauge(queue_length, 10, "QUEUE", "blue", "📥")
+        st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
+    
+    with col2:
+        gauge = create_modern_gauge(active_workers, 5, "WORKERS", "emerald", "⚡")
+        st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
+    
+    with col3:
+        gauge = create_modern_gauge(jobs_processed, 50, "PROCESSED", "purple", "✅")
+        st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
+    
+    with col4:
+        savings = st.session_state.total_savings
+        gauge = create_modern_gauge(savings, 20, "SAVINGS", "amber", "💰")
+        st.plotly_chart(gauge, use_container_width=True, config={'displayModeBar': False})
+    
+    # ========================================================================
+    # SECONDARY METRICS
+    # ========================================================================
+    
+    st.markdown("<hr>", unsafe_allow_html=True)
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    # Calculate actual average response time from job history
+    if st.session_state.job_history:
+        response_times = [job.get('response_time', 3) for job in st.session_state.job_history if 'response_time' in job]
+        if response_times:
+            avg_response = f"{sum(response_times) / len(response_times):.1f}s"
+        else:
+            avg_response = "~3s"
     else:
         avg_response = "~3s"
-else:
-    avg_response = "~3s"
-
-metrics = [
-    ("🕐", "Uptime", f"{int((time.time() - st.session_state.session_start) / 60)}m", "emerald"),
-    ("⏱️", "Avg Response", avg_response, "blue"),
-    ("📊", "Scale Events", str(jobs_processed), "purple"),
-    ("💾", "Memory", "0MB" if active_workers == 0 else "256MB", "cyan"),
-    ("🔥", "GPU Util", "0%" if active_workers == 0 else "78%", "amber"),
-]
-
-for col, (icon, label, value, color) in zip([col1, col2, col3, col4, col5], metrics):
-    with col:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div style="font-size: 1.5rem;">{icon}</div>
-            <p class="metric-value text-{color}">{value}</p>
-            <p class="metric-label">{label}</p>
-        </div>
-        """, unsafe_allow_html=True)
+    
+    metrics = [
+        ("🕐", "Uptime", f"{int((time.time() - st.session_state.session_start) / 60)}m", "emerald"),
+        ("⏱️", "Avg Response", avg_response, "blue"),
+        ("📊", "Scale Events", str(jobs_processed), "purple"),
+        ("🌍", "CO₂ Saved", f"{usage_report.get('carbon_saved_kg', 0):.2f}kg", "cyan"),
+        ("🔥", "Utilization", f"{recent_usage.get('utilization', 0) * 100:.0f}%", "amber"),
+    ]
+    
+    for col, (icon, label, value, color) in zip([col1, col2, col3, col4, col5], metrics):
+        with col:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div style="font-size: 1.5rem;">{icon}</div>
+                <p class="metric-value text-{color}">{value}</p>
+                <p class="metric-label">{label}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+render_metrics()
 
 # ============================================================================
 # JOB SUBMISSION SECTION
@@ -597,14 +648,51 @@ if submit_button:
         st.warning("⚠️ Please enter a prompt.")
     else:
         job_id = str(uuid.uuid4())[:8]
-        job_payload = {"job_id": job_id, "prompt": user_prompt.strip()}
+        job_payload = {
+            "job_id": job_id,
+            "prompt": user_prompt.strip(),
+            "priority": "interactive",
+            "tenant": DASHBOARD_TENANT,
+            # The page stops waiting after 60s; retries must not outlive that
+            "deadline": time.time() + 60,
+        }
         
+        # The results section below renders in this same run, so no st.rerun()
+        # is needed to show the answer or the processing card
         try:
-            redis_client.lpush("jobs", json.dumps(job_payload))
-            st.session_state['active_job_id'] = job_id
-            st.session_state['active_prompt'] = user_prompt.strip()
-            st.session_state['job_start_time'] = time.time()
-            st.rerun()
+            cached = response_cache.get(user_prompt.strip()) if response_cache else None
+            if cached is not None:
+                st.session_state.job_history.insert(0, {
+                    'job_id': job_id,
+                    'prompt': user_prompt.strip(),
+                    'result': cached,
+                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'response_time': 0.0,
+                    'cached': True
+                })
+                st.session_state.job_history = st.session_state.job_history[:10]
+                job_payload = None
+            
+            # Admission control: don't add to a queue that can't drain in time.
+            # Read from the shared snapshot, so submits cost no extra Redis reads
+            status_note = "KEDA is scaling workers..."
+            snapshot = current_snapshot() if job_payload else None
+            wait = (estimated_wait(snapshot["queue_depth"], snapshot["throughput"], snapshot["allowed_rate"])
+                    if snapshot else None)
+            if ADMISSION_MAX_WAIT and wait is not None and wait > ADMISSION_MAX_WAIT:
+                if ADMISSION_MODE == "defer":
+                    job_payload["priority"] = ADMISSION_DEFER_PRIORITY
+                    status_note = f"Busy (estimated wait {wait:.0f}s) - queued as {ADMISSION_DEFER_PRIORITY}..."
+                else:
+                    job_payload = None
+                    st.warning(f"⏳ GreenScale is at capacity (estimated wait {wait:.0f}s). Please try again shortly.")
+            
+            if job_payload:
+                job_queue.enqueue(job_payload)
+                st.session_state['active_job_id'] = job_id
+                st.session_state['active_prompt'] = user_prompt.strip()
+                st.session_state['active_status'] = status_note
+                st.session_state['job_start_time'] = time.time()
         except Exception as e:
             st.error(f"❌ Failed: {str(e)}")
 
@@ -615,98 +703,125 @@ if submit_button:
 st.markdown("<hr>", unsafe_allow_html=True)
 st.markdown('<p class="section-header">📊 Results</p>', unsafe_allow_html=True)
 
-# Active job processing
-if 'active_job_id' in st.session_state and redis_connected:
-    job_id = st.session_state['active_job_id']
-    prompt = st.session_state.get('active_prompt', '')
-    
-    result_container = st.empty()
-    progress_container = st.empty()
-    
-    with result_container.container():
-        st.markdown(f"""
-        <div class="processing-card">
-            <div style="display: flex; align-items: center; gap: 16px;">
-                <div style="font-size: 2rem;">⏳</div>
-                <div>
-                    <p style="color: #3b82f6; font-weight: 600; margin: 0;">Processing Job #{job_id}</p>
-                    <p style="color: #9ca3af; margin: 4px 0 0 0; font-size: 0.9rem;">KEDA is scaling workers...</p>
+# Waiting for a job, "Stop generating" and expanding answers only rerun this section
+@st.fragment
+def render_results():
+    # Active job processing
+    if 'active_job_id' in st.session_state and redis_connected:
+        job_id = st.session_state['active_job_id']
+        prompt = st.session_state.get('active_prompt', '')
+        
+        result_container = st.empty()
+        progress_container = st.empty()
+        
+        with result_container.container():
+            st.markdown(f"""
+            <div class="processing-card">
+                <div style="display: flex; align-items: center; gap: 16px;">
+                    <div style="font-size: 2rem;">⏳</div>
+                    <div>
+                        <p style="color: #3b82f6; font-weight: 600; margin: 0;">Processing Job #{job_id}</p>
+                        <p style="color: #9ca3af; margin: 4px 0 0 0; font-size: 0.9rem;">{st.session_state.get('active_status', 'KEDA is scaling workers...')}</p>
+                    </div>
                 </div>
+                <p style="color: #e5e7eb; margin-top: 16px; padding: 12px; background: rgba(0,0,0,0.2); border-radius: 8px;">
+                    "{prompt[:150]}{'...' if len(prompt) > 150 else ''}"
+                </p>
             </div>
-            <p style="color: #e5e7eb; margin-top: 16px; padding: 12px; background: rgba(0,0,0,0.2); border-radius: 8px;">
-                "{prompt[:150]}{'...' if len(prompt) > 150 else ''}"
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    progress_bar = progress_container.progress(0, text="Waiting for worker...")
-    
-    # Poll for result
-    result = None
-    for i in range(60):
-        result = redis_client.get(f"result:{job_id}")
-        if result:
-            break
-        progress_bar.progress((i + 1) / 60, text=f"Processing... {i+1}s")
-        time.sleep(1)
-    
-    progress_container.empty()
-    result_container.empty()
-    
-    if result:
-        # Calculate response time
-        response_time = round(time.time() - st.session_state.get('job_start_time', time.time()), 1)
+            """, unsafe_allow_html=True)
         
-        # Add to history
-        st.session_state.job_history.insert(0, {
-            'job_id': job_id,
-            'prompt': prompt,
-            'result': result,
-            'timestamp': datetime.now().strftime("%H:%M:%S"),
-            'response_time': response_time
-        })
+        stream_container = st.empty()
+        progress_bar = progress_container.progress(0, text="Waiting for worker...")
         
-        # Keep only last 10
-        st.session_state.job_history = st.session_state.job_history[:10]
+        # A click reruns the script; the worker sees the cancel flag on its next flush
+        if st.button("⏹️ Stop generating", key=f"stop_{job_id}"):
+            request_cancel(redis_client, job_id)
         
-        # Clear active job
-        del st.session_state['active_job_id']
-        if 'active_prompt' in st.session_state:
-            del st.session_state['active_prompt']
+        # Render tokens as the worker streams them (60s deadline). Each read returns
+        # as soon as new chunks arrive; the 'done' entry means the result is stored.
+        result = None
+        streamed = ""
+        last_id = "0"
+        deadline = time.time() + 60
+        while result is None and time.time() < deadline:
+            remaining = deadline - time.time()
+            text, done, last_id = read_stream(redis_client, job_id, last_id, block_ms=int(min(5, max(1, remaining)) * 1000))
+            if text:
+                streamed += text
+                stream_container.markdown(f"""
+                <div class="result-card">
+                    <div class="result-content">{streamed}▌</div>
+                </div>
+                """, unsafe_allow_html=True)
+            if done:
+                result = get_result(redis_client, job_id, archive=result_archive)
+            elapsed = 60 - max(0, deadline - time.time())
+            progress_bar.progress(min(1.0, elapsed / 60), text=f"Generating... {int(elapsed)}s" if streamed else f"Processing... {int(elapsed)}s")
         
-        st.rerun()
-    else:
-        st.error("⏱️ Job timed out. Please try again.")
-        del st.session_state['active_job_id']
-
-# Display job history
-if st.session_state.job_history:
-    for i, job in enumerate(st.session_state.job_history):
-        is_latest = (i == 0)
+        stream_container.empty()
+        progress_container.empty()
+        result_container.empty()
         
-        with st.expander(f"{'🆕 ' if is_latest else ''}Job #{job['job_id']} • {job['timestamp']} • {job.get('response_time', '?')}s", expanded=is_latest):
-            st.markdown(f"**Prompt:** {job['prompt']}")
-            st.markdown("---")
-            st.markdown(f"""
-            <div class="result-card">
-                <div class="result-header">
-                    <div class="result-icon">🤖</div>
-                    <div>
-                        <p style="color: #10b981; font-weight: 600; margin: 0;">AI Response</p>
-                        <p style="color: #9ca3af; font-size: 0.8rem; margin: 0;">Llama 3.3 70B</p>
+        if result:
+            # Calculate response time
+            response_time = round(time.time() - st.session_state.get('job_start_time', time.time()), 1)
+            
+            # Add to history
+            st.session_state.job_history.insert(0, {
+                'job_id': job_id,
+                'prompt': prompt,
+                'result': result.get('result') or result.get('error', ''),
+                'status': result['status'],
+                'model': result.get('model'),
+                'tokens': result.get('total_tokens'),
+                'timestamp': datetime.now().strftime("%H:%M:%S"),
+                'response_time': response_time
+            })
+            
+            # Keep only last 10
+            st.session_state.job_history = st.session_state.job_history[:10]
+            
+            # Clear active job
+            del st.session_state['active_job_id']
+            if 'active_prompt' in st.session_state:
+                del st.session_state['active_prompt']
+            # The history below is rendered in this same run
+        else:
+            st.error("⏱️ Job timed out. Please try again.")
+            del st.session_state['active_job_id']
+
+    # Display job history
+    if st.session_state.job_history:
+        for i, job in enumerate(st.session_state.job_history):
+            is_latest = (i == 0)
+            
+            status_tag = {'cached': " • ⚡ cached", 'failed': " • ❌ failed", 'cancelled': " • ⏹️ cancelled"}.get(
+                'cached' if job.get('cached') else job.get('status'), "")
+            with st.expander(f"{'🆕 ' if is_latest else ''}Job #{job['job_id']} • {job['timestamp']} • {job.get('response_time', '?')}s{status_tag}", expanded=is_latest):
+                st.markdown(f"**Prompt:** {job['prompt']}")
+                st.markdown("---")
+                st.markdown(f"""
+                <div class="result-card">
+                    <div class="result-header">
+                        <div class="result-icon">🤖</div>
+                        <div>
+                            <p style="color: #10b981; font-weight: 600; margin: 0;">AI Response</p>
+                            <p style="color: #9ca3af; font-size: 0.8rem; margin: 0;">{job.get('model') or 'Llama 3.3 70B'}{f" • {job['tokens']} tokens" if job.get('tokens') else ''}</p>
+                        </div>
                     </div>
+                    <div class="result-content">{job['result']}</div>
                 </div>
-                <div class="result-content">{job['result']}</div>
-            </div>
-            """, unsafe_allow_html=True)
-else:
-    st.markdown("""
-    <div style="text-align: center; padding: 40px; color: #6b7280;">
-        <p style="font-size: 3rem; margin-bottom: 16px;">💡</p>
-        <p>Submit a job to see AI responses here</p>
-        <p style="font-size: 0.85rem; margin-top: 8px;">Workers scale from 0 → 1 automatically</p>
-    </div>
-    """, unsafe_allow_html=True)
+                """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div style="text-align: center; padding: 40px; color: #6b7280;">
+            <p style="font-size: 3rem; margin-bottom: 16px;">💡</p>
+            <p>Submit a job to see AI responses here</p>
+            <p style="font-size: 0.85rem; margin-top: 8px;">Workers scale from 0 → 1 automatically</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+render_results()
 
 # ============================================================================
 # SYSTEM MONITOR
@@ -715,35 +830,188 @@ else:
 st.markdown("<hr>", unsafe_allow_html=True)
 st.markdown('<p class="section-header">📡 System Monitor</p>', unsafe_allow_html=True)
 
-col1, col2 = st.columns(2)
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS or None)
+def render_system_monitor():
+    col1, col2 = st.columns(2)
 
-with col1:
-    st.markdown("**Resource Utilization**")
-    resource_chart = create_resource_bars(active_workers)
-    st.plotly_chart(resource_chart, use_container_width=True, config={'displayModeBar': False})
+    with col1:
+        st.markdown("**Resource Utilization**")
+        snapshot = current_snapshot()
+        if snapshot:
+            recent_usage = snapshot["recent_usage"]
+            usage_report = snapshot["usage"]
+            baseline_cost = usage_report['baseline_cost']
+            resource_chart = create_resource_bars(
+                round(recent_usage['utilization'] * 100),
+                round(recent_usage['slot_utilization'] * 100),
+                round(usage_report['cost_saved'] / baseline_cost * 100) if baseline_cost else 0,
+            )
+        else:
+            resource_chart = create_resource_bars(0, 0, 0)
+        st.plotly_chart(resource_chart, use_container_width=True, config={'displayModeBar': False})
 
-with col2:
-    st.markdown("**System Components**")
-    
-    components = [
-        ("Redis", redis_connected, "Message Broker", "#3b82f6"),
-        ("KEDA", True, "Event-Driven Autoscaler", "#10b981"),
-        ("Worker Pool", True, "Scale-to-Zero Ready", "#8b5cf6"),
-        ("Llama 3.3 70B", True, "AI Engine", "#f59e0b"),
-    ]
-    
-    for name, status, desc, color in components:
-        dot_class = "status-dot-online" if status else "status-dot-offline"
-        st.markdown(f"""
-        <div class="status-item">
-            <span class="status-dot {dot_class}"></span>
-            <div style="flex: 1;">
-                <p style="color: #e5e7eb; margin: 0; font-weight: 500;">{name}</p>
-                <p style="color: #6b7280; margin: 0; font-size: 0.8rem;">{desc}</p>
+    with col2:
+        st.markdown("**System Components**")
+        
+        components = [
+            ("Redis", redis_connected, "Message Broker", "#3b82f6"),
+            ("KEDA", True, "Event-Driven Autoscaler", "#10b981"),
+            ("Worker Pool", True, "Scale-to-Zero Ready", "#8b5cf6"),
+            ("Llama 3.3 70B", True, "AI Engine", "#f59e0b"),
+        ]
+        
+        for name, status, desc, color in components:
+            dot_class = "status-dot-online" if status else "status-dot-offline"
+            st.markdown(f"""
+            <div class="status-item">
+                <span class="status-dot {dot_class}"></span>
+                <div style="flex: 1;">
+                    <p style="color: #e5e7eb; margin: 0; font-weight: 500;">{name}</p>
+                    <p style="color: #6b7280; margin: 0; font-size: 0.8rem;">{desc}</p>
+                </div>
+                <span style="color: {color}; font-size: 0.8rem;">{'Active' if status else 'Offline'}</span>
             </div>
-            <span style="color: {color}; font-size: 0.8rem;">{'Active' if status else 'Offline'}</span>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
+
+render_system_monitor()
+
+# ============================================================================
+# LATENCY BREAKDOWN & JOB LEDGER
+# ============================================================================
+
+# Paging the ledger only reruns this section
+@st.fragment
+def render_ledger():
+    if redis_connected:
+        st.markdown("<hr>", unsafe_allow_html=True)
+        
+        with st.expander("⏱️ Latency Breakdown", expanded=False):
+            # Cluster-wide stage histograms recorded by the workers
+            snapshot = current_snapshot()
+            rows = [{
+                'Stage': stage['stage'],
+                'Jobs': stage['count'],
+                'Mean (s)': stage['mean'],
+                'p50 ≤ (s)': stage['p50'],
+                'p95 ≤ (s)': stage['p95'],
+                'p99 ≤ (s)': stage['p99'],
+            } for stage in (snapshot['latency'] if snapshot else [])]
+            if rows:
+                st.dataframe(rows, use_container_width=True, hide_index=True)
+            else:
+                st.markdown("No timed jobs yet.")
+            if snapshot:
+                st.caption(f"Throughput {snapshot['throughput'] * 60:.1f} jobs/min • "
+                           f"updated {time.time() - snapshot['taken_at']:.0f}s ago")
+        
+        with st.expander("🗂️ Job Ledger", expanded=False):
+            # Stack of page cursors; the last one is the page being shown
+            if 'ledger_cursors' not in st.session_state:
+                st.session_state.ledger_cursors = [None]
+            
+            ledger_jobs, next_cursor = recent_jobs(redis_client, count=20, before=st.session_state.ledger_cursors[-1])
+            
+            if ledger_jobs:
+                st.dataframe(
+                    [{
+                        'Job': job['job_id'],
+                        'Status': job['status'],
+                        'Finished': datetime.fromtimestamp(float(job['finished_at'])).strftime("%H:%M:%S"),
+                        'Prompt': job['prompt'],
+                    } for job in ledger_jobs],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.markdown("No finished jobs yet.")
+            
+            col_newer, col_page, col_older = st.columns([1, 2, 1])
+            with col_newer:
+                if st.button("← Newer", disabled=len(st.session_state.ledger_cursors) == 1, key="ledger_newer"):
+                    st.session_state.ledger_cursors.pop()
+                    st.rerun(scope="fragment")
+            with col_page:
+                st.markdown(f"<p style='text-align: center; color: #9ca3af;'>Page {len(st.session_state.ledger_cursors)}</p>", unsafe_allow_html=True)
+            with col_older:
+                if st.button("Older →", disabled=next_cursor is None, key="ledger_older"):
+                    st.session_state.ledger_cursors.append(next_cursor)
+                    st.rerun(scope="fragment")
+        
+        with st.expander("🗄️ Result History", expanded=False):
+            # Every result, kept on disk after it expires from Redis
+            if result_archive is None:
+                st.markdown("Set `RESULT_ARCHIVE_PATH` to keep results after they expire from Redis.")
+            else:
+                if 'history_cursors' not in st.session_state:
+                    st.session_state.history_cursors = [None]
+                
+                def reset_history():
+                    st.session_state.history_cursors = [None]
+                
+                status_filter = st.selectbox("Status", ["all", "processed", "cached", "failed", "cancelled"],
+                                             key="history_status", on_change=reset_history)
+                records, next_cursor = result_archive.page(
+                    count=20,
+                    before=st.session_state.history_cursors[-1],
+                    status=None if status_filter == "all" else status_filter,
+                )
+                
+                if records:
+                    st.dataframe(
+                        [{
+                            'Job': record['job_id'],
+                            'Status': record['status'],
+                            'Finished': datetime.fromtimestamp(record['finished_at']).strftime("%Y-%m-%d %H:%M:%S"),
+                            'Model': record.get('model', ''),
+                            'Tokens': record.get('total_tokens'),
+                            'Prompt': record.get('prompt', '')[:80],
+                        } for record in records],
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                    shown = st.selectbox("Show result", [record['job_id'] for record in records], key="history_job")
+                    record = next(record for record in records if record['job_id'] == shown)
+                    st.markdown(f"**Prompt:** {record.get('prompt', '')}")
+                    if record.get('error'):
+                        st.error(f"{record.get('error_class', 'Error')}: {record['error']}")
+                    if record.get('result'):
+                        st.markdown(f'<div class="result-card"><div class="result-content">{record["result"]}</div></div>',
+                                    unsafe_allow_html=True)
+                else:
+                    st.markdown("No archived results yet.")
+                
+                col_newer, col_page, col_older = st.columns([1, 2, 1])
+                with col_newer:
+                    if st.button("← Newer", disabled=len(st.session_state.history_cursors) == 1, key="history_newer"):
+                        st.session_state.history_cursors.pop()
+                        st.rerun(scope="fragment")
+                with col_page:
+                    st.markdown(f"<p style='text-align: center; color: #9ca3af;'>Page {len(st.session_state.history_cursors)} • {result_archive.count()} archived</p>", unsafe_allow_html=True)
+                with col_older:
+                    if st.button("Older →", disabled=next_cursor is None, key="history_older"):
+                        st.session_state.history_cursors.append(next_cursor)
+                        st.rerun(scope="fragment")
+        
+        with st.expander("☠️ Dead Letters", expanded=False):
+            # Jobs that failed permanently, ran out of retries or missed their deadline
+            dead = dead_letters(redis_client, count=20)
+            if dead:
+                st.dataframe(
+                    [{
+                        'Job': entry['job'].get('job_id'),
+                        'Reason': entry['reason'],
+                        'Error': entry['error_class'],
+                        'Attempts': entry['attempts'],
+                        'Failed': datetime.fromtimestamp(float(entry['failed_at'])).strftime("%H:%M:%S"),
+                        'Prompt': entry['job'].get('prompt', ''),
+                    } for entry in dead],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.markdown("No dead-lettered jobs.")
+
+render_ledger()
 
 # ============================================================================
 # HELM CHART GENERATOR
@@ -0,0 +1,257 @@
+"""
+GreenScale Archive - On-disk history of job results
+
+Result records only stay in Redis for RESULT_TTL seconds. store_result()
+also queues every finished job id on 'results:archive'; a ResultArchive
+drains that backlog every RESULT_ARCHIVE_INTERVAL seconds and copies the
+records into a SQLite file (RESULT_ARCHIVE_PATH) while they are still hot.
+Readers fall back to the archive once a record has expired, and the
+dashboard pages through it for history.
+
+Texts are stored zlib-compressed; the table is indexed by finish time (for
+paging) and by status. Rows older than RESULT_ARCHIVE_DAYS are deleted
+(0 = keep forever).
+
+Run one archiver per Redis: the dashboard starts one when
+RESULT_ARCHIVE_PATH is set, or run it on its own with:
+    python archive.py
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from results import ARCHIVE_QUEUE_KEY, get_results
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    prompt TEXT,
+    result BLOB,
+    error BLOB,
+    error_class TEXT,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS results_finished ON results (finished_at, job_id);
+CREATE INDEX IF NOT EXISTS results_status ON results (status, finished_at);
+"""
+
+COLUMNS = ("job_id", "status", "finished_at", "prompt", "result", "error", "error_class",
+           "model", "prompt_tokens", "completion_tokens", "total_tokens", "timings")
+
+
+def _pack(text: Optional[str]) -> Optional[bytes]:
+    return zlib.compress(text.encode("utf-8"), 6) if text else None
+
+
+def _unpack(blob: Optional[bytes]) -> str:
+    return zlib.decompress(blob).decode("utf-8") if blob else ""
+
+
+class ResultArchive:
+    """
+    SQLite archive of result records.
+
+    Args:
+        path: Database file (created if missing)
+        retention_days: Rows older than this are pruned (0 = never)
+        interval: Seconds between syncs of the background archiver
+        batch: Records moved per Redis round-trip when syncing
+    """
+
+    def __init__(self, path: str, retention_days: float = 30, interval: float = 10,
+                 batch: int = 500):
+        self.path = path
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            # WAL lets readers page while the archiver writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def add(self, records: List[Dict]):
+        """Insert (or replace) result records as returned by results.get_result()."""
+        rows = [(
+            record["job_id"],
+            record.get("status", ""),
+            record.get("finished_at", time.time()),
+            record.get("prompt"),
+            _pack(record.get("result")),
+            _pack(record.get("error")),
+            record.get("error_class"),
+            record.get("model"),
+            record.get("prompt_tokens"),
+            record.get("completion_tokens"),
+            record.get("total_tokens"),
+            json.dumps(record["timings"]) if record.get("timings") else None,
+        ) for record in records]
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+
+    def sync(self, client) -> int:
+        """
+        Move the oldest queued records from Redis into the archive, one batch
+        at a time until the backlog is empty. Ids whose record already
+        expired are dropped.
+
+        Returns:
+            Number of records archived
+        """
+        archived = 0
+        while True:
+            job_ids = client.lrange(ARCHIVE_QUEUE_KEY, -self.batch, -1)
+            if not job_ids:
+                return archived
+            records = [record for record in get_results(client, job_ids) if record]
+            self.add(records)
+            # Ids are pushed at the head, so the ones just copied are still the tail
+            client.ltrim(ARCHIVE_QUEUE_KEY, 0, -len(job_ids) - 1)
+            archived += len(records)
+            if len(job_ids) < self.batch:
+                return archived
+
+    def prune(self) -> int:
+        """Delete rows past the retention period."""
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM results WHERE finished_at < ?", (cutoff,)).rowcount
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = {key: row[key] for key in row.keys() if row[key] is not None}
+        record["result"] = _unpack(row["result"])
+        if row["error"]:
+            record["error"] = _unpack(row["error"])
+        if row["timings"]:
+            record["timings"] = json.loads(row["timings"])
+        return record
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """An archived record, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM results WHERE job_id = ?", (job_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def page(self, count: int = 20, before: Optional[Tuple[float, str]] = None,
+             status: Optional[str] = None) -> Tuple[List[Dict], Optional[Tuple[float, str]]]:
+        """
+        A page of records, newest first.
+
+        Args:
+            count: Records per page
+            before: Cursor returned for the previous page (None = newest)
+            status: Only records with this status
+
+        Returns:
+            The records and the cursor of the next (older) page, or None if
+            this is the last one
+        """
+        query, params = "SELECT * FROM results WHERE 1=1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if before:
+            query += " AND (finished_at, job_id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY finished_at DESC, job_id DESC LIMIT ?"
+        params.append(count + 1)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        records = [self._record(row) for row in rows[:count]]
+        cursor = (records[-1]["finished_at"], records[-1]["job_id"]) if len(rows) > count else None
+        return records, cursor
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Background archiver
+    # ------------------------------------------------------------------
+    def run(self, client):
+        """Sync every `interval` seconds (and prune hourly) until stop()."""
+        while not self._stop.is_set():
+            try:
+                archived = self.sync(client)
+                if archived:
+                    print(f"[Archive] Archived {archived} result(s)")
+            except redis.RedisError as e:
+                print(f"[Archive] Sync failed: {str(e)}")
+            if time.time() - self._last_prune >= 3600:
+                self._last_prune = time.time()
+                pruned = self.prune()
+                if pruned:
+                    print(f"[Archive] Pruned {pruned} result(s) older than {self.retention_days} days")
+            self._stop.wait(self.interval)
+
+    def start(self, client) -> "ResultArchive":
+        """Start the archiver thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, args=(client,),
+                                            name="result-archive", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def archive_from_env() -> Optional[ResultArchive]:
+    """Open the archive at RESULT_ARCHIVE_PATH; None when it is not set."""
+    path = os.getenv("RESULT_ARCHIVE_PATH", "")
+    if not path:
+        return None
+    return ResultArchive(
+        path,
+        retention_days=float(os.getenv("RESULT_ARCHIVE_DAYS", 30)),
+        interval=float(os.getenv("RESULT_ARCHIVE_INTERVAL", 10)),
+    )
+
+
+def main():
+    archive = archive_from_env()
+    if archive is None:
+        raise SystemExit("RESULT_ARCHIVE_PATH is not set")
+    client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+    )
+    print(f"[Archive] Archiving results to {archive.path} every {archive.interval:.0f}s")
+    archive.run(client)
+
+
+if __name__ == "__main__":
+    main()
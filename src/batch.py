@@ -0,0 +1,267 @@
+"""
+GreenScale Batch - Run a JSONL file of prompts through the workers
+
+Streams a JSONL input (one object per line with a 'prompt' field, or
+'body'/'title' as in requests.jsonl; 'id' or 'request_id' names the row),
+keeps up to --max-in-flight of its rows on the job queue, enqueued in
+pipelined chunks, and appends each result to an output JSONL as soon as the
+ledger reports the job finished. The input is never loaded as a whole, and
+the workers scale on the queued backlog like for any other job.
+
+Output rows are written in completion order:
+    {"line": 12, "id": "...", "job_id": "...", "status": "processed", "result": "...",
+     "model": "...", "prompt_tokens": 31, "completion_tokens": 180, "total_tokens": 211}
+Failed rows carry "error" and "error_class" instead of a result.
+
+Progress is kept in '<output>.checkpoint': the in-flight jobs and the ledger
+position. A killed run restarted with the same arguments skips the rows
+already in the output, re-attaches to the jobs still in flight and submits
+the rest. Delivery is at-least-once: a row submitted just before the kill
+and not yet checkpointed is submitted again (usually a cache hit). With
+--retry-failed, failed and cancelled rows are submitted again and their new
+outcome is appended; the last row for a line is the one that counts.
+
+Usage:
+    python batch.py prompts.jsonl --output results.jsonl --max-in-flight 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Dict, Iterator, Set, Tuple
+
+import redis
+
+from job_queue import queue_from_env
+from results import get_results
+from stats import LEDGER_KEY
+
+# Result record fields copied into each output row (see results.py)
+OUTPUT_FIELDS = ("result", "error", "error_class", "model", "prompt_tokens",
+                 "completion_tokens", "total_tokens")
+
+
+def read_rows(path: str, skip: Set[int]) -> Iterator[Tuple[int, str, str]]:
+    """
+    Stream (line number, row id, prompt) from a JSONL file, skipping lines in
+    `skip`. A row without a prompt is yielded with an empty prompt.
+    """
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if line_no in skip or not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = {}
+            if not isinstance(row, dict):
+                row = {}
+            prompt = row.get("prompt") or row.get("body") or row.get("title") or ""
+            row_id = row.get("id") or row.get("request_id") or line_no
+            yield line_no, str(row_id), str(prompt).strip()
+
+
+def load_output(path: str, retry_failed: bool = False) -> Set[int]:
+    """
+    Input lines already answered in an output file. A partly written last
+    row (from a killed run) is cut off so appending starts on a clean line.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        valid = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            valid += len(raw)
+            row = json.loads(raw)
+            if retry_failed and row["status"] in ("failed", "cancelled"):
+                continue
+            done.add(row["line"])
+        f.truncate(valid)
+    return done
+
+
+class Checkpoint:
+    """
+    Jobs in flight and the ledger position of a run, saved atomically.
+
+    Args:
+        path: Checkpoint file
+        input_path: Input the run reads (a checkpoint for another input is refused)
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.run_id = uuid.uuid4().hex[:6]
+        self.ledger_id = None
+        # job id -> {"line", "id", "submitted_at"}
+        self.in_flight: Dict[str, dict] = {}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        if state["input"] != self.input_path:
+            raise ValueError(f"{self.path} belongs to {state['input']}, not {self.input_path}")
+        self.run_id = state["run_id"]
+        self.ledger_id = state["ledger_id"]
+        self.in_flight = state["in_flight"]
+        return True
+
+    def save(self):
+        state = {
+            "input": self.input_path,
+            "run_id": self.run_id,
+            "ledger_id": self.ledger_id,
+            "in_flight": self.in_flight,
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run(client, queue, args) -> Dict[str, int]:
+    """Process the whole input; returns counts per outcome."""
+    checkpoint = Checkpoint(f"{args.output}.checkpoint", args.input)
+    resumed = checkpoint.load()
+    done = load_output(args.output, retry_failed=args.retry_failed)
+    # Finished after the last checkpoint, before the kill
+    checkpoint.in_flight = {job_id: job for job_id, job in checkpoint.in_flight.items()
+                            if job["line"] not in done}
+    if checkpoint.ledger_id is None:
+        # Only ledger entries written after this point can belong to this run
+        latest = client.xrevrange(LEDGER_KEY, count=1)
+        checkpoint.ledger_id = latest[0][0] if latest else "0"
+    if resumed:
+        print(f"[Batch] Resuming run {checkpoint.run_id}: {len(done)} row(s) done, "
+              f"{len(checkpoint.in_flight)} in flight")
+
+    skip = done | {job["line"] for job in checkpoint.in_flight.values()}
+    rows = read_rows(args.input, skip)
+    exhausted = False
+    counts = {"submitted": 0, "timed_out": 0}
+    started = last_save = last_report = time.time()
+
+    with open(args.output, "a") as out:
+        def write(row: dict):
+            out.write(json.dumps(row) + "\n")
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+
+        while True:
+            # Top up the in-flight window, one pipelined enqueue per chunk
+            while not exhausted and len(checkpoint.in_flight) < args.max_in_flight:
+                chunk = []
+                room = min(args.chunk, args.max_in_flight - len(checkpoint.in_flight))
+                for line_no, row_id, prompt in rows:
+                    if not prompt:
+                        write({"line": line_no, "id": row_id, "status": "invalid",
+                               "error": "Row has no prompt"})
+                        continue
+                    job_id = f"batch-{checkpoint.run_id}-{line_no}"
+                    chunk.append({"job_id": job_id, "prompt": prompt,
+                                  "priority": args.priority, "tenant": args.tenant})
+                    checkpoint.in_flight[job_id] = {"line": line_no, "id": row_id,
+                                                    "submitted_at": time.time()}
+                    if len(chunk) >= room:
+                        break
+                else:
+                    exhausted = True
+                if chunk:
+                    queue.enqueue_many(chunk)
+                    counts["submitted"] += len(chunk)
+
+            if exhausted and not checkpoint.in_flight:
+                break
+
+            # Collect finished jobs of this run from the ledger
+            finished = []
+            response = client.xread({LEDGER_KEY: checkpoint.ledger_id}, block=1000, count=1000)
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    checkpoint.ledger_id = entry_id
+                    job_id = fields.get("job_id")
+                    if job_id in checkpoint.in_flight:
+                        finished.append((job_id, checkpoint.in_flight.pop(job_id), fields["status"]))
+            records = get_results(client, [job_id for job_id, _, _ in finished])
+            for (job_id, job, status), record in zip(finished, records):
+                row = {"line": job["line"], "id": job["id"], "job_id": job_id, "status": status}
+                for field in OUTPUT_FIELDS:
+                    if record and record.get(field) is not None:
+                        row[field] = record[field]
+                write(row)
+
+            # Jobs that never finished are left for the next run
+            now = time.time()
+            for job_id, job in list(checkpoint.in_flight.items()):
+                if now - job["submitted_at"] > args.job_timeout:
+                    del checkpoint.in_flight[job_id]
+                    counts["timed_out"] += 1
+
+            if now - last_save >= args.checkpoint_every:
+                out.flush()
+                os.fsync(out.fileno())
+                checkpoint.save()
+                last_save = now
+            if now - last_report >= 10:
+                written = sum(v for k, v in counts.items() if k not in ("submitted", "timed_out"))
+                print(f"[Batch] {written} written, {len(checkpoint.in_flight)} in flight, "
+                      f"{written / (now - started):.1f} rows/s")
+                last_report = now
+
+    if counts["timed_out"]:
+        # Keep the ledger position; the next run re-submits the missing rows
+        checkpoint.in_flight = {}
+        checkpoint.save()
+    else:
+        checkpoint.remove()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through GreenScale")
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("--output", help="Results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Rows queued or running at once")
+    parser.add_argument("--chunk", type=int, default=200, help="Rows per pipelined enqueue")
+    parser.add_argument("--priority", default="batch", help="Lane for the jobs (QUEUE_BACKEND=fair)")
+    parser.add_argument("--tenant", default="batch", help="Tenant for the jobs (QUEUE_BACKEND=fair)")
+    parser.add_argument("--job-timeout", type=float, default=3600,
+                        help="Seconds after which an unfinished row is left for the next run")
+    parser.add_argument("--checkpoint-every", type=float, default=5, help="Seconds between checkpoints")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Submit rows again that the output records as failed or cancelled")
+    args = parser.parse_args()
+    args.output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+
+    client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "redis-service"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+    )
+    queue = queue_from_env(client)
+
+    print(f"[Batch] {args.input} -> {args.output} (up to {args.max_in_flight} rows in flight)")
+    started = time.time()
+    counts = run(client, queue, args)
+    summary = ", ".join(f"{count} {name}" for name, count in counts.items() if count)
+    print(f"[Batch] Finished in {time.time() - started:.1f}s: {summary or 'nothing to do'}")
+    if counts["timed_out"]:
+        print(f"[Batch] {counts['timed_out']} row(s) did not finish within {args.job_timeout}s; "
+              f"run again to retry them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
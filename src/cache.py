@@ -0,0 +1,247 @@
+"""
+GreenScale Response Cache - Skip the LLM call for repeated prompts
+
+Two tiers, checked in order:
+1. Exact match: SHA-256 of the normalized prompt + model + temperature +
+   max_tokens, stored in Redis with a TTL. A sorted set tracks last access
+   time and evicts the least recently used entries beyond CACHE_MAX_ENTRIES;
+   entries not used for CACHE_TTL have expired and are dropped from it first.
+2. Semantic (optional, CACHE_SEMANTIC=true): the prompt is embedded and
+   compared by cosine similarity against a local in-process vector index.
+   Vectors are kept in Redis too, so every pod can rebuild its index. The
+   vector of a missed lookup is kept for storing the response, so a prompt
+   is embedded once.
+
+The dashboard checks the exact tier before enqueueing, so a hit never wakes
+a worker; workers check both tiers before calling the API.
+
+Redis keys:
+- cache:{hash}       cached response text (expires after CACHE_TTL)
+- cache:lru          sorted set of hashes scored by last access time
+- cache:embeddings   hash of hash -> JSON vector for the semantic tier
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from inference import DEFAULT_MAX_TOKENS, DEFAULT_MODEL, DEFAULT_TEMPERATURE
+
+LRU_KEY = "cache:lru"
+EMBEDDINGS_KEY = "cache:embeddings"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode-normalize, trim and collapse whitespace."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", prompt)).strip()
+
+
+def cache_key(prompt: str, model: str = DEFAULT_MODEL,
+              temperature: float = DEFAULT_TEMPERATURE,
+              max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """Stable hash of everything that determines the response."""
+    material = json.dumps([normalize_prompt(prompt), model, temperature, max_tokens])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class VectorIndex:
+    """Minimal thread-safe cosine-similarity index over unit vectors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._vectors: List[List[float]] = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _unit(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def add(self, key: str, vector: List[float]):
+        unit = self._unit(vector)
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.append(key)
+            self._vectors.append(unit)
+
+    def replace(self, items):
+        """Swap in a fresh set of (key, vector) pairs."""
+        keys, vectors = [], []
+        for key, vector in items:
+            keys.append(key)
+            vectors.append(self._unit(vector))
+        with self._lock:
+            self._keys, self._vectors = keys, vectors
+
+    def remove(self, key: str):
+        with self._lock:
+            if key in self._keys:
+                i = self._keys.index(key)
+                del self._keys[i]
+                del self._vectors[i]
+
+    def nearest(self, vector: List[float]):
+        """Return (key, similarity) of the closest vector, or (None, 0.0)."""
+        query = self._unit(vector)
+        best_key, best_score = None, 0.0
+        with self._lock:
+            for key, candidate in zip(self._keys, self._vectors):
+                score = sum(a * b for a, b in zip(query, candidate))
+                if score > best_score:
+                    best_key, best_score = key, score
+        return best_key, best_score
+
+
+class ResponseCache:
+    """
+    Redis-backed response cache with an optional semantic tier.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        ttl: Seconds a cached response lives
+        max_entries: LRU bound on the number of cached responses
+        embed: Callable returning an embedding for a text; enables the semantic tier
+        similarity_threshold: Minimum cosine similarity for a semantic hit
+        index_refresh: Seconds between rebuilds of the local index from Redis
+        pending_vectors: Vectors of missed lookups kept until their response is stored
+    """
+
+    def __init__(self, client, ttl: int = 3600, max_entries: int = 10000,
+                 embed: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = 0.95, index_refresh: int = 60,
+                 pending_vectors: int = 1024):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.index_refresh = index_refresh
+        self.index = VectorIndex() if embed else None
+        self._index_loaded_at = 0.0
+        # cache key -> vector of a lookup that missed, oldest first
+        self._pending: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending_max = pending_vectors
+        self._pending_lock = threading.Lock()
+
+    def get(self, prompt: str, **params) -> Optional[str]:
+        """Return a cached response for the prompt, trying exact then semantic."""
+        key = cache_key(prompt, **params)
+        response = self._get_exact(key)
+        if response is not None or self.index is None:
+            return response
+        return self._get_semantic(prompt, key)
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        response = self.client.get(f"cache:{key}")
+        if response is not None:
+            self.client.zadd(LRU_KEY, {key: time.time()})
+        return response
+
+    def _get_semantic(self, prompt: str, prompt_key: str) -> Optional[str]:
+        self._load_index()
+        if not len(self.index):
+            return None
+        try:
+            vector = self.embed(normalize_prompt(prompt))
+        except Exception as e:
+            print(f"[Cache] Embedding failed, skipping semantic lookup: {str(e)}")
+            return None
+
+        key, score = self.index.nearest(vector)
+        response = None
+        if key is not None and score >= self.similarity_threshold:
+            response = self._get_exact(key)
+            if response is None:
+                # Expired or evicted since it was indexed
+                self.index.remove(key)
+                self.client.hdel(EMBEDDINGS_KEY, key)
+        if response is None:
+            self._keep_vector(prompt_key, vector)
+        return response
+
+    def _keep_vector(self, key: str, vector: List[float]):
+        with self._pending_lock:
+            self._pending[key] = vector
+            self._pending.move_to_end(key)
+            while len(self._pending) > self._pending_max:
+                self._pending.popitem(last=False)
+
+    def _take_vector(self, key: str) -> Optional[List[float]]:
+        with self._pending_lock:
+            return self._pending.pop(key, None)
+
+    def set(self, prompt: str, response: str, **params):
+        """Cache a successful response and evict the least recently used overflow."""
+        key = cache_key(prompt, **params)
+        now = time.time()
+        # An entry's key expires at most CACHE_TTL after its last use, so
+        # entries scored before that are gone already
+        expired_before = now - self.ttl
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(f"cache:{key}", response, ex=self.ttl)
+        pipe.zadd(LRU_KEY, {key: now})
+        pipe.zrangebyscore(LRU_KEY, "-inf", expired_before)
+        pipe.zremrangebyscore(LRU_KEY, "-inf", expired_before)
+        pipe.zcard(LRU_KEY)
+        _, _, expired, _, size = pipe.execute()
+
+        evicted = []
+        if size > self.max_entries:
+            evicted = [k for k, _ in self.client.zpopmin(LRU_KEY, size - self.max_entries)]
+            if evicted:
+                self.client.delete(*[f"cache:{k}" for k in evicted])
+        if expired or evicted:
+            self.client.hdel(EMBEDDINGS_KEY, *expired, *evicted)
+            if self.index is not None:
+                for k in expired + evicted:
+                    self.index.remove(k)
+
+        if self.index is not None:
+            self._load_index()
+            vector = self._take_vector(key)
+            try:
+                if vector is None:
+                    vector = self.embed(normalize_prompt(prompt))
+            except Exception as e:
+                print(f"[Cache] Embedding failed, entry is exact-match only: {str(e)}")
+                return
+            self.client.hset(EMBEDDINGS_KEY, key, json.dumps(vector))
+            self.index.add(key, vector)
+
+    def _load_index(self):
+        # Periodically rebuild this pod's index from vectors written by every pod
+        if self._index_loaded_at and time.monotonic() - self._index_loaded_at < self.index_refresh:
+            return
+        self._index_loaded_at = time.monotonic()
+        raw = self.client.hgetall(EMBEDDINGS_KEY)
+        self.index.replace((key, json.loads(vector)) for key, vector in raw.items())
+
+
+def cache_from_env(client, embed: Optional[Callable[[str], List[float]]] = None) -> Optional[ResponseCache]:
+    """
+    Build the response cache from CACHE_* environment variables.
+    Returns None when CACHE_ENABLED=false; the semantic tier is only enabled
+    when CACHE_SEMANTIC=true and an embed callable is given.
+    """
+    if os.getenv("CACHE_ENABLED", "true").lower() != "true":
+        return None
+    semantic = os.getenv("CACHE_SEMANTIC", "false").lower() == "true"
+    return ResponseCache(
+        client,
+        ttl=int(os.getenv("CACHE_TTL", 3600)),
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+        embed=embed if semantic else None,
+        similarity_threshold=float(os.getenv("CACHE_SIMILARITY_THRESHOLD", 0.95)),
+        index_refresh=int(os.getenv("CACHE_INDEX_REFRESH", 60)),
+    )
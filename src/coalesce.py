@@ -0,0 +1,159 @@
+"""
+GreenScale Request Coalescing - One inference per burst of identical prompts
+
+The first job for a prompt key becomes the leader and sets an in-flight
+marker in Redis. Identical jobs that arrive on any pod while the marker
+exists attach themselves to a waiters list and are acked straight away,
+without using a worker slot. When the leader finishes it clears the marker,
+takes the waiters list and writes the same result to every waiting job.
+
+Both steps are Lua scripts, so a follower can never attach after the leader
+has collected the waiters. The marker and the waiters list expire after
+COALESCE_TTL seconds unless refreshed: the leader's pod refreshes them while
+the job runs (refresh(), from the worker's maintenance loop), and a leader
+rescheduled for a retry extends them past its backoff. If the leader's pod
+dies, its re-queued job becomes leader again (the marker holds its job id)
+and still answers the followers.
+
+Redis keys:
+- inflight:{hash}           job id of the leader for that prompt key
+- inflight:{hash}:waiters   job ids attached to the leader
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from cache import cache_key
+
+# Returns 1 if job becomes (or already is) the leader, 0 if it attached as a waiter.
+# The waiters list never expires before the marker it belongs to.
+JOIN_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return 1
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], math.max(tonumber(ARGV[2]), redis.call('TTL', KEYS[1])))
+return 0
+"""
+
+# Sets the marker and waiters TTL to ARGV[2] if the marker is still held by this leader
+REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Clears the marker and returns the waiting job ids if still held by this leader;
+# anyone else (a job whose marker lapsed and was taken over) gets no waiters
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {}
+end
+redis.call('DEL', KEYS[1])
+local waiters = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+return waiters
+"""
+
+
+class SingleFlight:
+    """
+    Cross-pod single-flight deduplication of identical prompts.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        ttl: Seconds an in-flight marker lives without a refresh (how long
+            followers of a leader whose pod died keep waiting for its retry)
+    """
+
+    def __init__(self, client, ttl: int = 120):
+        self.client = client
+        self.ttl = ttl
+        self._join = client.register_script(JOIN_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._refresh = client.register_script(REFRESH_SCRIPT)
+        # Jobs this process currently leads: job id -> marker keys
+        self._led: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(prompt: str, **params) -> List[str]:
+        marker = f"inflight:{cache_key(prompt, **params)}"
+        return [marker, f"{marker}:waiters"]
+
+    def join(self, prompt: str, job_id: str, **params) -> bool:
+        """
+        Returns:
+            True if this job should call the API, False if it is attached to
+            an identical in-flight job and will get that job's result
+        """
+        keys = self._keys(prompt, **params)
+        leader = bool(self._join(keys=keys, args=[job_id, self.ttl]))
+        if leader:
+            with self._lock:
+                self._led[job_id] = keys
+        return leader
+
+    def release(self, prompt: str, job_id: str, **params) -> List[str]:
+        """
+        Finish as leader; returns the job ids that must receive the same
+        result (none if `job_id` does not hold the marker).
+        """
+        with self._lock:
+            self._led.pop(job_id, None)
+        return list(self._release(keys=self._keys(prompt, **params), args=[job_id]))
+
+    def refresh(self) -> int:
+        """
+        Renew the markers of every job this process leads (one pipelined
+        round-trip); must run more often than every `ttl` seconds.
+
+        Returns:
+            Number of markers still held
+        """
+        with self._lock:
+            led = list(self._led.items())
+        if not led:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for job_id, keys in led:
+            self._refresh(keys=keys, args=[job_id, self.ttl], client=pipe)
+        return sum(pipe.execute())
+
+    def extend(self, prompt: str, job_id: str, seconds: float, **params) -> bool:
+        """
+        Keep leading while the job leaves this process for `seconds` (a
+        retry backoff): the marker outlives the wait by `ttl`, and the job
+        leads again when it is claimed.
+
+        Returns:
+            False if the marker was already lost
+        """
+        with self._lock:
+            self._led.pop(job_id, None)
+        ttl = int(seconds) + 1 + self.ttl
+        return bool(self._refresh(keys=self._keys(prompt, **params), args=[job_id, ttl]))
+
+    def forget(self, job_id: str):
+        """
+        Stop refreshing a job's marker without touching Redis, for a leader
+        that leaves without release() or extend(); the marker lapses after `ttl`.
+        """
+        with self._lock:
+            self._led.pop(job_id, None)
+
+
+def single_flight_from_env(client) -> Optional[SingleFlight]:
+    """Build the coalescer from COALESCE_* environment variables (None when disabled)."""
+    if os.getenv("COALESCE_ENABLED", "true").lower() != "true":
+        return None
+    return SingleFlight(client, ttl=int(os.getenv("COALESCE_TTL", 120)))
@@ -0,0 +1,199 @@
+"""
+GreenScale Hedging - Speculative duplicate upstream requests to cut tail latency
+
+Upstream latency has a long tail: most calls start answering quickly, a few
+sit for many seconds before the first byte. With hedging on, a call that has
+not produced its first byte within the recent HEDGE_PERCENTILE of time to
+first byte gets an identical second request. Whichever answers first is
+used; the other is cancelled (a streaming loser has its connection closed,
+which stops generation upstream; a non-streaming loser is left to finish
+and its answer is dropped).
+
+Hedges are extra upstream load, so they are budgeted: every request earns
+HEDGE_MAX_FRACTION of a hedge and a hedge spends one, which caps hedged
+requests at that fraction of all requests over time. With the shared rate
+limiter on, a hedge is only sent when capacity is free right away.
+
+Hedges never queue: calls run on a pool with one thread per in-flight job
+plus HEDGE_MAX_IN_FLIGHT spare threads. A hedge takes a spare thread and
+keeps it until both calls of its race have finished (a non-streaming loser
+can't be cancelled and runs until INFERENCE_TIMEOUT), and is skipped when
+none is free. Primaries therefore always find a thread, and a pod makes at
+most WORKER_CONCURRENCY + HEDGE_MAX_IN_FLIGHT upstream calls at once.
+
+The trigger delay is learned per pod from the last HEDGE_WINDOW calls and
+is never below HEDGE_MIN_DELAY; until HEDGE_MIN_SAMPLES calls have been
+seen, nothing is hedged.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Tuple
+
+
+class Hedger:
+    """
+    Races a delayed duplicate against slow upstream calls.
+
+    Args:
+        percentile: Time-to-first-byte percentile after which a call is hedged
+        max_fraction: Largest share of requests that may be hedged
+        min_delay: Lower bound of the hedge delay (seconds)
+        min_samples: Calls observed before hedging starts
+        window: Recent calls the percentile is computed over
+        burst: Hedges that may be saved up while calls are fast
+        calls: Primary calls in flight at most (the worker's concurrency)
+        spare: Races with a hedge that may run at once, losers winding down included
+        limiter: Shared upstream RateLimiter; hedges only use capacity free right away
+    """
+
+    def __init__(self, percentile: float = 95, max_fraction: float = 0.05,
+                 min_delay: float = 0.2, min_samples: int = 20, window: int = 500,
+                 burst: float = 10, calls: int = 8, spare: int = 8, limiter=None):
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.burst = burst
+        self.limiter = limiter
+        self._samples = deque(maxlen=window)
+        self._credit = 0.0
+        self._lock = threading.Lock()
+        self._spare = threading.BoundedSemaphore(max(1, spare))
+        self._pool = ThreadPoolExecutor(max_workers=calls + max(1, spare), thread_name_prefix="upstream")
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for a first byte before hedging, or None while still learning."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+
+    def observe(self, seconds: float):
+        """Record the time to first byte of a finished call."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def _earn(self):
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.max_fraction)
+
+    def _spend(self, tokens: int) -> bool:
+        """Take a spare thread, a hedge credit and rate-limit capacity, or none of them."""
+        if not self._spare.acquire(blocking=False):
+            return False
+        with self._lock:
+            if self._credit < 1:
+                self._spare.release()
+                return False
+            self._credit -= 1
+        if self.limiter is not None and not self.limiter.acquire(tokens, timeout=0):
+            with self._lock:
+                self._credit += 1
+            self._spare.release()
+            return False
+        return True
+
+    def _hold_spare(self, futures):
+        """Give the spare thread back once every call of the race has finished."""
+        left = [len(futures)]
+
+        def finished(_future):
+            with self._lock:
+                left[0] -= 1
+                if left[0]:
+                    return
+            self._spare.release()
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    def race(self, attempt: Callable, cancel: Optional[Callable] = None,
+             tokens: int = 0) -> Tuple[object, Optional[str]]:
+        """
+        Run `attempt` (an upstream call up to its first byte) and hedge it
+        with a second `attempt` if it is slow.
+
+        Args:
+            attempt: Starts one call; returns a handle once the first byte is in
+            cancel: Called with the losing handle, if it ever succeeds
+            tokens: Estimated tokens of a call, for the rate limiter
+
+        Returns:
+            The winning handle and who won: None when no hedge was sent,
+            else "primary" or "hedge". If every attempt fails, the last
+            error is raised.
+        """
+        self._earn()
+        delay = self.delay()
+        if delay is None:
+            started = time.monotonic()
+            handle = attempt()
+            self.observe(time.monotonic() - started)
+            return handle, None
+
+        def timed():
+            started = time.monotonic()
+            handle = attempt()
+            return handle, time.monotonic() - started
+
+        primary = self._pool.submit(timed)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._spend(tokens):
+            handle, elapsed = primary.result()
+            self.observe(elapsed)
+            return handle, None
+
+        hedge = self._pool.submit(timed)
+        self._hold_spare([primary, hedge])
+        names = {primary: "primary", hedge: "hedge"}
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = None
+            for future in done:
+                try:
+                    handle, elapsed = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if winner is None:
+                    winner = (handle, names[future])
+                    self.observe(elapsed)
+                elif cancel:
+                    cancel(handle)
+            if winner is not None:
+                for future in pending:
+                    future.add_done_callback(lambda f: self._cancel_late(f, cancel))
+                return winner
+        raise error
+
+    @staticmethod
+    def _cancel_late(future, cancel: Optional[Callable]):
+        if cancel and future.exception() is None:
+            cancel(future.result()[0])
+
+
+def hedger_from_env(limiter=None, calls: int = 8) -> Optional[Hedger]:
+    """
+    Build the hedger from HEDGE_* settings for a worker running up to
+    `calls` jobs at once; None when HEDGE_ENABLED is false.
+    """
+    if os.getenv("HEDGE_ENABLED", "false").lower() != "true":
+        return None
+    return Hedger(
+        percentile=float(os.getenv("HEDGE_PERCENTILE", 95)),
+        max_fraction=float(os.getenv("HEDGE_MAX_FRACTION", 0.05)),
+        min_delay=float(os.getenv("HEDGE_MIN_DELAY", 0.2)),
+        min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", 20)),
+        window=int(os.getenv("HEDGE_WINDOW", 500)),
+        calls=calls,
+        spare=int(os.getenv("HEDGE_MAX_IN_FLIGHT", calls)),
+        limiter=limiter,
+    )
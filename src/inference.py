@@ -0,0 +1,266 @@
+"""
+GreenScale Inference Client - Pooled connection to the Neysa chat-completions API
+
+Every worker job used to call requests.post() directly, paying a fresh TCP+TLS
+handshake to boomai-llama.neysa.io each time. This client keeps a pool of
+keep-alive connections per worker pod and can pre-warm it at startup, so the
+first job after a scale-from-zero does not pay for handshakes either.
+
+Transports:
+- requests.Session with a sized HTTPAdapter pool (default, HTTP/1.1)
+- httpx.Client with HTTP/2 when INFERENCE_HTTP2=true and httpx[http2] is installed
+
+chat_stream() uses the streaming (server-sent events) mode of the API and
+yields text deltas as they arrive; closing the stream cancels the request.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# httpx is only imported by HTTP/2 clients, so HTTP/1.1 workers start faster
+httpx = None
+
+_TRANSPORT_ERRORS = (requests.exceptions.RequestException,)
+
+
+def _import_httpx():
+    """Import httpx on first use; None when it is not installed (HTTP/2 is optional)."""
+    global httpx, _TRANSPORT_ERRORS
+    if httpx is None:
+        try:
+            import httpx as module
+        except ImportError:
+            return None
+        httpx = module
+        _TRANSPORT_ERRORS += (module.HTTPError,)
+    return httpx
+
+
+DEFAULT_MODEL = "meta-llama/Llama-3.3-70B-Instruct"
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 200
+
+
+class InferenceError(Exception):
+    """Raised when the upstream call fails (transport error or non-2xx status)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _http_error(response, url: str) -> InferenceError:
+    """InferenceError for a non-2xx response, keeping its Retry-After (seconds) if any."""
+    try:
+        retry_after = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        retry_after = None
+    return InferenceError(
+        f"{response.status_code} Error for url: {url}",
+        status_code=response.status_code,
+        retry_after=retry_after,
+    )
+
+
+class ChatStream:
+    """
+    Iterator over the text deltas of a streaming chat completion.
+
+    `usage` is filled in from the final chunk when the server reports it,
+    `model` from the first chunk that names it.
+    close() drops the connection, which stops generation upstream.
+    """
+
+    def __init__(self, response, lines, closer):
+        self.response = response
+        self.usage = {}
+        self.model = None
+        self._lines = lines
+        self._closer = closer
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            for line in self._lines:
+                if isinstance(line, bytes):
+                    line = line.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    self.usage = chunk["usage"]
+                if self.model is None:
+                    self.model = chunk.get("model")
+                for choice in chunk.get("choices", []):
+                    delta = choice.get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except _TRANSPORT_ERRORS as e:
+            if not self._closed:
+                raise InferenceError(str(e)) from e
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._closer()
+
+
+class InferenceClient:
+    """
+    Thread-safe chat-completions client backed by a connection pool.
+
+    Args:
+        api_url: Full chat-completions endpoint URL
+        api_key: Bearer token for the API
+        pool_size: Max pooled connections (should cover the worker's concurrency)
+        keep_alive: Reuse connections between requests
+        http2: Use HTTP/2 through httpx when available
+        timeout: Per-request timeout in seconds
+        embeddings_url: Embeddings endpoint, used by the semantic cache
+        embeddings_model: Model name sent to the embeddings endpoint
+    """
+
+    def __init__(self, api_url: str, api_key: str, pool_size: int = 10,
+                 keep_alive: bool = True, http2: bool = False, timeout: float = 60,
+                 embeddings_url: Optional[str] = None, embeddings_model: Optional[str] = None):
+        self.api_url = api_url
+        self.embeddings_url = embeddings_url
+        self.embeddings_model = embeddings_model
+        self.pool_size = max(1, pool_size)
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+
+        if http2 and _import_httpx() is None:
+            print("[Inference] INFERENCE_HTTP2 requested but httpx is not installed; using HTTP/1.1")
+        self.http2 = bool(http2 and httpx is not None)
+
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size if keep_alive else 0,
+                ),
+            )
+        else:
+            self._client = requests.Session()
+            self._client.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+
+    def chat(self, prompt: str, model: str = DEFAULT_MODEL,
+             temperature: float = DEFAULT_TEMPERATURE, max_tokens: int = DEFAULT_MAX_TOKENS) -> dict:
+        """Send a single-turn chat completion and return the decoded JSON body."""
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        return self._post(self.api_url, payload)
+
+    def chat_stream(self, prompt: str, model: str = DEFAULT_MODEL,
+                    temperature: float = DEFAULT_TEMPERATURE,
+                    max_tokens: int = DEFAULT_MAX_TOKENS) -> ChatStream:
+        """Start a streaming chat completion; iterate the result for text deltas."""
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        try:
+            if self.http2:
+                context = self._client.stream("POST", self.api_url, json=payload, timeout=self.timeout)
+                response = context.__enter__()
+                closer = lambda: context.__exit__(None, None, None)
+                lines = response.iter_lines()
+            else:
+                response = self._client.post(self.api_url, json=payload, timeout=self.timeout, stream=True)
+                closer = response.close
+                lines = response.iter_lines()
+        except _TRANSPORT_ERRORS as e:
+            raise InferenceError(str(e)) from e
+
+        if response.status_code >= 400:
+            closer()
+            raise _http_error(response, self.api_url)
+        return ChatStream(response, lines, closer)
+
+    def embed(self, text: str) -> list:
+        """Return the embedding vector for a text from the embeddings endpoint."""
+        if not self.embeddings_url:
+            raise InferenceError("No embeddings endpoint configured (NEYSA_EMBEDDINGS_URL)")
+        payload = {"input": text}
+        if self.embeddings_model:
+            payload["model"] = self.embeddings_model
+        return self._post(self.embeddings_url, payload)["data"][0]["embedding"]
+
+    def _post(self, url: str, payload: dict) -> dict:
+        try:
+            response = self._client.post(url, json=payload, timeout=self.timeout)
+        except _TRANSPORT_ERRORS as e:
+            raise InferenceError(str(e)) from e
+
+        if response.status_code >= 400:
+            raise _http_error(response, url)
+        return response.json()
+
+    def warm(self, connections: int = 1) -> bool:
+        """
+        Open connections ahead of the first job so its latency excludes
+        DNS, TCP and TLS setup. Any HTTP status counts as warm - only a
+        transport failure means the upstream is unreachable.
+        """
+        connections = max(1, min(connections, self.pool_size))
+
+        def _open(_):
+            try:
+                self._client.head(self.api_url, timeout=self.timeout)
+                return True
+            except Exception as e:
+                print(f"[Inference] Pre-warm failed: {str(e)}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            return all(pool.map(_open, range(connections)))
+
+    def close(self):
+        self._client.close()
+
+
+def client_from_env(api_url: str, api_key: str, default_pool_size: int = 10) -> InferenceClient:
+    """Build a client from INFERENCE_* environment variables."""
+    return InferenceClient(
+        api_url=api_url,
+        api_key=api_key,
+        pool_size=int(os.getenv("INFERENCE_POOL_SIZE", default_pool_size)),
+        keep_alive=os.getenv("INFERENCE_KEEP_ALIVE", "true").lower() == "true",
+        http2=os.getenv("INFERENCE_HTTP2", "false").lower() == "true",
+        timeout=float(os.getenv("INFERENCE_TIMEOUT", 60)),
+        embeddings_url=os.getenv("NEYSA_EMBEDDINGS_URL"),
+        embeddings_model=os.getenv("NEYSA_EMBEDDINGS_MODEL"),
+    )
@@ -0,0 +1,682 @@
+"""
+GreenScale Job Queue - Reliable FIFO queue on top of Redis
+
+Three interchangeable backends, selected with QUEUE_BACKEND:
+
+list (default)
+Producers LPUSH onto the 'jobs' list and consumers take from the other end,
+so the oldest job is always served first. Claiming a job atomically moves it
+into a per-worker processing list (BLMOVE); it is only removed from there
+once the result has been stored (ack). Each worker keeps a heartbeat key
+alive, and any worker can act as the reaper: jobs held by a worker whose
+heartbeat has expired are pushed back to the head of the queue. A pod killed
+mid-call during a KEDA scale-down therefore never loses its jobs.
+
+Redis keys:
+- jobs                         pending jobs (KEDA watches its length)
+- jobs:processing:{consumer}   jobs claimed by one worker
+- jobs:consumers               set of registered worker ids
+- jobs:heartbeat:{consumer}    expiring liveness marker per worker
+- jobs:arrivals                enqueue times of recent jobs (sorted set, for the scaler)
+
+fair
+Same reliable list mechanics, with priority lanes and per-tenant lists.
+Jobs carry 'priority' (lane, QUEUE_LANES, e.g. interactive:8,batch:1) and
+'tenant'. A Lua claim picks lanes and tenants by smooth weighted round robin
+and skips tenants at their in-flight cap (QUEUE_TENANT_MAX_IN_FLIGHT,
+QUEUE_TENANT_CAPS), so no tenant can starve the rest. 'jobs' holds one token
+per pending job, so KEDA's list-length trigger still sees all pending work.
+Claims and re-queues declare every key they touch; on Redis Cluster, give
+the queue a hash-tagged name (REDIS_LIST_NAME={jobs}) so its keys share a slot.
+
+Redis keys (in addition to the list backend's processing/heartbeat keys):
+- jobs                         one token per pending job (KEDA watches its length)
+- jobs:lane:{lane}:{tenant}    pending jobs of one tenant in one lane
+- jobs:tenants:{lane}          tenants with pending jobs in a lane
+- jobs:credit                  round-robin credit per lane
+- jobs:credit:{lane}           round-robin credit per tenant in a lane
+- jobs:tenant_in_flight        claimed-but-not-acked jobs per tenant
+
+stream
+Jobs are XADDed to a Redis Stream and read through a consumer group with
+XREADGROUP, which returns up to COUNT jobs per round-trip. Each job is
+XACKed (and XDELed) once its result is stored. A live worker resets the idle
+time of the entries it holds on every heartbeat (XCLAIM to itself), however
+long their upstream calls take, so only entries of a dead worker stay pending
+longer than QUEUE_CLAIM_IDLE_MS; those are taken over with XAUTOCLAIM by the
+next worker that asks for work. Producers create the consumer group too, so
+KEDA can scale on the group's lag with the redis-streams trigger
+(k8s/keda-scaledobject-streams.yaml) before any worker has started.
+
+Redis keys:
+- jobs:stream                  job entries (group 'workers' by default)
+- jobs:stream:arrivals         enqueue times of recent jobs (sorted set, for the scaler)
+
+Both backends keep a rolling window of enqueue timestamps (QUEUE_ARRIVALS_KEEP
+seconds) so scaler.py can estimate the arrival rate.
+"""
+
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+
+class ClaimedJob:
+    """A job taken from the queue; `receipt` identifies it for ack()."""
+
+    __slots__ = ("data", "receipt")
+
+    def __init__(self, data: str, receipt):
+        self.data = data
+        self.receipt = receipt
+
+
+def default_consumer_name() -> str:
+    """Pod hostname plus a random suffix, unique across container restarts."""
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
+
+def _record_arrival(pipe, key: str, payload: dict, keep_seconds: int):
+    """Add the job's enqueue time to the arrivals window and trim old entries."""
+    enqueued_at = payload["enqueued_at"]
+    member = f"{payload.get('job_id') or uuid.uuid4().hex}:{enqueued_at}"
+    pipe.zadd(key, {member: enqueued_at})
+    pipe.zremrangebyscore(key, "-inf", enqueued_at - keep_seconds)
+
+
+def _arrival_rate(client, key: str, window: float) -> float:
+    """Jobs enqueued per second over the last `window` seconds."""
+    return client.zcount(key, time.time() - window, "+inf") / window
+
+
+class ListQueue:
+    """
+    Reliable queue backed by Redis lists.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        name: Name of the pending list
+        consumer: Worker id; only needed for claiming jobs
+        heartbeat_ttl: Seconds without a heartbeat before a worker counts as dead
+        arrivals_keep: Seconds of enqueue timestamps kept for arrival_rate()
+    """
+
+    def __init__(self, client, name: str = "jobs", consumer: Optional[str] = None,
+                 heartbeat_ttl: int = 30, arrivals_keep: int = 300):
+        self.client = client
+        self.name = name
+        self.consumer = consumer
+        self.heartbeat_ttl = heartbeat_ttl
+        self.consumers_key = f"{name}:consumers"
+        self.arrivals_key = f"{name}:arrivals"
+        self.arrivals_keep = arrivals_keep
+
+    def _processing_key(self, consumer: str) -> str:
+        return f"{self.name}:processing:{consumer}"
+
+    def _heartbeat_key(self, consumer: str) -> str:
+        return f"{self.name}:heartbeat:{consumer}"
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    # Whether the commands of one enqueue must run as a MULTI/EXEC transaction
+    ATOMIC_ENQUEUE = False
+
+    def enqueue(self, payload: dict):
+        """Append a job to the tail of the queue, stamping its enqueue time."""
+        self.enqueue_many([payload])
+
+    def enqueue_many(self, payloads: List[dict]):
+        """Append several jobs in one pipelined round-trip."""
+        pipe = self.client.pipeline(transaction=self.ATOMIC_ENQUEUE)
+        for payload in payloads:
+            self.stage_enqueue(pipe, payload)
+        pipe.execute()
+
+    def stage_enqueue(self, pipe, payload: dict):
+        """
+        Queue the commands that enqueue one job on `pipe`. Works with
+        redis.asyncio pipelines too (their commands are buffered the same way),
+        so async producers share the backend's key layout (see api.py).
+        """
+        payload.setdefault("enqueued_at", time.time())
+        pipe.lpush(self.name, json.dumps(payload))
+        _record_arrival(pipe, self.arrivals_key, payload, self.arrivals_keep)
+
+    def depth(self) -> int:
+        """Number of jobs waiting to be claimed."""
+        return self.client.llen(self.name)
+
+    def in_flight(self) -> int:
+        """Number of jobs claimed by any worker and not yet acked."""
+        consumers = self.client.smembers(self.consumers_key)
+        pipe = self.client.pipeline(transaction=False)
+        for consumer in consumers:
+            pipe.llen(self._processing_key(consumer))
+        return sum(pipe.execute()) if consumers else 0
+
+    def arrival_rate(self, window: float = 60) -> float:
+        """Jobs enqueued per second over the last `window` seconds."""
+        return _arrival_rate(self.client, self.arrivals_key, window)
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def claim(self, count: int = 1, timeout: int = 5) -> List[ClaimedJob]:
+        """
+        Block up to `timeout` seconds for the oldest job and claim it, plus up
+        to `count - 1` more that are already waiting (one pipelined round-trip).
+        """
+        processing = self._processing_key(self.consumer)
+        data = self.client.blmove(self.name, processing, timeout, "RIGHT", "LEFT")
+        if data is None:
+            return []
+        claimed = [data]
+        if count > 1:
+            pipe = self.client.pipeline(transaction=False)
+            for _ in range(count - 1):
+                pipe.lmove(self.name, processing, "RIGHT", "LEFT")
+            claimed.extend(d for d in pipe.execute() if d is not None)
+        return [ClaimedJob(d, d) for d in claimed]
+
+    def ack(self, job: ClaimedJob):
+        """Drop a finished job from this worker's processing list."""
+        self.client.lrem(self._processing_key(self.consumer), 1, job.receipt)
+
+    def heartbeat(self):
+        """Mark this worker alive; must run more often than heartbeat_ttl."""
+        self.client.set(self._heartbeat_key(self.consumer), 1, ex=self.heartbeat_ttl)
+        self.client.sadd(self.consumers_key, self.consumer)
+
+    def deregister(self):
+        """Remove this worker after a clean drain, re-queueing anything left over."""
+        self._requeue(self.consumer)
+        self.client.delete(self._heartbeat_key(self.consumer))
+        self.client.srem(self.consumers_key, self.consumer)
+
+    def reap(self) -> int:
+        """
+        Re-queue jobs held by workers whose heartbeat expired.
+
+        Returns:
+            Number of jobs pushed back to the head of the queue
+        """
+        recovered = 0
+        for consumer in self.client.smembers(self.consumers_key):
+            if consumer == self.consumer or self.client.exists(self._heartbeat_key(consumer)):
+                continue
+            recovered += self._requeue(consumer)
+            self.client.srem(self.consumers_key, consumer)
+        return recovered
+
+    def _requeue(self, consumer: str) -> int:
+        # Newest claim first onto the head, so the oldest ends up served first
+        moved = 0
+        processing = self._processing_key(consumer)
+        while self.client.lmove(processing, self.name, "LEFT", "RIGHT") is not None:
+            moved += 1
+        return moved
+
+
+# Claims up to ARGV[1] jobs. Lanes and, within the chosen lane, tenants are
+# picked by smooth weighted round robin over those that have jobs and are
+# under their in-flight cap; each claim also takes one token off KEYS[1].
+# Every key is passed in: KEYS[1..4] are the token list, the processing list,
+# the tenant in-flight hash and the lane credit hash, and ARGV[2] describes
+# each lane as {name, weight, tenants set, tenant credit hash, {{tenant,
+# pending list}, ...}} with key positions in KEYS.
+FAIR_CLAIM_SCRIPT = """
+local count, lanes, default_cap = tonumber(ARGV[1]), cjson.decode(ARGV[2]), tonumber(ARGV[3])
+local caps, weights = cjson.decode(ARGV[4]), cjson.decode(ARGV[5])
+
+-- Smooth weighted round robin: every candidate earns its weight, the richest
+-- wins and pays the total. Idle candidates lose their credit.
+local function pick(credit_key, candidates)
+    local total, best, best_credit = 0, nil, nil
+    for _, c in ipairs(candidates) do
+        total = total + c[2]
+        local credit = redis.call('HINCRBY', credit_key, c[1], c[2])
+        if best == nil or credit > best_credit then
+            best, best_credit = c, credit
+        end
+    end
+    redis.call('HINCRBY', credit_key, best[1], -total)
+    return best
+end
+
+local claimed = {}
+for _ = 1, count do
+    local lane_candidates, eligible = {}, {}
+    for _, lane in ipairs(lanes) do
+        local tenants = {}
+        for _, entry in ipairs(lane[5]) do
+            local tenant, pending = entry[1], KEYS[entry[2]]
+            local cap = caps[tenant] or default_cap
+            if redis.call('LLEN', pending) == 0 then
+                redis.call('SREM', KEYS[lane[3]], tenant)
+                redis.call('HDEL', KEYS[lane[4]], tenant)
+            elseif cap <= 0 or tonumber(redis.call('HGET', KEYS[3], tenant) or '0') < cap then
+                table.insert(tenants, {tenant, weights[tenant] or 1, pending})
+            end
+        end
+        if #tenants > 0 then
+            table.insert(lane_candidates, lane)
+            eligible[lane[1]] = tenants
+        else
+            redis.call('HDEL', KEYS[4], lane[1])
+        end
+    end
+    if #lane_candidates == 0 then
+        break
+    end
+
+    local lane = pick(KEYS[4], lane_candidates)
+    local tenant = pick(KEYS[lane[4]], eligible[lane[1]])
+    local job = redis.call('LMOVE', tenant[3], KEYS[2], 'RIGHT', 'LEFT')
+    if redis.call('LLEN', tenant[3]) == 0 then
+        redis.call('SREM', KEYS[lane[3]], tenant[1])
+        redis.call('HDEL', KEYS[lane[4]], tenant[1])
+    end
+    if job then
+        redis.call('HINCRBY', KEYS[3], tenant[1], 1)
+        redis.call('RPOP', KEYS[1])
+        table.insert(claimed, job)
+    end
+end
+return claimed
+"""
+
+
+def _parse_weights(spec: str) -> Dict[str, int]:
+    """Parse "name:N,name:N" into {name: N}."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition(":")
+        try:
+            weights[name.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid weight '{part}' (expected name:N)")
+    return weights
+
+
+class FairQueue(ListQueue):
+    """
+    List queue with priority lanes and weighted fair sharing across tenants.
+
+    Jobs carry a 'priority' (lane) and a 'tenant'. Each lane keeps one list
+    per tenant; a claim picks a lane by lane weight, then a tenant within it
+    by tenant weight (smooth weighted round robin, so a tenant with weight 2
+    gets twice the share of one with weight 1 while both have work), skipping
+    tenants already at their in-flight cap. One heavy tenant therefore can't
+    starve the others, and 'batch' work soaks up whatever 'interactive' leaves.
+
+    The queue's own list ('jobs') holds one token per pending job, so its
+    length is still the total pending work that KEDA scales on. Claiming,
+    processing lists, heartbeats and reaping work as in ListQueue.
+
+    Args:
+        client, name, consumer, heartbeat_ttl, arrivals_keep: As for ListQueue
+        lanes: (lane, weight) pairs; the first lane is the default priority
+        tenant_weights: Weight per tenant (default 1)
+        max_in_flight: Jobs a tenant may have claimed at once (0 = unlimited)
+        tenant_caps: Per-tenant overrides of max_in_flight
+    """
+
+    # Pause between claim attempts while jobs are queued but every tenant with work is capped
+    CAPPED_BACKOFF = 0.05
+
+    def __init__(self, client, name: str = "jobs", consumer: Optional[str] = None,
+                 heartbeat_ttl: int = 30, arrivals_keep: int = 300,
+                 lanes: Optional[List[Tuple[str, int]]] = None,
+                 tenant_weights: Optional[Dict[str, int]] = None,
+                 max_in_flight: int = 0, tenant_caps: Optional[Dict[str, int]] = None):
+        super().__init__(client, name=name, consumer=consumer,
+                         heartbeat_ttl=heartbeat_ttl, arrivals_keep=arrivals_keep)
+        self.lanes = lanes or [("interactive", 8), ("batch", 1)]
+        self.tenant_weights = tenant_weights or {}
+        self.max_in_flight = max_in_flight
+        self.tenant_caps = tenant_caps or {}
+        self.in_flight_key = f"{name}:tenant_in_flight"
+        self._claim = client.register_script(FAIR_CLAIM_SCRIPT)
+
+    def _lane_key(self, lane: str, tenant: str) -> str:
+        return f"{self.name}:lane:{lane}:{tenant}"
+
+    def _tenants_key(self, lane: str) -> str:
+        return f"{self.name}:tenants:{lane}"
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    # One transaction, so a claim never sees a token without its job
+    ATOMIC_ENQUEUE = True
+
+    def stage_enqueue(self, pipe, payload: dict):
+        """Append a job to its tenant's list in its lane and add a pending token."""
+        payload.setdefault("enqueued_at", time.time())
+        payload["priority"] = payload.get("priority") or self.lanes[0][0]
+        payload["tenant"] = str(payload.get("tenant") or "default")
+        lane, tenant = payload["priority"], payload["tenant"]
+        if lane not in dict(self.lanes):
+            raise ValueError(f"Unknown priority '{lane}' (lanes: {', '.join(name for name, _ in self.lanes)})")
+
+        pipe.lpush(self._lane_key(lane, tenant), json.dumps(payload))
+        pipe.sadd(self._tenants_key(lane), tenant)
+        pipe.lpush(self.name, f"{lane}:{tenant}")
+        _record_arrival(pipe, self.arrivals_key, payload, self.arrivals_keep)
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def claim(self, count: int = 1, timeout: float = 5) -> List[ClaimedJob]:
+        """Block up to `timeout` seconds for jobs and claim up to `count` in fair order."""
+        processing = self._processing_key(self.consumer)
+        deadline = time.monotonic() + timeout
+        woken = False
+        while True:
+            keys, lanes = self._claim_keys(processing)
+            claimed = self._claim(keys=keys, args=[
+                count, json.dumps(lanes), self.max_in_flight,
+                json.dumps(self.tenant_caps), json.dumps(self.tenant_weights),
+            ])
+            if claimed:
+                return [ClaimedJob(d, d) for d in claimed]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            if woken:
+                # Tokens but nothing claimable: lost a race, or every tenant with work is capped
+                time.sleep(min(remaining, self.CAPPED_BACKOFF))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+            # Wait for a token without taking it (moving it onto the same list is a no-op)
+            woken = self.client.blmove(self.name, self.name, remaining, "RIGHT", "RIGHT") is not None
+
+    def _claim_keys(self, processing: str) -> Tuple[List[str], list]:
+        """
+        KEYS and lane layout for FAIR_CLAIM_SCRIPT: the tenants with pending
+        jobs in each lane are read first, so the script only touches keys it
+        is given. A tenant that gets its first job in between is picked up
+        by the next claim.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for lane, _ in self.lanes:
+            pipe.smembers(self._tenants_key(lane))
+        keys = [self.name, processing, self.in_flight_key, f"{self.name}:credit"]
+        lanes = []
+        for (lane, weight), tenants in zip(self.lanes, pipe.execute()):
+            keys += [self._tenants_key(lane), f"{self.name}:credit:{lane}"]
+            entry = [lane, weight, len(keys) - 1, len(keys), []]
+            for tenant in sorted(tenants):
+                keys.append(self._lane_key(lane, tenant))
+                entry[4].append([tenant, len(keys)])
+            lanes.append(entry)
+        return keys, lanes
+
+    def ack(self, job: ClaimedJob):
+        """Drop a finished job from this worker's processing list and free its tenant's slot."""
+        tenant = json.loads(job.receipt).get("tenant", "default")
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lrem(self._processing_key(self.consumer), 1, job.receipt)
+        pipe.hincrby(self.in_flight_key, tenant, -1)
+        pipe.execute()
+
+    def _requeue(self, consumer: str) -> int:
+        """
+        Move every job in a processing list back to the tail of its lane (the
+        oldest claim is served first again), with its token and tenant slot.
+        One transaction, retried if the list changes while it is read.
+        """
+        processing = self._processing_key(consumer)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(processing)
+                    jobs = pipe.lrange(processing, 0, -1)
+                    if not jobs:
+                        return 0
+                    pipe.multi()
+                    for job in jobs:
+                        data = json.loads(job)
+                        lane, tenant = data["priority"], data["tenant"]
+                        pipe.rpush(self._lane_key(lane, tenant), job)
+                        pipe.sadd(self._tenants_key(lane), tenant)
+                        pipe.hincrby(self.in_flight_key, tenant, -1)
+                        pipe.lpush(self.name, f"{lane}:{tenant}")
+                    pipe.delete(processing)
+                    pipe.execute()
+                    return len(jobs)
+                except redis.WatchError:
+                    continue
+
+
+class StreamQueue:
+    """
+    Reliable queue backed by a Redis Stream and consumer group.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        name: Stream key
+        group: Consumer group shared by all workers
+        consumer: Worker id; only needed for claiming jobs
+        heartbeat_ttl: Seconds without a heartbeat before a worker counts as dead
+        claim_idle_ms: Pending time after which another worker may take a job
+            over; must be well above heartbeat_ttl
+        arrivals_keep: Seconds of enqueue timestamps kept for arrival_rate()
+    """
+
+    # Most pending jobs one worker refreshes per heartbeat (far above any WORKER_CONCURRENCY)
+    HELD_MAX = 1000
+
+    def __init__(self, client, name: str = "jobs:stream", group: str = "workers",
+                 consumer: Optional[str] = None, heartbeat_ttl: int = 30,
+                 claim_idle_ms: int = 120000, arrivals_keep: int = 300):
+        self.client = client
+        self.name = name
+        self.group = group
+        self.consumer = consumer
+        self.heartbeat_ttl = heartbeat_ttl
+        self.claim_idle_ms = claim_idle_ms
+        self.arrivals_key = f"{name}:arrivals"
+        self.arrivals_keep = arrivals_keep
+        self._last_autoclaim = 0.0
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.name, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def ensure_group_async(self):
+        """_ensure_group() for a queue built on a redis.asyncio client (see api.py)."""
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.name, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    ATOMIC_ENQUEUE = False
+
+    def enqueue(self, payload: dict):
+        """Append a job to the stream, stamping its enqueue time."""
+        self.enqueue_many([payload])
+
+    def enqueue_many(self, payloads: List[dict]):
+        """Append several jobs in one pipelined round-trip."""
+        # The group must exist for KEDA to see the lag while no worker runs
+        self._ensure_group()
+        pipe = self.client.pipeline(transaction=False)
+        for payload in payloads:
+            self.stage_enqueue(pipe, payload)
+        pipe.execute()
+
+    def stage_enqueue(self, pipe, payload: dict):
+        """
+        Queue the commands that enqueue one job on `pipe` (see
+        ListQueue.stage_enqueue). Callers with their own pipeline create the
+        group first (ensure_group_async for async producers).
+        """
+        payload.setdefault("enqueued_at", time.time())
+        pipe.xadd(self.name, {"data": json.dumps(payload)})
+        _record_arrival(pipe, self.arrivals_key, payload, self.arrivals_keep)
+
+    def depth(self) -> int:
+        """Number of jobs not yet delivered to any worker."""
+        self._ensure_group()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xlen(self.name)
+        pipe.xpending(self.name, self.group)
+        length, pending = pipe.execute()
+        return max(0, length - pending["pending"])
+
+    def in_flight(self) -> int:
+        """Number of jobs delivered to a worker and not yet acked."""
+        self._ensure_group()
+        return self.client.xpending(self.name, self.group)["pending"]
+
+    def arrival_rate(self, window: float = 60) -> float:
+        """Jobs enqueued per second over the last `window` seconds."""
+        return _arrival_rate(self.client, self.arrivals_key, window)
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def claim(self, count: int = 1, timeout: int = 5) -> List[ClaimedJob]:
+        """
+        Take over up to `count` stuck jobs if any are due, otherwise block up
+        to `timeout` seconds for up to `count` new jobs in a single XREADGROUP.
+        """
+        self._ensure_group()
+
+        now = time.monotonic()
+        if now - self._last_autoclaim >= self.claim_idle_ms / 1000 / 4:
+            self._last_autoclaim = now
+            _, entries, *_ = self.client.xautoclaim(
+                self.name, self.group, self.consumer,
+                min_idle_time=self.claim_idle_ms, start_id="0-0", count=count,
+            )
+            stuck = self._to_jobs(entries)
+            if stuck:
+                return stuck
+
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.name: ">"},
+            count=count, block=max(1, int(timeout * 1000)),
+        )
+        if not response:
+            return []
+        return self._to_jobs(response[0][1])
+
+    def _to_jobs(self, entries) -> List[ClaimedJob]:
+        jobs = []
+        for message_id, fields in entries:
+            if not fields:
+                # Entry was deleted while pending - nothing left to run
+                self.client.xack(self.name, self.group, message_id)
+                continue
+            jobs.append(ClaimedJob(fields.get("data", ""), message_id))
+        return jobs
+
+    def ack(self, job: ClaimedJob):
+        """Acknowledge a finished job and drop its entry from the stream."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xack(self.name, self.group, job.receipt)
+        pipe.xdel(self.name, job.receipt)
+        pipe.execute()
+
+    def heartbeat(self):
+        """
+        Mark this worker alive and reset the idle time of the jobs it holds,
+        so XAUTOCLAIM never takes a job whose call is still running; must run
+        more often than heartbeat_ttl.
+        """
+        self.client.set(f"{self.name}:heartbeat:{self.consumer}", 1, ex=self.heartbeat_ttl)
+        self._ensure_group()
+        held = self.client.xpending_range(
+            self.name, self.group, min="-", max="+", count=self.HELD_MAX, consumername=self.consumer
+        )
+        if held:
+            # JUSTID: no redelivery, the delivery count stays as it is
+            self.client.xclaim(self.name, self.group, self.consumer, min_idle_time=0,
+                               message_ids=[entry["message_id"] for entry in held], justid=True)
+
+    def deregister(self):
+        """Leave the group after a clean drain. Anything still pending is XAUTOCLAIMed by others."""
+        self.client.delete(f"{self.name}:heartbeat:{self.consumer}")
+        pending = self.client.xpending_range(
+            self.name, self.group, min="-", max="+", count=1, consumername=self.consumer
+        )
+        if not pending:
+            self.client.xgroup_delconsumer(self.name, self.group, self.consumer)
+
+    def reap(self) -> int:
+        """
+        Drop dead consumers that hold no pending jobs. Their pending jobs are
+        recovered through XAUTOCLAIM in claim(), so nothing is re-queued here.
+        """
+        self._ensure_group()
+        for info in self.client.xinfo_consumers(self.name, self.group):
+            name = info["name"]
+            if name == self.consumer or info["pending"]:
+                continue
+            if not self.client.exists(f"{self.name}:heartbeat:{name}"):
+                self.client.xgroup_delconsumer(self.name, self.group, name)
+        return 0
+
+
+def queue_from_env(client, consumer: Optional[str] = None):
+    """Build the job queue backend selected by QUEUE_BACKEND (list, fair or stream)."""
+    backend = os.getenv("QUEUE_BACKEND", "list").lower()
+    heartbeat_ttl = int(os.getenv("QUEUE_HEARTBEAT_TTL", 30))
+    arrivals_keep = int(os.getenv("QUEUE_ARRIVALS_KEEP", 300))
+
+    if backend == "stream":
+        return StreamQueue(
+            client,
+            name=os.getenv("REDIS_STREAM_NAME", "jobs:stream"),
+            group=os.getenv("QUEUE_GROUP", "workers"),
+            consumer=consumer,
+            heartbeat_ttl=heartbeat_ttl,
+            claim_idle_ms=int(os.getenv("QUEUE_CLAIM_IDLE_MS", 120000)),
+            arrivals_keep=arrivals_keep,
+        )
+    if backend == "fair":
+        return FairQueue(
+            client,
+            name=os.getenv("REDIS_LIST_NAME", "jobs"),
+            consumer=consumer,
+            heartbeat_ttl=heartbeat_ttl,
+            arrivals_keep=arrivals_keep,
+            lanes=list(_parse_weights(os.getenv("QUEUE_LANES", "interactive:8,batch:1")).items()),
+            tenant_weights=_parse_weights(os.getenv("QUEUE_TENANT_WEIGHTS", "")),
+            max_in_flight=int(os.getenv("QUEUE_TENANT_MAX_IN_FLIGHT", 0)),
+            tenant_caps=_parse_weights(os.getenv("QUEUE_TENANT_CAPS", "")),
+        )
+    if backend != "list":
+        raise ValueError(f"Unknown QUEUE_BACKEND '{backend}' (expected 'list', 'fair' or 'stream')")
+
+    return ListQueue(
+        client,
+        name=os.getenv("REDIS_LIST_NAME", "jobs"),
+        consumer=consumer,
+        heartbeat_ttl=heartbeat_ttl,
+        arrivals_keep=arrivals_keep,
+    )
@@ -0,0 +1,332 @@
+"""
+GreenScale Metrics - Per-job latency breakdown and histograms
+
+Every job carries timestamps through its life:
+
+    enqueued_at     producer pushed it onto the queue
+    dequeued_at     a worker claimed it
+    upstream_start  request sent to the LLM API
+    first_byte      first token (or the whole body, when not streaming) arrived
+    upstream_end    response complete
+    result_stored   result written to Redis
+
+Workers turn these into per-stage durations and record them in fixed-bucket
+histograms, both in-process (for a per-pod metrics endpoint) and in Redis
+(aggregated across all pods, for the dashboard and autoscaling decisions).
+Queue wait of the first job a pod handles is recorded separately, because
+it includes the pod's cold start.
+
+With METRICS_PORT set, each worker also serves its in-process metrics in the
+Prometheus text format on http://<pod>:METRICS_PORT/metrics: jobs by status,
+failures and retries by error class, hedged calls, in-flight jobs, stage
+latency histograms, Redis round-trip time, cache hit ratio, upstream
+rate-limit factor, start-up phase timings and the time from pod start to
+first job. /ready answers 200 once the worker can take jobs (for a
+Kubernetes readiness probe) and 503 before that or while draining.
+
+Redis keys:
+- hist:{stage}   hash of bucket upper bound -> count, plus 'sum' and 'count'
+"""
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds; the last bucket catches everything above
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# Redis round-trips are usually sub-millisecond
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, float("inf"))
+
+# stage name -> (start timestamp, end timestamp)
+STAGES = {
+    "queue_wait": ("enqueued_at", "dequeued_at"),
+    "upstream_ttfb": ("upstream_start", "first_byte"),
+    "upstream": ("upstream_start", "upstream_end"),
+    "store": ("upstream_end", "result_stored"),
+    "service": ("dequeued_at", "result_stored"),
+    "total": ("enqueued_at", "result_stored"),
+}
+
+
+def _bucket_label(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (cumulative on export, like Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[min(index, len(self.counts) - 1)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Dict:
+        """Cumulative bucket counts keyed by upper bound label, plus sum and count."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            cumulative[_bucket_label(bound)] = running
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+class Counter:
+    """Thread-safe counter with one value per label (e.g. per status)."""
+
+    def __init__(self):
+        self.values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label: str, amount: float = 1):
+        with self._lock:
+            self.values[label] = self.values.get(label, 0) + amount
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.values)
+
+
+class Gauge:
+    """Thread-safe value that can go up and down; None until first set."""
+
+    def __init__(self):
+        self.value: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value = (self.value or 0) + amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+# In-process histograms for this pod, one per stage
+local_histograms: Dict[str, Histogram] = {stage: Histogram() for stage in list(STAGES) + ["queue_wait_cold"]}
+
+# In-process metrics for this pod, exported by start_metrics_server
+jobs_total = Counter()          # finished jobs by status
+job_errors = Counter()          # failed jobs by error class
+job_retries = Counter()         # retries scheduled, by error class
+hedged_requests = Counter()     # hedged upstream calls by winner (primary / hedge)
+cache_lookups = Counter()       # response cache lookups by result (hit / miss)
+jobs_in_flight = Gauge()        # jobs currently running on this pod
+first_job_seconds = Gauge()     # pod start -> first job claimed
+rate_limit_factor = Gauge()     # shared upstream rate factor last seen (ratelimit.py)
+redis_rtt = Histogram(REDIS_BUCKETS)
+startup_seconds: Dict[str, float] = {}  # start-up phase -> seconds (imports, redis, upstream, ready)
+ready = threading.Event()       # set once Redis is reachable, cleared while draining
+
+
+def process_started_at() -> Optional[float]:
+    """
+    Wall-clock time this process was started, interpreter start-up included.
+    Read from /proc (Linux only); None elsewhere.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks since boot); fields restart after the ')' of the name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def error_class(exc: Exception) -> str:
+    """Short label for a failure: 'http_429' for HTTP errors, else the (underlying) exception type."""
+    status_code = getattr(exc, "status_code", None)
+    if status_code:
+        return f"http_{status_code}"
+    return type(exc.__cause__ or exc).__name__
+
+
+def stage_durations(timings: Dict[str, Optional[float]]) -> Dict[str, float]:
+    """Durations of every stage whose start and end timestamps are both known."""
+    durations = {}
+    for stage, (start, end) in STAGES.items():
+        if timings.get(start) is not None and timings.get(end) is not None:
+            durations[stage] = max(0.0, float(timings[end]) - float(timings[start]))
+    return durations
+
+
+def observe_job(pipe, timings: Dict[str, Optional[float]], cold: bool = False) -> Dict[str, float]:
+    """
+    Record a job's stage durations locally and queue the Redis histogram
+    updates on `pipe` (executed by the caller).
+
+    Returns:
+        The stage durations that were recorded
+    """
+    durations = stage_durations(timings)
+    if cold and "queue_wait" in durations:
+        durations["queue_wait_cold"] = durations["queue_wait"]
+    for stage, value in durations.items():
+        local_histograms[stage].observe(value)
+        index = min(bisect.bisect_left(LATENCY_BUCKETS, value), len(LATENCY_BUCKETS) - 1)
+        key = f"hist:{stage}"
+        pipe.hincrby(key, _bucket_label(LATENCY_BUCKETS[index]), 1)
+        pipe.hincrbyfloat(key, "sum", value)
+        pipe.hincrby(key, "count", 1)
+    return durations
+
+
+def read_histograms(client, stages: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Cluster-wide (non-cumulative) bucket counts per stage from Redis."""
+    stages = stages or list(local_histograms)
+    pipe = client.pipeline(transaction=False)
+    for stage in stages:
+        pipe.hgetall(f"hist:{stage}")
+    return {stage: raw for stage, raw in zip(stages, pipe.execute())}
+
+
+def histogram_percentile(raw: Dict[str, str], p: float) -> Optional[float]:
+    """
+    Estimate a percentile (0-100) from non-cumulative bucket counts as the
+    upper bound of the bucket it falls in. None if nothing was observed.
+    """
+    count = int(raw.get("count", 0))
+    if not count:
+        return None
+    target = p / 100 * count
+    running = 0
+    for bound in LATENCY_BUCKETS:
+        running += int(raw.get(_bucket_label(bound), 0))
+        if running >= target:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+
+# ============================================================================
+# PROMETHEUS EXPORT
+# ============================================================================
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, histogram: Histogram, labels=()):
+    snapshot = histogram.snapshot()
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+
+def render_prometheus() -> str:
+    """This pod's metrics in the Prometheus text exposition format."""
+    lines = []
+
+    lines += ["# HELP greenscale_jobs_total Jobs finished by this pod, by status",
+              "# TYPE greenscale_jobs_total counter"]
+    for status, value in sorted(jobs_total.snapshot().items()):
+        lines.append(f'greenscale_jobs_total{{status="{status}"}} {value}')
+
+    lines += ["# HELP greenscale_job_errors_total Failed jobs by error class",
+              "# TYPE greenscale_job_errors_total counter"]
+    for error, value in sorted(job_errors.snapshot().items()):
+        lines.append(f'greenscale_job_errors_total{{error="{error}"}} {value}')
+
+    lines += ["# HELP greenscale_job_retries_total Retries scheduled after transient failures, by error class",
+              "# TYPE greenscale_job_retries_total counter"]
+    for error, value in sorted(job_retries.snapshot().items()):
+        lines.append(f'greenscale_job_retries_total{{error="{error}"}} {value}')
+
+    lines += ["# HELP greenscale_hedged_requests_total Upstream calls that were hedged, by which request won",
+              "# TYPE greenscale_hedged_requests_total counter"]
+    for winner, value in sorted(hedged_requests.snapshot().items()):
+        lines.append(f'greenscale_hedged_requests_total{{winner="{winner}"}} {value}')
+
+    lines += ["# HELP greenscale_jobs_in_flight Jobs currently running on this pod",
+              "# TYPE greenscale_jobs_in_flight gauge",
+              f"greenscale_jobs_in_flight {jobs_in_flight.value or 0}"]
+
+    lines += ["# HELP greenscale_stage_seconds Per-job latency by stage (see metrics.STAGES)",
+              "# TYPE greenscale_stage_seconds histogram"]
+    for stage, histogram in local_histograms.items():
+        _render_histogram(lines, "greenscale_stage_seconds", histogram, (("stage", stage),))
+
+    lines += ["# HELP greenscale_redis_rtt_seconds Redis PING round-trip time",
+              "# TYPE greenscale_redis_rtt_seconds histogram"]
+    _render_histogram(lines, "greenscale_redis_rtt_seconds", redis_rtt)
+
+    lookups = cache_lookups.snapshot()
+    lines += ["# HELP greenscale_cache_lookups_total Response cache lookups by result",
+              "# TYPE greenscale_cache_lookups_total counter"]
+    for result in ("hit", "miss"):
+        lines.append(f'greenscale_cache_lookups_total{{result="{result}"}} {lookups.get(result, 0)}')
+    total = lookups.get("hit", 0) + lookups.get("miss", 0)
+    if total:
+        lines += ["# HELP greenscale_cache_hit_ratio Share of cache lookups that hit",
+                  "# TYPE greenscale_cache_hit_ratio gauge",
+                  f"greenscale_cache_hit_ratio {lookups.get('hit', 0) / total}"]
+
+    if rate_limit_factor.value is not None:
+        lines += ["# HELP greenscale_rate_limit_factor Share of the configured upstream rate currently allowed",
+                  "# TYPE greenscale_rate_limit_factor gauge",
+                  f"greenscale_rate_limit_factor {rate_limit_factor.value}"]
+
+    lines += ["# HELP greenscale_ready Whether this pod is taking jobs",
+              "# TYPE greenscale_ready gauge",
+              f"greenscale_ready {int(ready.is_set())}"]
+
+    if startup_seconds:
+        lines += ["# HELP greenscale_startup_seconds Time spent in each start-up phase",
+                  "# TYPE greenscale_startup_seconds gauge"]
+        for phase, value in startup_seconds.items():
+            lines.append(f'greenscale_startup_seconds{{phase="{phase}"}} {value}')
+
+    if first_job_seconds.value is not None:
+        lines += ["# HELP greenscale_first_job_seconds Time from pod start to its first claimed job",
+                  "# TYPE greenscale_first_job_seconds gauge",
+                  f"greenscale_first_job_seconds {first_job_seconds.value}"]
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            status, body = 200, render_prometheus().encode()
+        elif path == "/ready":
+            status, body = (200, b"ready\n") if ready.is_set() else (503, b"not ready\n")
+        else:
+            self.send_error(404)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the worker log
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Serve /metrics and /ready on `port` from a daemon thread."""
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
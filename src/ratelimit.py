@@ -0,0 +1,237 @@
+"""
+GreenScale Rate Limiter - Shared, adaptive limits toward the LLM API
+
+Every worker pod draws from the same pair of token buckets in Redis before
+calling the upstream: one for requests per minute, one for LLM tokens per
+minute. Adding pods therefore adds waiting, not load on an upstream that is
+already at its ceiling.
+
+The buckets refill at RATE_LIMIT_RPM / RATE_LIMIT_TPM times a shared factor
+that adapts AIMD-style:
+- every successful call adds RATE_LIMIT_INCREASE to the factor (up to 1)
+- a 429, 5xx or transport error, or a time to first byte above
+  RATE_LIMIT_LATENCY_TARGET, multiplies it by RATE_LIMIT_DECREASE (at most
+  once per RATE_LIMIT_COOLDOWN, so a burst of failures from many pods counts
+  as one congestion signal)
+- a Retry-After header pauses all pods for that long
+
+Token cost is estimated before the call (prompt length / 4 + max_tokens) and
+settled against the reported usage afterwards.
+
+Redis keys:
+- ratelimit:bucket     hash of available requests ('req') and tokens ('tok') and last refill ('ts')
+- ratelimit:state      hash with the adaptive 'factor' and 'paused_until'
+- ratelimit:cooldown   marker that spaces out multiplicative decreases
+"""
+
+import os
+import time
+from typing import Optional
+
+BUCKET_KEY = "ratelimit:bucket"
+STATE_KEY = "ratelimit:state"
+COOLDOWN_KEY = "ratelimit:cooldown"
+
+# Returns "0" when a request (and ARGV[3] tokens) was taken, else the seconds to wait
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rpm, tpm, cost, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[2], 'factor', 'paused_until')
+local factor = tonumber(state[1]) or 1
+local paused_until = tonumber(state[2]) or 0
+if paused_until > now then
+    return tostring(paused_until - now)
+end
+
+local req_rate, tok_rate = rpm * factor / 60, tpm * factor / 60
+local req_cap = math.max(1, req_rate * burst)
+local tok_cap = math.max(cost, tok_rate * burst)
+
+local bucket = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local elapsed = now - (tonumber(bucket[3]) or now)
+local req = math.min(req_cap, (tonumber(bucket[1]) or req_cap) + elapsed * req_rate)
+local tok = math.min(tok_cap, (tonumber(bucket[2]) or tok_cap) + elapsed * tok_rate)
+
+local wait = 0
+if req < 1 then
+    wait = (1 - req) / req_rate
+end
+if tpm > 0 and tok < cost then
+    wait = math.max(wait, (cost - tok) / tok_rate)
+end
+if wait == 0 then
+    req = req - 1
+    if tpm > 0 then
+        tok = tok - cost
+    end
+end
+redis.call('HSET', KEYS[1], 'req', tostring(req), 'tok', tostring(tok), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# AIMD step: ARGV[1] is 'ok' or 'congested'; returns the new factor
+ADAPT_SCRIPT = """
+local factor = tonumber(redis.call('HGET', KEYS[1], 'factor')) or 1
+if ARGV[1] == 'ok' then
+    factor = math.min(1, factor + tonumber(ARGV[2]))
+elseif redis.call('SET', KEYS[2], '1', 'NX', 'PX', ARGV[5]) then
+    factor = math.max(tonumber(ARGV[4]), factor * tonumber(ARGV[3]))
+end
+redis.call('HSET', KEYS[1], 'factor', tostring(factor))
+return tostring(factor)
+"""
+
+# Extends the shared pause to now + ARGV[1] seconds (never shortens it)
+PAUSE_SCRIPT = """
+local t = redis.call('TIME')
+local until_ts = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0
+if until_ts > current then
+    redis.call('HSET', KEYS[1], 'paused_until', tostring(until_ts))
+end
+return tostring(math.max(until_ts, current))
+"""
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough upper bound of the tokens a call will use (~4 characters per token)."""
+    return len(prompt) // 4 + max_tokens
+
+
+class RateLimiter:
+    """
+    Cluster-wide token-bucket limiter with AIMD adaptation.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        rpm: Upstream requests per minute at full rate
+        tpm: Upstream tokens per minute at full rate (0 = not limited)
+        burst: Seconds of full-rate traffic a bucket can hold
+        increase: Additive factor increase per successful call
+        decrease: Multiplicative factor decrease on congestion
+        min_factor: Lowest factor AIMD may reach
+        cooldown: Seconds between two decreases
+        latency_target: Time to first byte above which a call counts as congestion (0 = off)
+    """
+
+    def __init__(self, client, rpm: int = 60, tpm: int = 0, burst: float = 10,
+                 increase: float = 0.01, decrease: float = 0.5, min_factor: float = 0.1,
+                 cooldown: float = 5, latency_target: float = 0):
+        self.client = client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.min_factor = min_factor
+        self.cooldown = cooldown
+        self.latency_target = latency_target
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._adapt = client.register_script(ADAPT_SCRIPT)
+        self._pause = client.register_script(PAUSE_SCRIPT)
+
+    def acquire(self, tokens: int = 0, timeout: float = 60) -> bool:
+        """
+        Wait for capacity for one call using `tokens` tokens.
+
+        Returns:
+            True once capacity was taken, False if none freed up within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = float(self._acquire(keys=[BUCKET_KEY, STATE_KEY],
+                                       args=[self.rpm, self.tpm, tokens, self.burst]))
+            if wait <= 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once a call's real usage is known."""
+        if self.tpm and actual:
+            self.client.hincrbyfloat(BUCKET_KEY, "tok", estimated - actual)
+
+    def record_success(self, latency: Optional[float] = None) -> float:
+        """
+        Feed back a successful call; `latency` is its time to first byte.
+
+        Returns:
+            The new shared rate factor
+        """
+        slow = latency is not None and 0 < self.latency_target < latency
+        return self._step(congested=slow)
+
+    def record_failure(self, status_code: Optional[int] = None,
+                       retry_after: Optional[float] = None) -> float:
+        """
+        Feed back a failed call. Throttling (429), server errors (5xx) and
+        transport errors (status_code None) count as congestion; other 4xx don't.
+
+        Returns:
+            The new shared rate factor
+        """
+        if retry_after:
+            self._pause(keys=[STATE_KEY], args=[retry_after])
+        return self._step(congested=status_code is None or status_code == 429 or status_code >= 500)
+
+    def _step(self, congested: bool) -> float:
+        return float(self._adapt(
+            keys=[STATE_KEY, COOLDOWN_KEY],
+            args=["congested" if congested else "ok", self.increase, self.decrease,
+                  self.min_factor, int(self.cooldown * 1000)],
+        ))
+
+    def factor(self) -> float:
+        """Current shared rate factor (1 = full configured rate)."""
+        return float(self.client.hget(STATE_KEY, "factor") or 1)
+
+    def requests_per_second(self) -> float:
+        """Upstream calls per second the limiter currently lets through."""
+        return self.rpm * self.factor() / 60
+
+
+def limiter_from_env(client) -> Optional[RateLimiter]:
+    """Build the limiter from RATE_LIMIT_* settings; None when RATE_LIMIT_ENABLED is false."""
+    if os.getenv("RATE_LIMIT_ENABLED", "false").lower() != "true":
+        return None
+    return RateLimiter(
+        client,
+        rpm=int(os.getenv("RATE_LIMIT_RPM", 60)),
+        tpm=int(os.getenv("RATE_LIMIT_TPM", 0)),
+        burst=float(os.getenv("RATE_LIMIT_BURST", 10)),
+        increase=float(os.getenv("RATE_LIMIT_INCREASE", 0.01)),
+        decrease=float(os.getenv("RATE_LIMIT_DECREASE", 0.5)),
+        min_factor=float(os.getenv("RATE_LIMIT_MIN_FACTOR", 0.1)),
+        cooldown=float(os.getenv("RATE_LIMIT_COOLDOWN", 5)),
+        latency_target=float(os.getenv("RATE_LIMIT_LATENCY_TARGET", 0)),
+    )
+
+
+def estimated_wait(depth: int, completions_per_second: float,
+                   allowed_per_second: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds a job enqueued now would wait before a worker calls the API for it.
+
+    Args:
+        depth: Jobs already queued
+        completions_per_second: Recent cluster throughput
+        allowed_per_second: When given, throughput can't exceed it (what the
+            rate limiter currently lets through, RateLimiter.requests_per_second)
+
+    Returns:
+        The estimate, or None when there is no throughput to base it on
+        (e.g. scaled to zero, where the wait is the cold start)
+    """
+    rate = completions_per_second
+    if allowed_per_second is not None:
+        rate = min(rate, allowed_per_second) if rate > 0 else allowed_per_second
+    if depth == 0:
+        return 0.0
+    if rate <= 0:
+        return None
+    return depth / rate
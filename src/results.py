@@ -0,0 +1,297 @@
+"""
+GreenScale Results - Storing job results and waiting for them
+
+The worker stores each result as a record under 'result:{job_id}' and pushes
+the job's status onto a per-job reply list. Clients that only need the final
+result wait on that list with BLPOP, so they wake the instant it is written
+instead of polling 'result:{job_id}' once a second.
+
+A record is a hash: status (one of stats.STATUSES), result text, error and
+error class for failures, model, token usage, the job's timings and the
+first RESULT_PROMPT_CHARS characters of its prompt. Result and error texts
+longer than RESULT_COMPRESS_MIN_BYTES are stored zlib-compressed (base64, so
+decode_responses clients can read them); readers always get plain text back.
+
+Records live in Redis for RESULT_TTL seconds (the hot tier). Every finished
+job id is also queued on 'results:archive' for archive.py, which copies the
+records into an on-disk SQLite archive that keeps them after they expire.
+
+While a job is running, the worker also appends token chunks to a per-job
+stream, which the dashboard reads with XREAD BLOCK to render the response as
+it is generated. The stream always ends with a 'done' entry (written by
+store_result), including for cached and coalesced jobs that never streamed
+any tokens.
+
+The *_async variants do the same reads with a redis.asyncio client, for the
+submission API (api.py).
+
+Redis keys:
+- result:{job_id}   result record hash (expires after RESULT_TTL)
+- reply:{job_id}    completion event carrying the job's status (waiters put
+                    it back after popping it, so every waiter wakes)
+- stream:{job_id}   token chunks ('t') followed by a 'done' entry
+- cancel:{job_id}   set by the dashboard to stop generation early
+- results:archive   finished job ids not yet archived (newest first, capped
+                    at RESULT_ARCHIVE_BACKLOG)
+"""
+
+import base64
+import json
+import os
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ARCHIVE_QUEUE_KEY = "results:archive"
+
+# Record fields holding text that may be compressed
+TEXT_FIELDS = ("result", "error")
+# Record fields holding numbers
+NUMERIC_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "finished_at")
+
+
+def _result_ttl(ttl: Optional[int] = None) -> int:
+    return ttl or int(os.getenv("RESULT_TTL", 300))
+
+
+def _encode_text(text: str, min_bytes: int) -> Tuple[str, bool]:
+    """The stored form of a text field, and whether it was compressed."""
+    data = text.encode("utf-8")
+    if len(data) < min_bytes:
+        return text, False
+    packed = zlib.compress(data, 6)
+    if len(packed) >= len(data):
+        return text, False
+    return base64.b64encode(packed).decode("ascii"), True
+
+
+def _decode_record(job_id: str, raw: Dict[str, str]) -> Optional[Dict]:
+    """Turn a stored record hash back into a plain record (None if missing)."""
+    if not raw:
+        return None
+    compressed = set(filter(None, raw.get("compressed", "").split(",")))
+    record = {"job_id": job_id}
+    for field, value in raw.items():
+        if field == "compressed":
+            continue
+        if field in compressed:
+            value = zlib.decompress(base64.b64decode(value)).decode("utf-8")
+        elif field == "timings":
+            value = json.loads(value)
+        elif field in NUMERIC_FIELDS:
+            value = float(value) if field == "finished_at" else int(value)
+        record[field] = value
+    return record
+
+
+def build_record(result_text: str, status: str = "processed", error: Optional[str] = None,
+                 error_class: Optional[str] = None, model: Optional[str] = None,
+                 usage: Optional[Dict[str, int]] = None, timings: Optional[Dict[str, float]] = None,
+                 prompt: str = "", compress_min_bytes: Optional[int] = None) -> Dict[str, str]:
+    """
+    The hash stored for a finished job (see the module docstring).
+
+    Args:
+        result_text: Response text (partial for cancelled jobs, empty for failures)
+        status: Outcome, one of stats.STATUSES
+        error: Error message of a failed job
+        error_class: Short error name (metrics.error_class)
+        model: Model that answered
+        usage: Upstream token usage (prompt_tokens, completion_tokens, total_tokens)
+        timings: Job timestamps (see metrics.py)
+        prompt: The job's prompt; only a preview is kept
+        compress_min_bytes: Texts at least this long are compressed
+    """
+    if compress_min_bytes is None:
+        compress_min_bytes = int(os.getenv("RESULT_COMPRESS_MIN_BYTES", 1024))
+    record = {"status": status, "finished_at": f"{time.time():.3f}"}
+    compressed = []
+    for field, text in (("result", result_text), ("error", error)):
+        if text:
+            record[field], packed = _encode_text(text, compress_min_bytes)
+            if packed:
+                compressed.append(field)
+    if compressed:
+        record["compressed"] = ",".join(compressed)
+    if error_class:
+        record["error_class"] = error_class
+    if model:
+        record["model"] = model
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if usage and usage.get(field) is not None:
+            record[field] = str(int(usage[field]))
+    if timings:
+        record["timings"] = json.dumps({name: round(value, 3) for name, value in timings.items()
+                                        if value is not None})
+    if prompt:
+        record["prompt"] = prompt[:int(os.getenv("RESULT_PROMPT_CHARS", 500))]
+    return record
+
+
+def store_result(client, job_ids: Iterable[str], result_text: str, status: str = "processed",
+                 ttl: Optional[int] = None, **details):
+    """
+    Store a result record under every given job id and notify anyone waiting on it.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        job_ids: Jobs answered by this result (a leader and its coalesced followers)
+        result_text: Response text
+        status: Outcome, one of stats.STATUSES
+        ttl: Seconds the record stays in Redis (default RESULT_TTL)
+        **details: error, error_class, model, usage, timings, prompt (see build_record)
+    """
+    ttl = _result_ttl(ttl)
+    record = build_record(result_text, status=status, **details)
+    backlog = int(os.getenv("RESULT_ARCHIVE_BACKLOG", 100000))
+    job_ids = list(job_ids)
+    pipe = client.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.delete(f"result:{job_id}")
+        pipe.hset(f"result:{job_id}", mapping=record)
+        pipe.expire(f"result:{job_id}", ttl)
+        pipe.rpush(f"reply:{job_id}", status)
+        pipe.expire(f"reply:{job_id}", ttl)
+        pipe.xadd(f"stream:{job_id}", {"done": "1"})
+        pipe.expire(f"stream:{job_id}", ttl)
+    if backlog:
+        pipe.lpush(ARCHIVE_QUEUE_KEY, *job_ids)
+        pipe.ltrim(ARCHIVE_QUEUE_KEY, 0, backlog - 1)
+    pipe.execute()
+
+
+def get_result(client, job_id: str, archive=None) -> Optional[Dict]:
+    """
+    Return a job's result record, or None if it is not ready. Once the
+    record has expired from Redis it is looked up in `archive` (a
+    ResultArchive from archive.py), if given.
+    """
+    record = _decode_record(job_id, client.hgetall(f"result:{job_id}"))
+    if record is None and archive is not None:
+        record = archive.get(job_id)
+    return record
+
+
+def get_results(client, job_ids: List[str]) -> List[Optional[Dict]]:
+    """get_result() for many jobs in one round-trip."""
+    pipe = client.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.hgetall(f"result:{job_id}")
+    return [_decode_record(job_id, raw) for job_id, raw in zip(job_ids, pipe.execute())]
+
+
+def _restore_reply(pipe, job_id: str, status: str):
+    """
+    Stage putting a popped completion event back, so other waiters on the
+    job wake too; it expires with the record. Returns the pipeline.
+    """
+    pipe.rpush(f"reply:{job_id}", status)
+    pipe.expire(f"reply:{job_id}", _result_ttl())
+    return pipe
+
+
+def wait_for_result(client, job_id: str, timeout: int) -> Optional[Dict]:
+    """
+    Return the job's result record, blocking until its completion event
+    arrives or `timeout` seconds pass if it is not stored yet.
+
+    Returns:
+        Result record, or None if it did not arrive in time
+    """
+    # A finished job answers at once, even if a rerun, another tab or a
+    # retrying client already took the completion event
+    record = get_result(client, job_id)
+    if record is not None:
+        return record
+    # BLPOP takes whole seconds; 0 would block forever
+    popped = client.blpop(f"reply:{job_id}", timeout=max(1, int(timeout)))
+    if popped:
+        _restore_reply(client.pipeline(transaction=False), job_id, popped[1]).execute()
+    return get_result(client, job_id)
+
+
+class TokenStreamWriter:
+    """
+    Buffers token chunks for one job and appends them to its Redis stream at
+    most every `flush_interval` seconds, checking for a cancel request on
+    each flush (one pipelined round-trip).
+    """
+
+    def __init__(self, client, job_id: str, flush_interval: float = 0.05,
+                 ttl: Optional[int] = None):
+        self.client = client
+        self.key = f"stream:{job_id}"
+        self.cancel_key = f"cancel:{job_id}"
+        self.flush_interval = flush_interval
+        self.ttl = _result_ttl(ttl)
+        self.cancelled = False
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def write(self, text: str) -> bool:
+        """Buffer a chunk; returns False once the job has been cancelled."""
+        self._buffer.append(text)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return not self.cancelled
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        pipe = self.client.pipeline(transaction=False)
+        if self._buffer:
+            pipe.xadd(self.key, {"t": "".join(self._buffer)})
+            pipe.expire(self.key, self.ttl)
+            self._buffer = []
+        pipe.exists(self.cancel_key)
+        self.cancelled = bool(pipe.execute()[-1])
+
+
+def read_stream(client, job_id: str, last_id: str = "0", block_ms: int = 5000) -> Tuple[str, bool, str]:
+    """
+    Read new token chunks for a job, blocking up to `block_ms` for the first one.
+
+    Returns:
+        (new text, whether the job is done, id to pass as last_id next time)
+    """
+    response = client.xread({f"stream:{job_id}": last_id}, block=block_ms)
+    return _parse_stream(response, last_id)
+
+
+def _parse_stream(response, last_id: str) -> Tuple[str, bool, str]:
+    text, done = [], False
+    for _, entries in response or []:
+        for entry_id, fields in entries:
+            last_id = entry_id
+            if "done" in fields:
+                done = True
+            else:
+                text.append(fields.get("t", ""))
+    return "".join(text), done, last_id
+
+
+async def get_result_async(client, job_id: str) -> Optional[Dict]:
+    """get_result() for a redis.asyncio client."""
+    return _decode_record(job_id, await client.hgetall(f"result:{job_id}"))
+
+
+async def wait_for_result_async(client, job_id: str, timeout: float) -> Optional[Dict]:
+    """wait_for_result() for a redis.asyncio client."""
+    record = await get_result_async(client, job_id)
+    if record is not None:
+        return record
+    popped = await client.blpop(f"reply:{job_id}", timeout=max(1, int(timeout)))
+    if popped:
+        await _restore_reply(client.pipeline(transaction=False), job_id, popped[1]).execute()
+    return await get_result_async(client, job_id)
+
+
+async def read_stream_async(client, job_id: str, last_id: str = "0",
+                            block_ms: int = 5000) -> Tuple[str, bool, str]:
+    """read_stream() for a redis.asyncio client."""
+    response = await client.xread({f"stream:{job_id}": last_id}, block=block_ms)
+    return _parse_stream(response, last_id)
+
+
+def request_cancel(client, job_id: str):
+    """Ask the worker to stop generating a job's response."""
+    client.set(f"cancel:{job_id}", 1, ex=_result_ttl())
@@ -0,0 +1,140 @@
+"""
+GreenScale Retries - Delayed retries, per-job deadlines and a dead-letter queue
+
+A job that fails with a transient error (throttling, 5xx, transport error,
+client-side rate limit) is not answered with the error. Instead it is
+scheduled for another attempt after an exponential backoff with full jitter
+and acked, so no worker slot is held while it waits. A promoter thread on
+every worker moves due retries back onto the job queue.
+
+Jobs may carry a 'deadline' (epoch seconds). A retry that could not start
+before it, or a job that is claimed after it, is not attempted again. Jobs
+that fail permanently, run out of attempts (RETRY_MAX_ATTEMPTS) or miss
+their deadline are pushed to the dead-letter list with the failure details,
+and the user gets the error as before.
+
+Redis keys:
+- jobs:retry   sorted set of job payloads scored by when to retry them
+- jobs:dead    list of dead-lettered jobs with failure metadata (newest first)
+"""
+
+import json
+import os
+import random
+import time
+from typing import Optional
+
+RETRY_KEY = "jobs:retry"
+DEAD_KEY = "jobs:dead"
+
+# Upstream statuses worth another attempt
+TRANSIENT_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+def is_transient(exc: Exception) -> bool:
+    """
+    Whether a failed upstream call may succeed if tried again: transport
+    errors (no status) and throttling / server errors. Other 4xx are permanent.
+    """
+    if not hasattr(exc, "status_code"):
+        return False
+    return exc.status_code is None or exc.status_code in TRANSIENT_STATUSES
+
+
+class RetryPolicy:
+    """
+    Bounded retries with exponential backoff and full jitter.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        max_attempts: Total attempts per job, the first one included
+        base_delay: Backoff before the first retry (seconds, before jitter)
+        max_delay: Upper bound of the backoff
+        dead_max_len: Dead-letter entries kept
+    """
+
+    def __init__(self, client, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 30, dead_max_len: int = 10000):
+        self.client = client
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_max_len = dead_max_len
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based): uniform in [0, base * 2^(attempt-1)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def attempts_left(self, job_data: dict) -> bool:
+        """Whether a job that just failed may be attempted again."""
+        return int(job_data.get("attempt", 0)) + 1 < self.max_attempts
+
+    def schedule(self, job_data: dict) -> Optional[float]:
+        """
+        Schedule another attempt of a failed job if it has attempts left and
+        the retry can start before its deadline.
+
+        Returns:
+            Seconds until the retry, or None if the job must not be retried
+        """
+        if not self.attempts_left(job_data):
+            return None
+        attempt = int(job_data.get("attempt", 0)) + 1
+        delay = self.backoff(attempt)
+        run_at = time.time() + delay
+        deadline = job_data.get("deadline")
+        if deadline is not None and run_at >= float(deadline):
+            return None
+        self.client.zadd(RETRY_KEY, {json.dumps(dict(job_data, attempt=attempt)): run_at})
+        return delay
+
+    def dead_letter(self, job_data: dict, error: str, error_class: str, reason: str):
+        """Record a job that will not be attempted again."""
+        entry = {
+            "job": job_data,
+            "error": error,
+            "error_class": error_class,
+            "reason": reason,
+            "attempts": int(job_data.get("attempt", 0)) + 1,
+            "failed_at": time.time(),
+        }
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lpush(DEAD_KEY, json.dumps(entry))
+        pipe.ltrim(DEAD_KEY, 0, self.dead_max_len - 1)
+        pipe.execute()
+
+    def promote(self, queue, limit: int = 100) -> int:
+        """
+        Move retries that are due back onto `queue`. Safe to run on every
+        worker: only the one whose ZREM succeeds re-enqueues a job.
+
+        Returns:
+            Number of jobs re-enqueued
+        """
+        promoted = 0
+        for member in self.client.zrangebyscore(RETRY_KEY, "-inf", time.time(), start=0, num=limit):
+            if self.client.zrem(RETRY_KEY, member):
+                queue.enqueue(json.loads(member))
+                promoted += 1
+        return promoted
+
+    def next_due(self) -> Optional[float]:
+        """When the earliest scheduled retry is due (epoch seconds), or None."""
+        first = self.client.zrange(RETRY_KEY, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
+
+def dead_letters(client, count: int = 20) -> list:
+    """Most recent dead-lettered jobs, newest first."""
+    return [json.loads(entry) for entry in client.lrange(DEAD_KEY, 0, count - 1)]
+
+
+def retry_policy_from_env(client) -> RetryPolicy:
+    """Build the policy from RETRY_* / DEAD_LETTER_* settings."""
+    return RetryPolicy(
+        client,
+        max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", 3)),
+        base_delay=float(os.getenv("RETRY_BASE_DELAY", 0.5)),
+        max_delay=float(os.getenv("RETRY_MAX_DELAY", 30)),
+        dead_max_len=int(os.getenv("DEAD_LETTER_MAX_LEN", 10000)),
+    )
@@ -0,0 +1,235 @@
+"""
+GreenScale Scaler - Predictive "desired workers" signal for KEDA
+
+Scaling on queue length alone means capacity always lags demand by KEDA's
+pollingInterval plus pod start-up. This service estimates how many workers
+are needed right now and serves the number as JSON for KEDA's metrics-api
+trigger (k8s/keda-scaledobject-predictive.yaml):
+
+    busy slots  = arrival rate x service time x SCALER_HEADROOM    (Little's law)
+    backlog     = in-flight jobs + queued jobs that must drain within SCALER_DRAIN_SECONDS
+    desired     = ceil(max(busy slots, backlog) / WORKER_CONCURRENCY)
+
+capped, when the shared upstream rate limiter is on (ratelimit.py), at the
+slots the limiter currently lets through (more pods would only queue on it),
+raised to the SCALER_PREWARM floor for the current time of day and clamped
+to [SCALER_MIN_WORKERS, SCALER_MAX_WORKERS]. With no arrivals, nothing queued
+and nothing in flight the answer is 0, so scale-to-zero is kept.
+
+Inputs:
+- arrival rate from the queue's rolling window of enqueue timestamps
+- service time from recently finished jobs in the ledger (falling back to
+  the cluster-wide 'service' histogram, then SCALER_DEFAULT_SERVICE_TIME)
+- queue depth and in-flight count from the queue backend
+
+SCALER_PREWARM is a comma-separated list of UTC windows with a minimum
+number of workers, e.g. "08:00-18:00=1,11:30-13:30=2" keeps one worker warm
+during office hours and two over lunch.
+
+Usage:
+    python scaler.py          # serves GET /desired on SCALER_PORT (8080)
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from job_queue import queue_from_env
+from metrics import read_histograms
+from ratelimit import limiter_from_env
+from stats import recent_jobs
+
+
+def parse_schedule(spec: str) -> List[Tuple[int, int, int]]:
+    """
+    Parse "HH:MM-HH:MM=N,..." into (start minute, end minute, workers) windows.
+    A window whose end is before its start wraps past midnight.
+    """
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        try:
+            span, workers = part.split("=")
+            start, end = (int(h) * 60 + int(m) for h, m in (t.split(":") for t in span.split("-")))
+            windows.append((start, end, int(workers)))
+        except ValueError:
+            raise ValueError(f"Invalid SCALER_PREWARM window '{part}' (expected HH:MM-HH:MM=N)")
+    return windows
+
+
+def prewarm_floor(windows: List[Tuple[int, int, int]], now: Optional[float] = None) -> int:
+    """Highest worker floor among the windows covering `now` (UTC)."""
+    t = time.gmtime(now)
+    minute = t.tm_hour * 60 + t.tm_min
+    floor = 0
+    for start, end, workers in windows:
+        inside = start <= minute < end if start <= end else minute >= start or minute < end
+        if inside:
+            floor = max(floor, workers)
+    return floor
+
+
+class DesiredWorkers:
+    """
+    Estimates the number of workers needed for the current load.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        queue: Job queue backend from queue_from_env()
+        concurrency: Jobs each worker runs at once (WORKER_CONCURRENCY)
+        window: Seconds of arrivals used for the arrival rate
+        headroom: Multiplier on steady-state busy slots, to absorb bursts
+        drain_seconds: Target time to drain the current backlog
+        default_service_time: Service time assumed before any job has finished
+        min_workers / max_workers: Bounds on the answer
+        prewarm: Time-of-day floors from parse_schedule()
+        limiter: Shared upstream RateLimiter whose current rate caps the answer
+    """
+
+    # Finished jobs looked at for the recent service time, and how old they may be
+    SERVICE_SAMPLE = 200
+    SERVICE_MAX_AGE = 300
+
+    def __init__(self, client, queue, concurrency: int = 8, window: float = 60,
+                 headroom: float = 1.2, drain_seconds: float = 30,
+                 default_service_time: float = 3.0, min_workers: int = 0,
+                 max_workers: int = 5, prewarm: Optional[List[Tuple[int, int, int]]] = None,
+                 limiter=None):
+        self.client = client
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.window = window
+        self.headroom = headroom
+        self.drain_seconds = drain_seconds
+        self.default_service_time = default_service_time
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.prewarm = prewarm or []
+        self.limiter = limiter
+
+    def service_time(self) -> float:
+        """Mean seconds from claim to stored result of recently finished jobs."""
+        jobs, _ = recent_jobs(self.client, count=self.SERVICE_SAMPLE)
+        cutoff = time.time() - self.SERVICE_MAX_AGE
+        samples = [
+            float(job["result_stored"]) - float(job["dequeued_at"])
+            for job in jobs
+            if job.get("status") == "processed" and "dequeued_at" in job and "result_stored" in job
+            and float(job["finished_at"]) >= cutoff
+        ]
+        if samples:
+            return sum(samples) / len(samples)
+
+        raw = read_histograms(self.client, ["service"])["service"]
+        count = int(raw.get("count", 0))
+        if count:
+            return float(raw["sum"]) / count
+        return self.default_service_time
+
+    def compute(self) -> Dict:
+        """Desired worker count plus the inputs it was derived from."""
+        arrival_rate = self.queue.arrival_rate(self.window)
+        depth = self.queue.depth()
+        in_flight = self.queue.in_flight()
+        service_time = self.service_time()
+
+        busy_slots = arrival_rate * service_time * self.headroom
+        backlog_slots = in_flight + depth * service_time / self.drain_seconds
+        slots = max(busy_slots, backlog_slots)
+        upstream_rate = None
+        if self.limiter is not None:
+            upstream_rate = self.limiter.requests_per_second()
+            slots = min(slots, upstream_rate * service_time)
+        desired = math.ceil(slots / self.concurrency)
+        floor = prewarm_floor(self.prewarm)
+        desired = min(self.max_workers, max(self.min_workers, floor, desired))
+
+        return {
+            "desiredWorkers": desired,
+            "arrivalRate": round(arrival_rate, 3),
+            "serviceTime": round(service_time, 3),
+            "queueDepth": depth,
+            "inFlight": in_flight,
+            "prewarmFloor": floor,
+            "upstreamRate": None if upstream_rate is None else round(upstream_rate, 3),
+        }
+
+
+def scaler_from_env(client) -> DesiredWorkers:
+    """Build the estimator from SCALER_* settings (and WORKER_CONCURRENCY)."""
+    return DesiredWorkers(
+        client,
+        queue_from_env(client),
+        concurrency=int(os.getenv("WORKER_CONCURRENCY", 8)),
+        window=float(os.getenv("SCALER_WINDOW", 60)),
+        headroom=float(os.getenv("SCALER_HEADROOM", 1.2)),
+        drain_seconds=float(os.getenv("SCALER_DRAIN_SECONDS", 30)),
+        default_service_time=float(os.getenv("SCALER_DEFAULT_SERVICE_TIME", 3.0)),
+        min_workers=int(os.getenv("SCALER_MIN_WORKERS", 0)),
+        max_workers=int(os.getenv("SCALER_MAX_WORKERS", 5)),
+        prewarm=parse_schedule(os.getenv("SCALER_PREWARM", "")),
+        limiter=limiter_from_env(client),
+    )
+
+
+# ============================================================================
+# HTTP ENDPOINT (KEDA metrics-api)
+# ============================================================================
+def make_handler(scaler: DesiredWorkers):
+    last = {"desired": None}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/desired":
+                self.send_error(404)
+                return
+            try:
+                body = scaler.compute()
+            except redis.RedisError as e:
+                print(f"[Scaler] Redis error: {str(e)}")
+                self.send_error(503)
+                return
+            if body["desiredWorkers"] != last["desired"]:
+                print(f"[Scaler] Desired workers {last['desired']} -> {body['desiredWorkers']}: {body}")
+                last["desired"] = body["desiredWorkers"]
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # KEDA polls every few seconds
+
+    return Handler
+
+
+def main():
+    client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "redis-service"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+    )
+    try:
+        scaler = scaler_from_env(client)
+    except ValueError as e:
+        print(f"[Scaler] ERROR: {str(e)}")
+        sys.exit(1)
+
+    port = int(os.getenv("SCALER_PORT", 8080))
+    server = ThreadingHTTPServer(("", port), make_handler(scaler))
+    print(f"[Scaler] Serving desired workers on :{port}/desired")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+GreenScale Metrics Snapshot - One Redis poller per dashboard process
+
+Every open dashboard used to read queue depth, counters, worker pods, latency
+histograms and usage buckets from Redis on each refresh, so Redis load grew
+with the number of viewers. A MetricsSnapshot refreshes all of it on a fixed
+cadence (DASHBOARD_SNAPSHOT_INTERVAL) from a single background thread, and
+every session reads the latest snapshot from memory.
+
+The snapshot is a plain dict (see MetricsSnapshot.collect) and is replaced
+as a whole, so readers never see a half-updated one. If Redis is unreachable
+the previous snapshot is kept and 'error' is set.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import redis
+
+from accounting import CostModel, live_pods, read_usage
+from metrics import histogram_percentile, read_histograms
+from stats import completion_rate, read_stats
+
+
+class MetricsSnapshot:
+    """
+    Background aggregator of the dashboard's cluster metrics.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        queue: Job queue backend from queue_from_env()
+        cost_model: CostModel used for savings and utilization
+        interval: Seconds between refreshes
+        limiter: Shared RateLimiter, if any; its allowed rate is included
+    """
+
+    def __init__(self, client, queue, cost_model: CostModel, interval: float = 2, limiter=None):
+        self.client = client
+        self.queue = queue
+        self.cost_model = cost_model
+        self.limiter = limiter
+        self.interval = interval
+        self._snapshot: Optional[Dict] = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def collect(self) -> Dict:
+        """Read everything the dashboard shows from Redis."""
+        latency = []
+        for stage, raw in read_histograms(self.client).items():
+            count = int(raw.get("count", 0))
+            if not count:
+                continue
+            latency.append({
+                "stage": stage,
+                "count": count,
+                "mean": round(float(raw.get("sum", 0)) / count, 3),
+                "p50": histogram_percentile(raw, 50),
+                "p95": histogram_percentile(raw, 95),
+                "p99": histogram_percentile(raw, 99),
+            })
+
+        return {
+            "taken_at": time.time(),
+            "queue_depth": self.queue.depth(),
+            "stats": read_stats(self.client),
+            "throughput": completion_rate(self.client),
+            # Upstream calls/s the rate limiter lets through (None without one)
+            "allowed_rate": self.limiter.requests_per_second() if self.limiter else None,
+            "workers": len(live_pods(self.client)),
+            "latency": latency,
+            # Metered worker runtime: last 24h for savings, last 5 minutes for utilization
+            "usage": self.cost_model.report(read_usage(self.client, "hour", 24), "hour"),
+            "recent_usage": self.cost_model.report(read_usage(self.client, "minute", 5)),
+            "error": None,
+        }
+
+    def refresh(self):
+        try:
+            self._snapshot = self.collect()
+        except redis.RedisError as e:
+            print(f"[Snapshot] Refresh failed: {str(e)}")
+            if self._snapshot is not None:
+                self._snapshot = dict(self._snapshot, error=str(e))
+        self._ready.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.refresh()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self) -> "MetricsSnapshot":
+        """Start the refresh thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, timeout: float = 5) -> Optional[Dict]:
+        """
+        The latest snapshot, waiting up to `timeout` seconds for the first one.
+
+        Returns:
+            The snapshot dict, or None if none could be taken yet
+        """
+        self._ready.wait(timeout)
+        return self._snapshot
+
+
+def snapshot_from_env(client, queue, cost_model: CostModel, limiter=None) -> MetricsSnapshot:
+    """Build and start the aggregator (DASHBOARD_SNAPSHOT_INTERVAL seconds between refreshes)."""
+    interval = float(os.getenv("DASHBOARD_SNAPSHOT_INTERVAL", 2))
+    return MetricsSnapshot(client, queue, cost_model, interval=interval, limiter=limiter).start()
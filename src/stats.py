@@ -0,0 +1,112 @@
+"""
+GreenScale Stats - Constant-time job counters and a paginated job ledger
+
+Workers record every finished job once. The dashboard reads a single hash
+for totals and a page of the ledger for recent jobs, so rendering the metrics
+panel no longer scans the keyspace with KEYS result:*.
+
+Redis keys:
+- stats                  hash of all-time counters (one per status, plus tokens)
+- stats:minute:{minute}  same counters per epoch minute, kept for STATS_BUCKET_TTL
+- jobs:ledger            stream of finished jobs (trimmed to ~LEDGER_MAX_LEN entries)
+"""
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import jobs_total, observe_job
+
+STATS_KEY = "stats"
+LEDGER_KEY = "jobs:ledger"
+
+# Job outcomes counted in the stats hash
+STATUSES = ("processed", "failed", "cached", "coalesced", "cancelled")
+
+
+def record_jobs(client, job_ids: List[str], status: str, tokens: int = 0, prompt: str = "",
+                timings: Optional[Dict[str, float]] = None, cold: bool = False):
+    """
+    Count finished jobs and append them to the ledger in one round-trip.
+
+    Args:
+        client: redis.Redis client (decode_responses=True)
+        job_ids: Jobs that finished with the same outcome
+        status: One of STATUSES
+        tokens: Upstream tokens spent (counted once, not per job)
+        prompt: Prompt text; a short preview is kept in the ledger
+        timings: Job timestamps (see metrics.py); stored in the ledger and
+                 recorded in the latency histograms
+        cold: First job handled by this pod (its queue wait includes cold start)
+    """
+    now = time.time()
+    bucket = f"stats:minute:{int(now // 60)}"
+    bucket_ttl = int(os.getenv("STATS_BUCKET_TTL", 86400))
+    max_len = int(os.getenv("LEDGER_MAX_LEN", 10000))
+
+    pipe = client.pipeline(transaction=False)
+    pipe.hincrby(STATS_KEY, status, len(job_ids))
+    pipe.hincrby(bucket, status, len(job_ids))
+    if tokens:
+        pipe.hincrby(STATS_KEY, "tokens", tokens)
+        pipe.hincrby(bucket, "tokens", tokens)
+    pipe.expire(bucket, bucket_ttl)
+
+    jobs_total.inc(status, len(job_ids))
+    entry = {"status": status, "prompt": prompt[:80], "finished_at": f"{now:.3f}"}
+    if timings:
+        observe_job(pipe, timings, cold=cold)
+        entry.update({name: f"{value:.3f}" for name, value in timings.items() if value is not None})
+        if cold:
+            entry["cold"] = "1"
+    for job_id in job_ids:
+        pipe.xadd(
+            LEDGER_KEY,
+            dict(entry, job_id=job_id),
+            maxlen=max_len,
+            approximate=True,
+        )
+    pipe.execute()
+
+
+def read_stats(client) -> Dict[str, int]:
+    """All-time counters, with every status present (O(1))."""
+    raw = client.hgetall(STATS_KEY)
+    stats = {name: int(raw.get(name, 0)) for name in STATUSES + ("tokens",)}
+    stats["completed"] = sum(stats[name] for name in STATUSES)
+    return stats
+
+
+def read_minute_buckets(client, minutes: int = 60) -> List[Dict[str, int]]:
+    """Per-minute counters for the last `minutes` minutes, oldest first."""
+    current = int(time.time() // 60)
+    pipe = client.pipeline(transaction=False)
+    for minute in range(current - minutes + 1, current + 1):
+        pipe.hgetall(f"stats:minute:{minute}")
+    return [{k: int(v) for k, v in bucket.items()} for bucket in pipe.execute()]
+
+
+def completion_rate(client, minutes: int = 2) -> float:
+    """Jobs finished per second over the last `minutes` minutes (current one included)."""
+    buckets = read_minute_buckets(client, minutes)
+    finished = sum(bucket.get(status, 0) for bucket in buckets for status in STATUSES)
+    elapsed = (minutes - 1) * 60 + time.time() % 60
+    return finished / elapsed
+
+
+def recent_jobs(client, count: int = 20, before: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of the ledger, newest first.
+
+    Args:
+        count: Page size
+        before: Cursor returned by the previous page (exclusive)
+
+    Returns:
+        (jobs, cursor for the next page or None when there are no more)
+    """
+    max_id = f"({before}" if before else "+"
+    entries = client.xrevrange(LEDGER_KEY, max=max_id, min="-", count=count)
+    jobs = [dict(fields, entry_id=entry_id) for entry_id, fields in entries]
+    cursor = entries[-1][0] if len(entries) == count else None
+    return jobs, cursor
@@ -7,19 +7,55 @@ KEDA monitors the 'jobs' list in Redis and automatically scales this deployment.
 Flow:
 1. User submits prompt via Streamlit UI → pushed to Redis 'jobs' list
 2. KEDA detects items in queue → scales worker deployment from 0 to 1+
-3. Worker processes job using Neysa Llama 3.3 70B API
-4. Result stored in Redis with key 'result:{job_id}'
+3. Worker claims the oldest job (FIFO) and processes it using Neysa Llama 3.3 70B API
+4. Result record stored in Redis under 'result:{job_id}' (see results.py), status pushed to 'reply:{job_id}'
+   for the waiting dashboard, then the claim is acked
 5. Queue empty + 30s cooldown → KEDA scales back to 0 (Scale-to-Zero)
+
+Every scale-from-zero is paid for by the first user, so start-up is kept
+short and measured: imports are timed, the Redis and upstream connections
+are opened in parallel before the first claim, and the phases plus
+time-to-first-job are logged and exported (see metrics.py).
 """
 
+import time
+
+# Before any other import, so start-up timing covers them
+IMPORTS_STARTED_AT = time.time()
+
 import os
 import sys
-import time
 import signal
+import itertools
+import threading
 import redis
-import requests
 import json
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+try:
+    from dotenv import load_dotenv
+except ImportError:  # not in the worker image; config comes from the pod env there
+    load_dotenv = None
+
+from accounting import meter_from_env, prune_pods
+from cache import cache_from_env
+from coalesce import single_flight_from_env
+from hedge import hedger_from_env
+from inference import DEFAULT_MAX_TOKENS, InferenceError, client_from_env
+from job_queue import ClaimedJob, default_consumer_name, queue_from_env
+from metrics import (cache_lookups, error_class, first_job_seconds, hedged_requests, job_errors,
+                     job_retries, jobs_in_flight, process_started_at, rate_limit_factor, ready,
+                     redis_rtt, start_metrics_server, startup_seconds)
+from ratelimit import estimate_tokens, limiter_from_env
+from results import TokenStreamWriter, get_result, store_result
+from retry import is_transient, retry_policy_from_env
+from stats import record_jobs
+
+# Start of the process (interpreter start-up included where /proc is available);
+# start-up phases and first_job_seconds are measured from here
+POD_STARTED_AT = process_started_at() or IMPORTS_STARTED_AT
+startup_seconds["imports"] = time.time() - IMPORTS_STARTED_AT
 
 # ============================================================================
 # GRACEFUL SHUTDOWN HANDLING
@@ -43,61 +79,509 @@ signal.signal(signal.SIGINT, handle_shutdown)
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
-load_dotenv()
+if load_dotenv:
+    load_dotenv()
 
 NEYSA_API_URL = os.getenv("NEYSA_API_URL", "https://boomai-llama.neysa.io/v1/chat/completions")
 NEYSA_API_KEY = os.getenv("NEYSA_API_KEY")  # Required - set via K8s Secret
 REDIS_HOST = os.getenv("REDIS_HOST", "redis-service")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
+# Number of jobs kept in flight per pod. LLM calls are I/O-bound, so a pod can
+# wait on several upstream responses at once instead of scaling out for each.
+WORKER_CONCURRENCY = max(1, int(os.getenv("WORKER_CONCURRENCY", 1)))
+
+# Stream tokens to the dashboard as they are generated (flushed every STREAM_FLUSH_MS)
+STREAM_TOKENS = os.getenv("STREAM_TOKENS", "true").lower() == "true"
+STREAM_FLUSH_MS = int(os.getenv("STREAM_FLUSH_MS", 50))
+
+# Longest a job waits for shared upstream capacity before it fails (RATE_LIMIT_ENABLED)
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 60))
+
+# Serve Prometheus metrics on this port (0 disables the endpoint)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+
 if not NEYSA_API_KEY:
     print("[Worker] ERROR: NEYSA_API_KEY environment variable not set!")
     sys.exit(1)
 
 # ============================================================================
-# REDIS CONNECTION
+# REDIS & INFERENCE CONNECTIONS
 # ============================================================================
 redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
+# Reliable FIFO queue (list or stream backend): claimed jobs stay owned by this worker until acked
+WORKER_ID = default_consumer_name()
+job_queue = queue_from_env(redis_client, consumer=WORKER_ID)
+
+# One pooled keep-alive client per pod, sized to cover every in-flight job
+inference_client = client_from_env(NEYSA_API_URL, NEYSA_API_KEY, default_pool_size=WORKER_CONCURRENCY)
+
+# Response cache consulted before every API call (None when CACHE_ENABLED=false)
+response_cache = cache_from_env(redis_client, embed=inference_client.embed)
+
+# Cross-pod single-flight: a burst of identical prompts costs one API call
+coalescer = single_flight_from_env(redis_client)
+
+# Cluster-wide adaptive limit on upstream calls (None when RATE_LIMIT_ENABLED=false)
+rate_limiter = limiter_from_env(redis_client)
+
+# Transient failures are retried with backoff; the rest go to the dead-letter queue
+retry_policy = retry_policy_from_env(redis_client)
+
+# Busy/idle time and tokens of this pod, for cost and energy accounting
+usage_meter = meter_from_env(redis_client, WORKER_ID, WORKER_CONCURRENCY, started_at=POD_STARTED_AT)
+
+# Duplicate slow upstream calls (None when HEDGE_ENABLED=false); hedges only
+# use spare threads, so primaries never queue behind losers winding down
+hedger = hedger_from_env(rate_limiter, calls=WORKER_CONCURRENCY)
+
 print("[Worker] ====================================")
 print("[Worker] GreenScale Worker Started")
+print(f"[Worker] ID: {WORKER_ID}")
 print(f"[Worker] Redis: {REDIS_HOST}:{REDIS_PORT}")
 print(f"[Worker] API: {NEYSA_API_URL}")
+print(f"[Worker] Concurrency: {WORKER_CONCURRENCY}")
+print(f"[Worker] Cache: {'off' if response_cache is None else 'semantic' if response_cache.index is not None else 'exact'}")
+print(f"[Worker] Rate limit: {'off' if rate_limiter is None else f'{rate_limiter.rpm} rpm, {rate_limiter.tpm} tpm (adaptive)'}")
 print("[Worker] Waiting for jobs...")
 print("[Worker] ====================================")
 
 
+# Jobs handled by this pod so far; the first one's queue wait includes cold start
+jobs_started = itertools.count()
+
+
 # ============================================================================
 # JOB PROCESSING
 # ============================================================================
-def process_job(job_id: str, prompt: str) -> str:
+class JobCancelled(Exception):
+    """Raised when the user stops a streaming job; carries the partial text."""
+    
+    def __init__(self, partial_text: str):
+        super().__init__("cancelled by user")
+        self.partial_text = partial_text
+
+
+class RateLimited(InferenceError):
+    """No upstream capacity freed up within RATE_LIMIT_MAX_WAIT."""
+
+
+def process_job(job_id: str, prompt: str, timings: dict,
+                deadline: Optional[float] = None) -> Tuple[str, dict, Optional[str]]:
     """
     Process a single job by calling Neysa Llama 3.3 70B API.
+    With RATE_LIMIT_ENABLED, first waits for capacity in the shared limiter
+    and feeds the outcome back into it.
     
     Args:
         job_id: Unique identifier for the job
         prompt: User's prompt to send to the AI
+        timings: Job timestamps; upstream_start, first_byte and upstream_end are filled in
+        deadline: Job deadline (epoch seconds); bounds the wait for rate-limit capacity
         
     Returns:
-        AI response text or error message
+        AI response text, its token usage (prompt_tokens, completion_tokens,
+        total_tokens) and the model that answered
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {NEYSA_API_KEY}"
-    }
+    estimate = estimate_tokens(prompt, DEFAULT_MAX_TOKENS)
+    max_wait = RATE_LIMIT_MAX_WAIT
+    if deadline is not None:
+        max_wait = min(max_wait, float(deadline) - time.time())
+    if rate_limiter and not rate_limiter.acquire(estimate, timeout=max_wait):
+        raise RateLimited(f"Rate limited: no upstream capacity within {max(0.0, max_wait):.0f}s")
     
-    payload = {
-        "model": "meta-llama/Llama-3.3-70B-Instruct",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": 200
-    }
+    timings["upstream_start"] = time.time()
+    try:
+        response, usage, model = call_upstream(job_id, prompt, timings)
+    except InferenceError as e:
+        if rate_limiter:
+            rate_limit_factor.set(rate_limiter.record_failure(e.status_code, e.retry_after))
+        raise
+    finally:
+        timings["upstream_end"] = time.time()
     
-    response = requests.post(NEYSA_API_URL, headers=headers, json=payload, timeout=60)
-    response.raise_for_status()
+    if rate_limiter:
+        rate_limit_factor.set(rate_limiter.record_success(timings["first_byte"] - timings["upstream_start"]))
+        rate_limiter.settle(estimate, usage.get("total_tokens", 0))
+    return response, usage, model
+
+
+def hedged(attempt, cancel=None, tokens: int = 0):
+    """Run an upstream call through the hedger when HEDGE_ENABLED, else directly."""
+    if not hedger:
+        return attempt()
+    handle, winner = hedger.race(attempt, cancel, tokens=tokens)
+    if winner:
+        hedged_requests.inc(winner)
+    return handle
+
+
+def open_stream(prompt: str):
+    """Start a streaming completion and wait for its first text delta (None if empty)."""
+    stream = inference_client.chat_stream(prompt)
+    deltas = iter(stream)
+    return stream, deltas, next(deltas, None)
+
+
+def call_upstream(job_id: str, prompt: str, timings: dict) -> Tuple[str, dict, Optional[str]]:
+    """
+    Run the chat completion (streamed or not); sets timings["first_byte"].
+    With HEDGE_ENABLED, a call slow to its first byte is raced against a duplicate.
+    """
+    estimate = estimate_tokens(prompt, DEFAULT_MAX_TOKENS)
+    if not STREAM_TOKENS:
+        result = hedged(lambda: inference_client.chat(prompt), tokens=estimate)
+        timings["first_byte"] = time.time()
+        return result["choices"][0]["message"]["content"], result.get("usage") or {}, result.get("model")
     
-    result = response.json()
-    return result["choices"][0]["message"]["content"]
+    # Stream tokens to 'stream:{job_id}' as they arrive so the dashboard can
+    # render them live; a cancel request closes the upstream connection early
+    writer = TokenStreamWriter(redis_client, job_id, flush_interval=STREAM_FLUSH_MS / 1000)
+    stream, deltas, first = hedged(lambda: open_stream(prompt), lambda call: call[0].close(), tokens=estimate)
+    parts = []
+    for delta in itertools.chain([first] if first else [], deltas):
+        if not parts:
+            timings["first_byte"] = time.time()
+        parts.append(delta)
+        if not writer.write(delta):
+            stream.close()
+            writer.flush()
+            raise JobCancelled("".join(parts))
+    writer.flush()
+    timings.setdefault("first_byte", time.time())
+    return "".join(parts), stream.usage, stream.model
+
+
+# ============================================================================
+# JOB HANDLING
+# ============================================================================
+def follower_job(leader_data: dict, follower_id: str) -> dict:
+    """
+    Payload for running a coalesced follower on its own. Followers only keep
+    their job id, so lane and tenant are the leader's; attempts, deadline
+    and enqueue time start over.
+    """
+    job = {key: leader_data[key] for key in ("prompt", "priority", "tenant") if key in leader_data}
+    job["job_id"] = follower_id
+    return job
+
+
+def handle_job(job: ClaimedJob):
+    """
+    Run a claimed job, store its result and ack it.
+    Runs on an executor thread, so every failure is caught and reported here.
+    A job is only acked once its outcome is stored. If the Redis connection
+    drops out first, it stays claimed and the queue backend recovers it once
+    this pod is gone; any other error hands it back or fails it (see
+    settle_failed_job), since nothing recovers a claim held by a live pod.
+    """
+    jobs_in_flight.inc()
+    usage_meter.job_started()
+    claimed_at = time.time()
+    try:
+        if store_outcome(job.data):
+            job_queue.ack(job)
+    except redis.ConnectionError as e:
+        print(f"[Worker] Redis connection lost, job left claimed: {str(e)}")
+    except Exception as e:
+        print(f"[Worker] Unexpected error: {str(e)}")
+        try:
+            settle_failed_job(job, e, claimed_at)
+        except Exception as e:
+            print(f"[Worker] Could not settle failed job, left claimed: {str(e)}")
+    finally:
+        usage_meter.job_finished()
+        jobs_in_flight.dec()
+
+
+def settle_failed_job(job: ClaimedJob, failure: Exception, claimed_at: float):
+    """
+    Finish with a job whose handling raised: it is retried with backoff while
+    it has attempts left, else stored as failed for it and its followers.
+    Either way it is acked. A job whose outcome was stored before the error
+    (only the bookkeeping after it failed) is just acked.
+    """
+    try:
+        job_data = json.loads(job.data)
+    except json.JSONDecodeError:
+        job_data = None
+    if not isinstance(job_data, dict) or not job_data.get("job_id") or not job_data.get("prompt"):
+        job_queue.ack(job)
+        return
+    job_id, prompt = job_data["job_id"], job_data["prompt"]
+    
+    record = get_result(redis_client, job_id)
+    if record is None or record.get("finished_at", 0) < claimed_at:
+        job_errors.inc(error_class(failure))
+        delay = retry_policy.schedule(job_data)
+        if delay is not None:
+            if coalescer:
+                coalescer.extend(prompt, job_id, delay)
+            job_retries.inc(error_class(failure))
+            print(f"[Worker] Job {job_id} will be retried in {delay:.1f}s")
+        else:
+            error = f"Worker error: {str(failure)}"
+            reason = "deadline" if retry_policy.attempts_left(job_data) else "max_attempts"
+            retry_policy.dead_letter(job_data, error, error_class(failure), reason=reason)
+            followers = coalescer.release(prompt, job_id) if coalescer else []
+            store_result(redis_client, [job_id] + followers, "", status="failed", error=error,
+                         error_class=error_class(failure), prompt=prompt)
+            record_jobs(redis_client, [job_id] + followers, "failed", prompt=prompt)
+            print(f"[Worker] Job {job_id} failed: {error}")
+    job_queue.ack(job)
+
+
+def store_outcome(job_json: str) -> bool:
+    """
+    Parse a raw job, run it and store the result (or error) in Redis.
+    
+    Returns:
+        True when the job is finished with (including malformed jobs, which
+        are dropped), False when it should stay claimed
+    """
+    try:
+        job_data = json.loads(job_json)
+    except json.JSONDecodeError as e:
+        print(f"[Worker] Invalid JSON in job: {str(e)}")
+        return True
+    
+    timings = {"enqueued_at": job_data.get("enqueued_at"), "dequeued_at": time.time()}
+    cold = next(jobs_started) == 0
+    if cold:
+        first_job_seconds.set(timings["dequeued_at"] - POD_STARTED_AT)
+        print(f"[Worker] First job claimed {first_job_seconds.value:.2f}s after pod start")
+    job_id = job_data.get("job_id")
+    prompt = job_data.get("prompt")
+    
+    if not job_id or not prompt:
+        print(f"[Worker] Invalid job format, skipping: {job_json}")
+        return True
+    
+    # Repeated prompts are answered from the cache without calling the API
+    cached = response_cache.get(prompt) if response_cache else None
+    if response_cache:
+        cache_lookups.inc("miss" if cached is None else "hit")
+    if cached is not None:
+        print(f"[Worker] Job {job_id} served from cache")
+        # A leader re-queued from a dead pod may find the answer its first run
+        # cached before it could store it: its followers are still waiting
+        followers = coalescer.release(prompt, job_id) if coalescer else []
+        store_result(redis_client, [job_id] + followers, cached, status="cached", prompt=prompt, timings=timings)
+        timings["result_stored"] = time.time()
+        record_jobs(redis_client, [job_id], "cached", prompt=prompt, timings=timings, cold=cold)
+        if followers:
+            record_jobs(redis_client, followers, "cached", prompt=prompt)
+        return True
+    
+    # Nobody is waiting for the answer any more: don't spend an API call on it
+    deadline = job_data.get("deadline")
+    if deadline is not None and time.time() >= float(deadline):
+        error = "Deadline exceeded before the job could run"
+        print(f"[Worker] Job {job_id} dropped: {error}")
+        retry_policy.dead_letter(job_data, error, "DeadlineExceeded", reason="deadline")
+        # A retried job may still lead identical jobs that attached to it;
+        # release() hands over nobody else's followers if it doesn't
+        followers = coalescer.release(prompt, job_id) if coalescer else []
+        store_result(redis_client, [job_id] + followers, "", status="failed", error=error,
+                     error_class="DeadlineExceeded", prompt=prompt, timings=timings)
+        timings["result_stored"] = time.time()
+        record_jobs(redis_client, [job_id] + followers, "failed", prompt=prompt, timings=timings, cold=cold)
+        return True
+    
+    # An identical prompt is already in flight: attach to it instead of calling the API
+    if coalescer and not coalescer.join(prompt, job_id):
+        print(f"[Worker] Job {job_id} attached to an identical in-flight job")
+        return True
+    
+    try:
+        return run_job(job_data, timings, cold)
+    finally:
+        # release() and extend() already stopped refreshing this job's marker;
+        # if the job raised instead, it must lapse rather than outlive the job here
+        if coalescer:
+            coalescer.forget(job_id)
+
+
+def run_job(job_data: dict, timings: dict, cold: bool) -> bool:
+    """
+    Call the API for a job that leads its prompt (or runs uncoalesced), then
+    store the result for it and its followers. Returns as store_outcome().
+    """
+    job_id = job_data["job_id"]
+    prompt = job_data["prompt"]
+    deadline = job_data.get("deadline")
+    print(f"[Worker] Processing job {job_id}: '{prompt[:50]}...'")
+    
+    result_text = ""
+    usage, model = {}, None
+    error = failure = None
+    try:
+        # Call AI API
+        response, usage, model = process_job(job_id, prompt, timings, deadline=deadline)
+        print(f"[Worker] Job {job_id} completed successfully")
+        result_text = response
+        status = "processed"
+        
+        if response_cache:
+            response_cache.set(prompt, response)
+        
+    except JobCancelled as e:
+        result_text = e.partial_text
+        status = "cancelled"
+        print(f"[Worker] Job {job_id} cancelled by user")
+        
+    except InferenceError as e:
+        error = f"API Error: {str(e)}"
+        status = "failed"
+        failure = e
+        job_errors.inc(error_class(e))
+        print(f"[Worker] Job {job_id} failed: {error}")
+        
+    except (KeyError, IndexError, ValueError) as e:
+        error = f"Response parsing error: {str(e)}"
+        status = "failed"
+        failure = e
+        job_errors.inc(error_class(e))
+        print(f"[Worker] Job {job_id} failed: {error}")
+    
+    if failure is not None:
+        # Transient errors before any token was streamed are retried later
+        # instead of answered; the job is acked so it doesn't hold a slot, and
+        # it stays the coalescing leader, so identical jobs keep waiting for it
+        transient = is_transient(failure) and "first_byte" not in timings
+        delay = retry_policy.schedule(job_data) if transient else None
+        if delay is not None:
+            if coalescer:
+                coalescer.extend(prompt, job_id, delay)
+            job_retries.inc(error_class(failure))
+            print(f"[Worker] Job {job_id} will be retried in {delay:.1f}s")
+            return True
+        if not transient:
+            reason = "permanent"
+        elif retry_policy.attempts_left(job_data):
+            reason = "deadline"
+        else:
+            reason = "max_attempts"
+        retry_policy.dead_letter(job_data, error, error_class(failure), reason=reason)
+    
+    # Identical jobs that attached while this one was in flight get the same result
+    followers = coalescer.release(prompt, job_id) if coalescer else []
+    if followers and status == "cancelled":
+        # Only this job's user asked to stop: the followers are queued again,
+        # and the first of them to be claimed leads the rest
+        job_queue.enqueue_many([follower_job(job_data, follower) for follower in followers])
+        print(f"[Worker] Job {job_id} cancelled, re-queued {len(followers)} identical job(s)")
+        followers = []
+    if followers:
+        print(f"[Worker] Job {job_id} result shared with {len(followers)} identical job(s)")
+    
+    # Store the result record in Redis and wake up anyone waiting on it
+    store_result(redis_client, [job_id] + followers, result_text, status=status, error=error,
+                 error_class=error_class(failure) if failure else None, model=model,
+                 usage=usage, prompt=prompt, timings=timings)
+    timings["result_stored"] = time.time()
+    
+    # Update counters, latency histograms and the job ledger
+    tokens = usage.get("total_tokens", 0)
+    record_jobs(redis_client, [job_id], status, tokens=tokens, prompt=prompt, timings=timings, cold=cold)
+    usage_meter.add_tokens(tokens)
+    if followers:
+        record_jobs(redis_client, followers, "coalesced" if status == "processed" else status, prompt=prompt)
+    return True
+
+
+# ============================================================================
+# QUEUE MAINTENANCE
+# ============================================================================
+def maintenance_loop(stop: threading.Event):
+    """
+    Keep this worker's heartbeat and coalescing markers alive, reap jobs
+    from dead workers and report this pod's usage. Runs until the pod has
+    fully drained, so in-flight jobs are never reaped.
+    """
+    ttl = min(job_queue.heartbeat_ttl, coalescer.ttl) if coalescer else job_queue.heartbeat_ttl
+    interval = max(1, ttl // 3)
+    while not stop.is_set():
+        try:
+            started = time.perf_counter()
+            redis_client.ping()
+            redis_rtt.observe(time.perf_counter() - started)
+            job_queue.heartbeat()
+            if coalescer:
+                coalescer.refresh()
+            recovered = job_queue.reap()
+            if recovered:
+                print(f"[Worker] Re-queued {recovered} job(s) from dead workers")
+            usage_meter.flush()
+        except redis.RedisError as e:
+            print(f"[Worker] Heartbeat failed: {str(e)}")
+        except Exception as e:
+            # Never let this thread die: the heartbeat would lapse while jobs
+            # still run here, and peers would reap and run them a second time
+            print(f"[Worker] Maintenance error: {str(e)}")
+        stop.wait(interval)
+
+
+def retry_loop(stop: threading.Event):
+    """
+    Move due retries back onto the job queue. Sleeps until the next retry is
+    due, checking at least once a second for newly scheduled ones.
+    """
+    while not stop.is_set():
+        wait = 1.0
+        try:
+            due = retry_policy.next_due()
+            if due is not None and due <= time.time():
+                promoted = retry_policy.promote(job_queue)
+                if promoted:
+                    print(f"[Worker] Re-queued {promoted} job(s) for retry")
+                wait = 0.0
+            elif due is not None:
+                wait = min(wait, due - time.time())
+        except redis.RedisError as e:
+            print(f"[Worker] Retry promotion failed: {str(e)}")
+        except Exception as e:
+            # Keep promoting: nothing else moves this pod's share of jobs:retry
+            print(f"[Worker] Retry promotion error: {str(e)}")
+        stop.wait(max(0.01, wait))
+
+
+# ============================================================================
+# START-UP
+# ============================================================================
+def connect_eagerly():
+    """
+    Open and verify the Redis and upstream connections in parallel instead of
+    on the first claim / first job, record how long each took and mark the
+    worker ready once Redis answers.
+    """
+    def timed(phase, step):
+        started = time.perf_counter()
+        try:
+            if step() is not False:
+                startup_seconds[phase] = time.perf_counter() - started
+        except Exception as e:
+            print(f"[Worker] Start-up {phase} check failed: {str(e)}")
+    
+    steps = {"redis": redis_client.ping}
+    # Open upstream connections now so the first job skips the handshakes
+    if os.getenv("INFERENCE_PREWARM", "true").lower() == "true":
+        connections = int(os.getenv("INFERENCE_PREWARM_CONNECTIONS", 1))
+        steps["upstream"] = lambda: inference_client.warm(connections)
+    
+    threads = [threading.Thread(target=timed, args=item) for item in steps.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    if "redis" in startup_seconds:
+        ready.set()
+    startup_seconds["ready"] = time.time() - POD_STARTED_AT
+    phases = ", ".join(f"{phase} {startup_seconds[phase]:.3f}s" for phase in ("imports", "redis", "upstream")
+                       if phase in startup_seconds)
+    print(f"[Worker] Start-up: {phases}; ready {startup_seconds['ready']:.2f}s after pod start")
 
 
 # ============================================================================
@@ -106,61 +590,85 @@ def process_job(job_id: str, prompt: str) -> str:
 def main():
     """
     Main worker loop - continuously processes jobs from Redis queue.
-    Uses blocking pop (blpop) to efficiently wait for jobs without busy-looping.
-    Handles graceful shutdown when KEDA scales down to 0 replicas.
+    Uses a blocking claim (BLMOVE / XREADGROUP) to wait for the oldest jobs without
+    busy-looping. Up to WORKER_CONCURRENCY jobs run in parallel on a bounded thread
+    pool; jobs are only claimed for free slots, so nothing waits inside the pod.
+    Handles graceful shutdown when KEDA scales down to 0 replicas: no new jobs
+    are taken after SIGTERM, and in-flight jobs finish before exit.
     """
     global shutdown_requested
     
+    # Serve metrics first so the readiness probe can see the start-up
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+        print(f"[Worker] Metrics on :{METRICS_PORT}/metrics, readiness on :{METRICS_PORT}/ready")
+    
+    connect_eagerly()
+    
+    maintenance_stop = threading.Event()
+    maintenance = threading.Thread(target=maintenance_loop, args=(maintenance_stop,), daemon=True)
+    maintenance.start()
+    retries = threading.Thread(target=retry_loop, args=(maintenance_stop,), daemon=True)
+    retries.start()
+    
+    executor = ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="job")
+    slots = threading.BoundedSemaphore(WORKER_CONCURRENCY)
+    
+    def release_slot(_future):
+        slots.release()
+    
     while not shutdown_requested:
+        # Wait for a free slot, waking up regularly to check the shutdown flag
+        if not slots.acquire(timeout=1):
+            continue
+        
+        # Grab other free slots too, so one claim can fill them
+        free = 1
+        while free < WORKER_CONCURRENCY and slots.acquire(blocking=False):
+            free += 1
+        
         try:
-            # Blocking pop with 5s timeout - allows checking shutdown flag regularly
-            result = redis_client.blpop("jobs", timeout=5)
-            
-            if result is None:
-                continue  # Timeout, loop again to check shutdown flag
+            # Blocking claim with 5s timeout - allows checking shutdown flag regularly
+            jobs = job_queue.claim(count=free, timeout=5)
+            ready.set()
             
-            # Parse job from Redis
-            _, job_json = result
-            job_data = json.loads(job_json)
-            job_id = job_data.get("job_id")
-            prompt = job_data.get("prompt")
+            for job in jobs:
+                future = executor.submit(handle_job, job)
+                future.add_done_callback(release_slot)
             
-            if not job_id or not prompt:
-                print(f"[Worker] Invalid job format, skipping: {job_json}")
-                continue
-            
-            print(f"[Worker] Processing job {job_id}: '{prompt[:50]}...'")
-            
-            try:
-                # Call AI API
-                response = process_job(job_id, prompt)
-                print(f"[Worker] Job {job_id} completed successfully")
-                
-                # Store result in Redis (expires in 5 minutes)
-                redis_client.set(f"result:{job_id}", response, ex=300)
-                
-            except requests.exceptions.RequestException as e:
-                error_msg = f"API Error: {str(e)}"
-                print(f"[Worker] Job {job_id} failed: {error_msg}")
-                redis_client.set(f"result:{job_id}", error_msg, ex=300)
-                
-            except (KeyError, IndexError) as e:
-                error_msg = f"Response parsing error: {str(e)}"
-                print(f"[Worker] Job {job_id} failed: {error_msg}")
-                redis_client.set(f"result:{job_id}", error_msg, ex=300)
-                
-        except json.JSONDecodeError as e:
-            print(f"[Worker] Invalid JSON in job: {str(e)}")
+            # Timeout or a short claim: hand unused slots back
+            for _ in range(free - len(jobs)):
+                slots.release()
             
         except redis.ConnectionError as e:
+            ready.clear()
+            for _ in range(free):
+                slots.release()
             print(f"[Worker] Redis connection lost: {str(e)}")
             print("[Worker] Reconnecting in 5 seconds...")
             time.sleep(5)
             
         except Exception as e:
+            for _ in range(free):
+                slots.release()
             print(f"[Worker] Unexpected error: {str(e)}")
             time.sleep(1)
     
+    # Drain: let in-flight jobs finish before the pod exits
+    ready.clear()
+    print("[Worker] Waiting for in-flight jobs to finish...")
+    executor.shutdown(wait=True)
+    maintenance_stop.set()
+    maintenance.join()
+    retries.join()
+    try:
+        job_queue.deregister()
+        usage_meter.flush(final=True)
+        prune_pods(redis_client)
+    except redis.ConnectionError as e:
+        print(f"[Worker] Could not deregister from queue: {str(e)}")
+    inference_client.close()
+    
     # Clean exit
     print("[Worker] Graceful shutdown complete. Goodbye!")
     sys.exit(0)
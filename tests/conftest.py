@@ -0,0 +1,18 @@
+"""
+Shared fixtures. Tests run against fakeredis, so no Redis server is needed:
+    pip install -r requirements-test.txt && python -m pytest
+"""
+
+import os
+import sys
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture
+def client():
+    """A fresh in-memory Redis (decode_responses=True, like the services use)."""
+    return fakeredis.FakeRedis(decode_responses=True)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from api import make_app
+from job_queue import ListQueue
+from results import store_result
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def call(server, steps):
+    """Run `steps(http)` against the API on a fakeredis server shared with the test."""
+    async def main():
+        client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        async with TestClient(TestServer(make_app(client))) as http:
+            return await steps(http)
+    return asyncio.run(main())
+
+
+def test_submit_and_bulk_enqueue(server, monkeypatch):
+    monkeypatch.setenv("QUEUE_BACKEND", "list")
+
+    async def steps(http):
+        one = await http.post("/jobs", json={"prompt": "hi"})
+        bulk = await http.post("/jobs/bulk", json={"jobs": [{"prompt": "a"}, {"prompt": "b", "job_id": "x"}]})
+        bad = await http.post("/jobs/bulk", json={"jobs": [{"prompt": "a"}, {"prompt": ""}]})
+        return one.status, await bulk.json(), bad.status
+
+    one, bulk, bad = call(server, steps)
+    assert one == 202
+    assert bulk["job_ids"][1] == "api-api-x"
+    assert bad == 400
+    # The malformed bulk request queued nothing
+    sync = fakeredis.FakeRedis(server=server, decode_responses=True)
+    assert ListQueue(sync).depth() == 3
+
+
+def test_wait_twice_on_finished_job(server):
+    sync = fakeredis.FakeRedis(server=server, decode_responses=True)
+    store_result(sync, ["a"], "done")
+
+    async def steps(http):
+        bodies = []
+        for _ in range(2):
+            response = await http.get("/jobs/a/wait", params={"timeout": 3})
+            assert response.status == 200
+            bodies.append(await response.json())
+        return bodies
+
+    started = time.monotonic()
+    bodies = call(server, steps)
+    assert [body["result"] for body in bodies] == ["done", "done"]
+    assert time.monotonic() - started < 1
+
+
+def test_wait_and_fetch_pending_job(server):
+    async def steps(http):
+        pending = await http.get("/jobs/nope")
+        waited = await http.get("/jobs/nope/wait", params={"timeout": 1})
+        return pending.status, waited.status
+
+    assert call(server, steps) == (202, 202)
+
+
+def test_stream_submit_creates_group(server, monkeypatch):
+    monkeypatch.setenv("QUEUE_BACKEND", "stream")
+
+    async def steps(http):
+        return (await http.post("/jobs", json={"prompt": "hi"})).status
+
+    assert call(server, steps) == 202
+    sync = fakeredis.FakeRedis(server=server, decode_responses=True)
+    assert sync.xinfo_groups("jobs:stream")[0]["lag"] == 1
+
+
+def test_caller_job_id_cannot_overwrite_another_job(server, monkeypatch):
+    monkeypatch.setenv("QUEUE_BACKEND", "list")
+    sync = fakeredis.FakeRedis(server=server, decode_responses=True)
+    store_result(sync, ["batch-run-1"], "theirs")
+
+    async def steps(http):
+        response = await http.post("/jobs", json={"prompt": "hi", "job_id": "batch-run-1", "tenant": "t"})
+        return (await response.json())["job_id"]
+
+    assert call(server, steps) == "api-t-batch-run-1"
+    queued, = ListQueue(sync).claim(timeout=1)
+    assert json.loads(queued.data)["job_id"] == "api-t-batch-run-1"
@@ -0,0 +1,114 @@
+import argparse
+import json
+import threading
+
+import pytest
+
+from batch import Checkpoint, load_output, run
+from job_queue import ListQueue
+from results import store_result
+from stats import record_jobs
+
+
+class Worker(threading.Thread):
+    """Answers queued jobs like worker.py would; prompts containing 'bad' fail."""
+
+    def __init__(self, client):
+        super().__init__(daemon=True)
+        self.queue = ListQueue(client, consumer="test-worker")
+        self.client = client
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            for job in self.queue.claim(count=50, timeout=0.1):
+                data = json.loads(job.data)
+                status = "failed" if "bad" in data["prompt"] else "processed"
+                store_result(self.client, [data["job_id"]], data["prompt"].upper(), status=status,
+                             error="boom" if status == "failed" else None)
+                record_jobs(self.client, [data["job_id"]], status)
+                self.queue.ack(job)
+
+
+class Killed(Exception):
+    """Stands in for the batch process being killed."""
+
+
+@pytest.fixture
+def worker(client):
+    worker = Worker(client)
+    worker.start()
+    yield worker
+    worker.stopped.set()
+    worker.join()
+
+
+def make_args(tmp_path, rows, **overrides):
+    source = tmp_path / "in.jsonl"
+    source.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    args = dict(input=str(source), output=str(tmp_path / "out.jsonl"), max_in_flight=20, chunk=7,
+                priority="batch", tenant="batch", job_timeout=30, checkpoint_every=0,
+                retry_failed=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def output_rows(args):
+    with open(args.output) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_runs_every_row(client, worker, tmp_path):
+    rows = [{"id": f"r{i}", "prompt": f"prompt {i}"} for i in range(50)] + [{"id": "empty"}]
+    args = make_args(tmp_path, rows)
+    counts = run(client, ListQueue(client), args)
+    assert counts["processed"] == 50 and counts["invalid"] == 1
+    out = {row["id"]: row for row in output_rows(args)}
+    assert out["r7"]["result"] == "PROMPT 7" and out["r7"]["line"] == 8
+    assert out["empty"]["status"] == "invalid"
+    assert not Checkpoint(f"{args.output}.checkpoint", args.input).load()
+
+
+def test_resume_after_kill(client, worker, tmp_path, monkeypatch):
+    args = make_args(tmp_path, [{"prompt": f"prompt {i}"} for i in range(200)])
+    xread = client.xread
+    calls = {"n": 0}
+
+    def dying_xread(*a, **kw):
+        calls["n"] += 1
+        if calls["n"] > 5:
+            raise Killed()
+        return xread(*a, **kw)
+
+    monkeypatch.setattr(client, "xread", dying_xread)
+    with pytest.raises(Killed):
+        run(client, ListQueue(client), args)
+    monkeypatch.setattr(client, "xread", xread)
+    first = output_rows(args)
+    assert 0 < len(first) < 200
+    # The kill also cut the last row in half
+    with open(args.output, "a") as f:
+        f.write('{"line": 3, "sta')
+
+    run(client, ListQueue(client), args)
+    lines = [row["line"] for row in output_rows(args)]
+    assert sorted(lines) == list(range(1, 201))
+
+
+def test_retry_failed(client, worker, tmp_path):
+    args = make_args(tmp_path, [{"prompt": "good"}, {"prompt": "bad"}])
+    assert run(client, ListQueue(client), args)["failed"] == 1
+    assert load_output(args.output) == {1, 2}
+    assert load_output(args.output, retry_failed=True) == {1}
+
+    args.retry_failed = True
+    counts = run(client, ListQueue(client), args)
+    assert counts["submitted"] == 1 and counts["failed"] == 1
+    assert [row["line"] for row in output_rows(args)].count(2) == 2
+
+
+def test_checkpoint_refuses_other_input(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "cp"), str(tmp_path / "a.jsonl"))
+    checkpoint.save()
+    with pytest.raises(ValueError):
+        Checkpoint(str(tmp_path / "cp"), str(tmp_path / "b.jsonl")).load()
@@ -0,0 +1,59 @@
+import time
+
+from cache import EMBEDDINGS_KEY, LRU_KEY, ResponseCache, cache_key
+
+
+class CountingEmbed:
+    """Embeds a text as letter counts and records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return [text.count(c) + 0.01 for c in "abcdefghijklmnopqrstuvwxyz"]
+
+
+def test_exact_hit_ignores_whitespace(client):
+    cache = ResponseCache(client)
+    cache.set("What is  Redis?", "a store")
+    assert cache.get(" What is Redis? ") == "a store"
+    assert cache.get("What is Kafka?") is None
+
+
+def test_lru_eviction(client):
+    cache = ResponseCache(client, max_entries=2)
+    cache.set("one", "1")
+    cache.set("two", "2")
+    cache.get("one")
+    cache.set("three", "3")
+    assert cache.get("two") is None
+    assert cache.get("one") == "1" and cache.get("three") == "3"
+
+
+def test_expired_entries_leave_the_lru(client):
+    cache = ResponseCache(client, ttl=60)
+    cache.set("old", "1")
+    # Last used (and so expired) over a TTL ago
+    client.zadd(LRU_KEY, {cache_key("old"): time.time() - 120})
+    client.delete(f"cache:{cache_key('old')}")
+    cache.set("new", "2")
+    assert client.zrange(LRU_KEY, 0, -1) == [cache_key("new")]
+
+
+def test_miss_embeds_prompt_once(client):
+    embed = CountingEmbed()
+    cache = ResponseCache(client, embed=embed, similarity_threshold=0.99)
+    cache.set("seed prompt", "seed")
+    embed.calls.clear()
+
+    assert cache.get("unrelated question") is None
+    cache.set("unrelated question", "answer")
+    assert embed.calls == ["unrelated question"]
+    assert client.hexists(EMBEDDINGS_KEY, cache_key("unrelated question"))
+
+
+def test_semantic_hit(client):
+    cache = ResponseCache(client, embed=CountingEmbed(), similarity_threshold=0.9)
+    cache.set("how do i reset my password", "use the link")
+    assert cache.get("how do I reset my password?") == "use the link"
@@ -0,0 +1,57 @@
+from coalesce import SingleFlight
+
+
+def test_followers_get_leader_result(client):
+    flight = SingleFlight(client, ttl=60)
+    assert flight.join("p", "a")
+    assert not flight.join("p", "b")
+    assert not flight.join("p", "c")
+    # The leader's re-queued job leads again
+    assert flight.join("p", "a")
+    assert flight.release("p", "a") == ["b", "c"]
+    assert flight.join("p", "d")
+
+
+def test_refresh_keeps_running_leader(client):
+    flight = SingleFlight(client, ttl=60)
+    flight.join("p", "a")
+    flight.join("p", "b")
+    marker, waiters = flight._keys("p")
+    client.expire(marker, 1)
+    client.expire(waiters, 1)
+    assert flight.refresh() == 1
+    assert client.ttl(marker) > 50 and client.ttl(waiters) > 50
+
+    flight.release("p", "a")
+    assert flight.refresh() == 0
+
+
+def test_extend_covers_retry_backoff(client):
+    flight = SingleFlight(client, ttl=60)
+    flight.join("p", "a")
+    assert flight.extend("p", "a", 30)
+    marker, waiters = flight._keys("p")
+    assert client.ttl(marker) > 90
+    # The job left this process, so it isn't refreshed (or shortened) here
+    assert flight.refresh() == 0
+    # A follower attaching meanwhile keeps the list alive as long as the marker
+    flight.join("p", "b")
+    assert client.ttl(waiters) > 90
+
+
+def test_lost_marker_is_not_refreshed(client):
+    flight = SingleFlight(client, ttl=60)
+    flight.join("p", "a")
+    marker, _ = flight._keys("p")
+    client.set(marker, "other")
+    assert flight.refresh() == 0
+    assert not flight.extend("p", "a", 5)
+
+
+def test_release_by_non_leader_leaves_waiters(client):
+    flight = SingleFlight(client, ttl=60)
+    flight.join("p", "a")
+    flight.join("p", "b")
+    # A job that never led, or whose lapsed marker was taken over by "a"
+    assert flight.release("p", "z") == []
+    assert flight.release("p", "a") == ["b"]
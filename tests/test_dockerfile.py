@@ -0,0 +1,55 @@
+import ast
+import os
+import re
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+SRC = os.path.join(ROOT, "src")
+LOCAL_MODULES = {name[:-3] for name in os.listdir(SRC) if name.endswith(".py")}
+
+
+def read_stages():
+    """{stage: (modules COPY'd from src/, module the CMD runs)} from the Dockerfile."""
+    stages, stage = {}, None
+    with open(os.path.join(ROOT, "Dockerfile")) as f:
+        for line in f:
+            match = re.match(r"FROM \S+ AS (\w+)", line)
+            if match:
+                stage = match.group(1)
+                stages[stage] = (set(), None)
+            match = re.match(r"COPY src/(\w+)\.py ", line)
+            if match and stage:
+                stages[stage][0].add(match.group(1))
+            match = re.match(r'CMD \["python", "(\w+)\.py"\]', line)
+            if match and stage:
+                stages[stage] = (stages[stage][0], match.group(1))
+    return stages
+
+
+def local_imports(module, seen=None):
+    """`module` and every src/ module it imports, including function-level imports."""
+    seen = set() if seen is None else seen
+    if module in seen:
+        return seen
+    seen.add(module)
+    with open(os.path.join(SRC, f"{module}.py")) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] in LOCAL_MODULES:
+                local_imports(name.split(".")[0], seen)
+    return seen
+
+
+@pytest.mark.parametrize("stage", ["api", "worker"])
+def test_image_stage_copies_every_module_its_command_needs(stage):
+    copied, command = read_stages()[stage]
+    assert command, f"stage {stage} has no python CMD"
+    assert local_imports(command) - copied == set()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from hedge import Hedger
+
+
+def learned(**kwargs) -> Hedger:
+    """A hedger past its learning phase, hedging after 50ms, with credit to spend."""
+    hedger = Hedger(min_samples=1, min_delay=0.05, max_fraction=1, **kwargs)
+    hedger.observe(0.01)
+    return hedger
+
+
+def test_fast_calls_are_not_hedged():
+    hedger = learned()
+    assert hedger.race(lambda: "ok") == ("ok", None)
+
+
+def test_slow_call_is_hedged():
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        # The first call hangs, its duplicate answers at once
+        time.sleep(1 if len(calls) == 1 else 0)
+        return len(calls)
+
+    hedger = learned()
+    started = time.monotonic()
+    assert hedger.race(attempt) == (2, "hedge")
+    assert time.monotonic() - started < 0.5
+
+
+def test_budget_caps_hedges():
+    hedger = Hedger(min_samples=1, min_delay=0.01, max_fraction=0.5)
+    hedger.observe(0.001)
+    winners = [hedger.race(lambda: time.sleep(0.05))[1] for _ in range(4)]
+    # Each call earns half a hedge
+    assert winners.count(None) >= 2
+
+
+def test_hedges_never_starve_primaries():
+    release = threading.Event()
+    hedger = learned(calls=1, spare=1)
+    state = {"calls": 0}
+
+    def stuck_then_fast():
+        state["calls"] += 1
+        if state["calls"] == 1:
+            release.wait(5)  # a loser that can't be cancelled
+        return state["calls"]
+
+    # Hedged: the stuck primary keeps the spare thread after losing
+    assert hedger.race(stuck_then_fast)[1] == "hedge"
+
+    # No spare thread left: the next slow call is not hedged, and its
+    # primary still gets a thread right away
+    started = time.monotonic()
+    assert hedger.race(lambda: time.sleep(0.2) or "ok") == ("ok", None)
+    assert time.monotonic() - started < 1
+
+    # The spare thread comes back once the loser finishes
+    release.set()
+    time.sleep(0.1)
+    assert hedger._spare.acquire(blocking=False)
@@ -0,0 +1,154 @@
+import collections
+import json
+import time
+
+import pytest
+
+from job_queue import FairQueue, ListQueue, StreamQueue, queue_from_env
+
+
+def job_ids(jobs):
+    return [json.loads(job.data)["job_id"] for job in jobs]
+
+
+# ============================================================================
+# LIST
+# ============================================================================
+def test_list_fifo_claim_and_ack(client):
+    queue = ListQueue(client, consumer="w1")
+    queue.enqueue_many([{"job_id": str(i), "prompt": "p"} for i in range(3)])
+    assert queue.depth() == 3
+    jobs = queue.claim(count=2, timeout=1)
+    assert job_ids(jobs) == ["0", "1"]
+    queue.heartbeat()
+    assert queue.in_flight() == 2
+    queue.ack(jobs[0])
+    assert queue.in_flight() == 1
+
+
+def test_list_reaps_dead_worker(client):
+    dead, alive = ListQueue(client, consumer="dead"), ListQueue(client, consumer="alive")
+    dead.enqueue({"job_id": "a", "prompt": "p"})
+    dead.heartbeat()
+    dead.claim(timeout=1)
+    alive.heartbeat()
+    # A live worker's jobs stay put
+    assert alive.reap() == 0
+    client.delete("jobs:heartbeat:dead")
+    assert alive.reap() == 1
+    assert job_ids(alive.claim(timeout=1)) == ["a"]
+
+
+# ============================================================================
+# FAIR
+# ============================================================================
+def test_fair_weights_tenants(client):
+    queue = FairQueue(client, consumer="w1", lanes=[("batch", 1)], tenant_weights={"big": 2})
+    queue.enqueue_many([{"job_id": f"{tenant}{i}", "prompt": "p", "tenant": tenant, "priority": "batch"}
+                        for tenant in ("big", "small") for i in range(30)])
+    assert queue.depth() == 60
+    claimed = collections.Counter(json.loads(job.data)["tenant"] for job in queue.claim(count=30, timeout=1))
+    assert claimed == {"big": 20, "small": 10}
+
+
+def test_fair_prefers_heavier_lane(client):
+    queue = FairQueue(client, consumer="w1", lanes=[("interactive", 8), ("batch", 1)])
+    queue.enqueue_many([{"job_id": f"b{i}", "prompt": "p", "priority": "batch"} for i in range(20)])
+    queue.enqueue_many([{"job_id": f"i{i}", "prompt": "p", "priority": "interactive"} for i in range(20)])
+    lanes = collections.Counter(json.loads(job.data)["priority"] for job in queue.claim(count=9, timeout=1))
+    assert lanes == {"interactive": 8, "batch": 1}
+
+
+def test_fair_tenant_cap_and_requeue(client):
+    queue = FairQueue(client, consumer="w1", max_in_flight=1)
+    queue.enqueue_many([{"job_id": f"a{i}", "prompt": "p", "tenant": "a"} for i in range(3)])
+    queue.enqueue({"job_id": "b0", "prompt": "p", "tenant": "b"})
+    jobs = queue.claim(count=4, timeout=0.2)
+    assert sorted(job_ids(jobs)) == ["a0", "b0"]
+    # At the cap until a job is acked
+    assert queue.claim(timeout=0.1) == []
+    queue.ack(next(job for job in jobs if json.loads(job.data)["tenant"] == "a"))
+    assert job_ids(queue.claim(timeout=0.2)) == ["a1"]
+
+    # Re-queueing a dead worker's jobs restores their lanes, tokens and slots
+    queue.deregister()
+    assert queue.depth() == 3
+    assert client.hgetall("jobs:tenant_in_flight") == {"a": "0", "b": "0"}
+
+
+def test_fair_rejects_unknown_lane(client):
+    with pytest.raises(ValueError):
+        FairQueue(client).enqueue({"job_id": "a", "prompt": "p", "priority": "nope"})
+
+
+# ============================================================================
+# STREAM
+# ============================================================================
+def test_stream_claim_and_ack(client):
+    queue = StreamQueue(client, consumer="w1")
+    queue.enqueue_many([{"job_id": str(i), "prompt": "p"} for i in range(3)])
+    jobs = queue.claim(count=2, timeout=1)
+    assert job_ids(jobs) == ["0", "1"]
+    assert (queue.depth(), queue.in_flight()) == (1, 2)
+    queue.ack(jobs[0])
+    assert queue.in_flight() == 1
+
+
+def test_stream_producer_creates_group(client):
+    StreamQueue(client).enqueue({"job_id": "a", "prompt": "p"})
+    groups = client.xinfo_groups("jobs:stream")
+    assert [group["name"] for group in groups] == ["workers"]
+    assert groups[0]["lag"] == 1
+
+
+def test_stream_live_jobs_are_not_stolen(client):
+    owner = StreamQueue(client, consumer="owner", claim_idle_ms=200)
+    other = StreamQueue(client, consumer="other", claim_idle_ms=200)
+    owner.enqueue({"job_id": "a", "prompt": "p"})
+    owner.claim(timeout=1)
+    # The owner's call outlives claim_idle_ms, but its heartbeat keeps the entry fresh
+    for _ in range(3):
+        time.sleep(0.1)
+        owner.heartbeat()
+    assert other.claim(timeout=0.1) == []
+
+    # Once the owner stops heart-beating, the entry is taken over
+    time.sleep(0.25)
+    other._last_autoclaim = 0
+    assert job_ids(other.claim(timeout=0.1)) == ["a"]
+
+
+def test_queue_from_env(client, monkeypatch):
+    monkeypatch.setenv("QUEUE_BACKEND", "fair")
+    monkeypatch.setenv("QUEUE_LANES", "fast:3,slow:1")
+    assert queue_from_env(client).lanes == [("fast", 3), ("slow", 1)]
+    monkeypatch.setenv("QUEUE_BACKEND", "nope")
+    with pytest.raises(ValueError):
+        queue_from_env(client)
+
+
+def test_fair_claim_declares_every_key(client, monkeypatch):
+    """Redis Cluster only routes keys passed in KEYS: the claim must not build its own."""
+    import job_queue
+
+    strict = """
+local declared = {}
+for _, key in ipairs(KEYS) do declared[key] = true end
+local call = redis.call
+redis.call = function(command, ...)
+    local args = {...}
+    for i = 1, (command == 'LMOVE') and 2 or 1 do
+        if not declared[args[i]] then
+            error('undeclared key ' .. tostring(args[i]))
+        end
+    end
+    return call(command, ...)
+end
+"""
+    monkeypatch.setattr(job_queue, "FAIR_CLAIM_SCRIPT", strict + job_queue.FAIR_CLAIM_SCRIPT)
+    queue = FairQueue(client, consumer="w1", max_in_flight=2)
+    queue.enqueue_many([{"job_id": f"{tenant}{i}", "prompt": "p", "tenant": tenant, "priority": lane}
+                        for tenant in ("a", "b") for lane in ("interactive", "batch") for i in range(2)])
+    assert len(queue.claim(count=8, timeout=0.1)) == 4
+    queue.deregister()
+    assert queue.depth() == 8
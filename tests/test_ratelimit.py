@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from ratelimit import RateLimiter, estimate_tokens, estimated_wait
+
+
+def test_bucket_holds_burst_then_limits(client):
+    limiter = RateLimiter(client, rpm=60, burst=3)
+    assert all(limiter.acquire(timeout=0) for _ in range(3))
+    assert not limiter.acquire(timeout=0)
+    # One request per second refills
+    started = time.monotonic()
+    assert limiter.acquire(timeout=2)
+    assert 0.5 < time.monotonic() - started < 1.5
+
+
+def test_token_budget(client):
+    limiter = RateLimiter(client, rpm=600, tpm=600, burst=1)
+    assert limiter.acquire(tokens=8, timeout=0)
+    assert not limiter.acquire(tokens=8, timeout=0)
+
+
+def test_aimd(client):
+    limiter = RateLimiter(client, increase=0.1, decrease=0.5, min_factor=0.2, cooldown=60)
+    assert limiter.record_failure(status_code=429) == 0.5
+    # A burst of failures within the cooldown is one congestion signal
+    assert limiter.record_failure(status_code=503) == 0.5
+    assert limiter.record_success() == pytest.approx(0.6)
+    # Other 4xx are the caller's fault, not congestion
+    client.delete("ratelimit:cooldown")
+    assert limiter.record_failure(status_code=400) == pytest.approx(0.7)
+    assert limiter.requests_per_second() == pytest.approx(0.7)
+
+
+def test_aimd_floor_and_latency_target(client):
+    limiter = RateLimiter(client, decrease=0.1, min_factor=0.2, cooldown=0.001, latency_target=1)
+    assert limiter.record_success(latency=5) == 0.2
+    time.sleep(0.01)
+    assert limiter.record_success(latency=5) == 0.2
+    assert limiter.record_success(latency=0.5) > 0.2
+
+
+def test_retry_after_pauses_everyone(client):
+    limiter = RateLimiter(client, rpm=6000)
+    limiter.record_failure(status_code=429, retry_after=30)
+    assert not limiter.acquire(timeout=0.1)
+
+
+def test_estimates():
+    assert estimate_tokens("x" * 400, 256) == 356
+    assert estimated_wait(0, 0) == 0.0
+    assert estimated_wait(10, 0) is None
+    assert estimated_wait(10, 2) == 5
+    # Throughput is capped by what the rate limiter lets through
+    assert estimated_wait(10, 5, allowed_per_second=1) == 10
+    assert estimated_wait(10, 0, allowed_per_second=2) == 5
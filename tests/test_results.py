@@ -0,0 +1,46 @@
+import threading
+import time
+
+from results import get_result, store_result, wait_for_result
+
+
+def test_record_round_trip(client):
+    long_text = "word " * 1000
+    store_result(client, ["a"], long_text, model="m", usage={"total_tokens": 7},
+                 timings={"enqueued_at": 1.0}, compress_min_bytes=64)
+    record = get_result(client, "a")
+    assert record["result"] == long_text
+    assert record["status"] == "processed"
+    assert record["model"] == "m"
+    assert record["total_tokens"] == 7
+    assert record["timings"] == {"enqueued_at": 1.0}
+    assert "result" in client.hget("result:a", "compressed")
+
+
+def test_wait_returns_finished_job_at_once(client):
+    store_result(client, ["a"], "done")
+    assert wait_for_result(client, "a", timeout=5)["result"] == "done"
+
+    # The first wait may have taken the completion event; a second one must not block
+    started = time.monotonic()
+    assert wait_for_result(client, "a", timeout=5)["result"] == "done"
+    assert time.monotonic() - started < 1
+
+
+def test_wait_wakes_every_waiter(client):
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(wait_for_result(client, "a", timeout=5)))
+               for _ in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    store_result(client, ["a"], "done")
+    for waiter in waiters:
+        waiter.join()
+    assert [record["result"] for record in results] == ["done", "done"]
+    assert time.monotonic() - started < 2
+
+
+def test_wait_times_out(client):
+    assert wait_for_result(client, "missing", timeout=1) is None
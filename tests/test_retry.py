@@ -0,0 +1,49 @@
+import time
+
+from inference import InferenceError
+from job_queue import ListQueue
+from retry import DEAD_KEY, RETRY_KEY, RetryPolicy, dead_letters, is_transient
+
+
+def test_transient_errors():
+    assert is_transient(InferenceError("timeout"))
+    assert is_transient(InferenceError("throttled", status_code=429))
+    assert not is_transient(InferenceError("bad request", status_code=400))
+    assert not is_transient(ValueError("parse"))
+
+
+def test_backoff_is_jittered_and_capped(client):
+    policy = RetryPolicy(client, base_delay=1, max_delay=5)
+    for attempt in range(1, 10):
+        delay = policy.backoff(attempt)
+        assert 0 <= delay <= min(5, 2 ** (attempt - 1))
+
+
+def test_schedule_respects_attempts_and_deadline(client):
+    policy = RetryPolicy(client, max_attempts=2, base_delay=0.01)
+    assert policy.schedule({"job_id": "a"}) is not None
+    # Second attempt failed: out of attempts
+    assert policy.schedule({"job_id": "a", "attempt": 1}) is None
+    # The retry could not start before the deadline
+    assert policy.schedule({"job_id": "b", "deadline": time.time()}) is None
+    assert client.zcard(RETRY_KEY) == 1
+
+
+def test_promote_moves_due_jobs_once(client):
+    policy = RetryPolicy(client, base_delay=0)
+    queue = ListQueue(client)
+    policy.schedule({"job_id": "a", "prompt": "p"})
+    assert policy.next_due() <= time.time()
+    assert policy.promote(queue) == 1
+    assert policy.promote(queue) == 0
+    assert queue.depth() == 1
+    assert policy.next_due() is None
+
+
+def test_dead_letter(client):
+    policy = RetryPolicy(client, dead_max_len=1)
+    policy.dead_letter({"job_id": "a"}, "boom", "HTTP500", reason="max_attempts")
+    policy.dead_letter({"job_id": "b", "attempt": 2}, "boom", "HTTP500", reason="max_attempts")
+    assert client.llen(DEAD_KEY) == 1
+    entry = dead_letters(client)[0]
+    assert entry["job"]["job_id"] == "b" and entry["attempts"] == 3
@@ -0,0 +1,16 @@
+from accounting import CostModel
+from job_queue import ListQueue
+from ratelimit import RateLimiter
+from snapshot import MetricsSnapshot
+
+
+def test_snapshot_carries_admission_inputs(client):
+    queue = ListQueue(client)
+    queue.enqueue({"job_id": "a", "prompt": "p"})
+    limiter = RateLimiter(client, rpm=120)
+    snapshot = MetricsSnapshot(client, queue, CostModel(), limiter=limiter).collect()
+    assert snapshot["queue_depth"] == 1
+    assert snapshot["throughput"] == 0
+    assert snapshot["allowed_rate"] == 2
+
+    assert MetricsSnapshot(client, queue, CostModel()).collect()["allowed_rate"] is None
@@ -0,0 +1,114 @@
+import json
+import time
+
+import pytest
+import redis
+
+from accounting import UsageMeter
+from cache import ResponseCache
+from coalesce import SingleFlight
+from job_queue import ListQueue
+from results import get_result
+from retry import RETRY_KEY, RetryPolicy, dead_letters
+
+
+@pytest.fixture
+def worker(client, monkeypatch):
+    """worker.py with its Redis-backed collaborators rebuilt around the test's fakeredis."""
+    monkeypatch.setenv("NEYSA_API_KEY", "test")
+    import worker
+    monkeypatch.setattr(worker, "redis_client", client)
+    monkeypatch.setattr(worker, "job_queue", ListQueue(client, consumer="test-worker"))
+    monkeypatch.setattr(worker, "coalescer", SingleFlight(client, ttl=60))
+    monkeypatch.setattr(worker, "retry_policy", RetryPolicy(client, base_delay=0))
+    monkeypatch.setattr(worker, "usage_meter", UsageMeter(client, "test-worker"))
+    monkeypatch.setattr(worker, "response_cache", None)
+    monkeypatch.setattr(worker, "rate_limiter", None)
+    return worker
+
+
+def test_expired_job_leaves_other_leaders_followers(worker, client):
+    assert worker.coalescer.join("same", "leader")
+    assert not worker.coalescer.join("same", "follower")
+
+    expired = {"job_id": "expired", "prompt": "same", "deadline": time.time() - 1}
+    assert worker.store_outcome(json.dumps(expired))
+
+    assert get_result(client, "expired")["error_class"] == "DeadlineExceeded"
+    assert get_result(client, "follower") is None
+    assert worker.coalescer.release("same", "leader") == ["follower"]
+
+
+def test_leader_that_raises_stops_refreshing_its_marker(worker, monkeypatch):
+    def process_job(*args, **kwargs):
+        raise redis.TimeoutError("Timeout reading from socket")
+
+    monkeypatch.setattr(worker, "process_job", process_job)
+    with pytest.raises(redis.TimeoutError):
+        worker.store_outcome(json.dumps({"job_id": "leader", "prompt": "p"}))
+    assert worker.coalescer.refresh() == 0
+
+
+def test_reaped_leader_answers_followers_from_cache(worker, client, monkeypatch):
+    cache = ResponseCache(client)
+    monkeypatch.setattr(worker, "response_cache", cache)
+    # The first run cached its answer, then its pod died before storing it
+    assert worker.coalescer.join("p", "leader")
+    assert not worker.coalescer.join("p", "follower")
+    cache.set("p", "answer")
+
+    assert worker.store_outcome(json.dumps({"job_id": "leader", "prompt": "p"}))
+    assert get_result(client, "follower")["result"] == "answer"
+    assert worker.coalescer.join("p", "next")
+
+
+def claim_one(worker, monkeypatch, payload, failure):
+    """Queue and claim one job, then run handle_job() with process_job raising `failure`."""
+    def process_job(*args, **kwargs):
+        raise failure
+
+    monkeypatch.setattr(worker, "process_job", process_job)
+    worker.job_queue.heartbeat()
+    worker.job_queue.enqueue(payload)
+    job, = worker.job_queue.claim(timeout=1)
+    worker.handle_job(job)
+
+
+def test_unexpected_error_hands_job_back_for_retry(worker, client, monkeypatch):
+    claim_one(worker, monkeypatch, {"job_id": "a", "prompt": "p"}, redis.ResponseError("BUSY"))
+    assert worker.job_queue.in_flight() == 0
+    assert client.zcard(RETRY_KEY) == 1
+    assert get_result(client, "a") is None
+
+
+def test_unexpected_error_out_of_attempts_fails_job_and_followers(worker, client, monkeypatch):
+    monkeypatch.setattr(worker, "retry_policy", RetryPolicy(client, max_attempts=1))
+    # A retried leader whose followers are still waiting
+    worker.coalescer.join("p", "a")
+    worker.coalescer.join("p", "follower")
+    claim_one(worker, monkeypatch, {"job_id": "a", "prompt": "p"}, redis.TimeoutError("slow"))
+    assert worker.job_queue.in_flight() == 0
+    assert get_result(client, "a")["error_class"] == "TimeoutError"
+    assert get_result(client, "follower")["status"] == "failed"
+    assert dead_letters(client)[0]["reason"] == "max_attempts"
+
+
+def test_lost_connection_leaves_job_claimed(worker, client, monkeypatch):
+    claim_one(worker, monkeypatch, {"job_id": "a", "prompt": "p"}, redis.ConnectionError("gone"))
+    assert worker.job_queue.in_flight() == 1
+    assert client.zcard(RETRY_KEY) == 0
+
+
+def test_error_after_result_stored_only_acks(worker, client, monkeypatch):
+    def record_jobs(*args, **kwargs):
+        raise redis.ResponseError("OOM")
+
+    monkeypatch.setattr(worker, "record_jobs", record_jobs)
+    monkeypatch.setattr(worker, "process_job", lambda *args, **kwargs: ("answer", {}, None))
+    worker.job_queue.heartbeat()
+    worker.job_queue.enqueue({"job_id": "a", "prompt": "p"})
+    job, = worker.job_queue.claim(timeout=1)
+    worker.handle_job(job)
+    assert worker.job_queue.in_flight() == 0
+    assert client.zcard(RETRY_KEY) == 0
+    assert get_result(client, "a")["result"] == "answer"